@@ -11,25 +11,45 @@ The input file is a delimited file by comma or tab. It has a header
 and three columns. The first column is the name of the duplex and 
 the second column is the first strand. Similar to the command line
 input, the second strand in the third column is optional for any
-given duplex.
+given duplex. Optional columns of reaction conditions, named by the
+header (temper, cp, ct, na, mg), give the conditions per duplex, and
+a column nnset the nearest neighbor parameter set of each (see
+'--nnset').
+
+With '-p', a large input file is read, calculated and written in
+chunks of rows by pipelined threads, so that the reading and writing
+overlap the calculation. The output is then in the input order.
+
+With '-a', the Tm are folded into aggregate statistics (count, mean,
+standard deviation, quantiles, a histogram and the counts within
+bands) and only the statistics are output.
 
 See the accompanying file 'README.txt' for more.
 
 This script imports the following custom modules: 'util', 'utilSeq'
-, 'thermo', 'error'. All the custom modules should come in one
-distribution with this script.
+, 'thermo', 'error', 'pipeline', 'aggregate' and 'salt'. All the
+custom modules should come in one distribution with this script.
  
 """
 
 import sys, os
+import re
 import argparse
 from pathlib import Path 
 
 import util, utilSeq
 import thermo, error 
+import pipeline, aggregate
+import salt
 
 __version='R1.0.0.0'
 
+# condition columns of the input file by their header (lower case,
+# without units), including those of the output
+_condHeader={'temper':'temper', 'temperature':'temper', 'cp':'cp'
+           , 'cprimer':'cp', 'ct':'ct', 'ctemplate':'ct', 'na':'na'
+           , 'c_mono':'na', 'mg':'mg', 'c_divalent':'mg', 'nnset':'nnSet'}
+
 def main():
     """DNA oligo duplex Tm calculator."""
     
@@ -56,6 +76,34 @@ def main():
     argParser.add_argument("-n", "--na", help=msg, type=float, default=100)
     msg="divalent salt concentration in mM (0.0)"
     argParser.add_argument('-m', '--mg', help=msg, type=float, default=0.0)    
+    msg="salt correction model (santalucia)"
+    argParser.add_argument('--salt', help=msg, choices=sorted(salt.models)
+                                   , default='santalucia')
+    msg="register a nearest neighbor parameter set, with its files for"
+    msg+=" dH and dS and optionally dH and dS of the initiation and of a"
+    msg+=" terminal A/T pair, for the column nnset (repeatable)"
+    argParser.add_argument('--nnset', help=msg, nargs='+', action='append'
+                         , default=[], metavar='NAME HFILE SFILE')
+    msg="allow IUPAC degenerate codes and give the minimum and maximum"
+    msg+=" (and mean with -v) of Tm, dH and dS over the expansions"
+    argParser.add_argument('-d', '--degenerate', help=msg
+                                               , action="store_true")
+    msg="pipelined mode for an input file, calculated in chunks of this"
+    msg+=" many rows while reading and writing"
+    argParser.add_argument('-p', '--pipeline', help=msg, type=int)
+    argParser.add_argument('-w', '--workers', type=int, default=2
+                         , help="compute threads in pipelined mode (2)")
+    argParser.add_argument('-q', '--quiet', action="store_true"
+                         , help="do not display the output rows")
+    msg="output the aggregate statistics of Tm instead of the rows"
+    argParser.add_argument('-a', '--aggregate', help=msg
+                                              , action="store_true")
+    msg="the range and the bin width of the histogram in -a (0 100 1)"
+    argParser.add_argument('--hist', help=msg, type=float, nargs=3
+                         , metavar=('LO', 'HI', 'WIDTH'), default=[0, 100, 1])
+    msg="a Tm band counted in -a, both ends inclusive (repeatable)"
+    argParser.add_argument('--band', help=msg, type=float, nargs=2
+                         , metavar=('LO', 'HI'), action='append', default=[])
     argParser.add_argument('-V', '--version', action='version'
                                             , version=__version)
         
@@ -75,16 +123,51 @@ def main():
         args.s1="CGATCG"
         args.s2=None
 
-    if args.file:
+    if args.pipeline is not None and (not args.file or args.pipeline<1):
+        print("\n*** The pipelined mode needs an input file and a chunk"
+                                                    " size of at least 1.")
+        print("\n*** See usage below\n\n")
+        argParser.print_help()
+
+        sys.exit(1)
+
+    if args.aggregate and args.degenerate:
+        print("\n*** The aggregate statistics are not available for"
+                                                " degenerate duplexes.")
+        print("\n*** See usage below\n\n")
+        argParser.print_help()
+
+        sys.exit(1)
+
+    if args.aggregate:
+        
+        try:
+            tmStats=aggregate.TmStats(*args.hist, bands=args.band)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    else:
+        tmStats=None
+
+    if args.file and args.pipeline is None:
         print("Reading input file {} ...".format(args.file))
         
-        oligo=util.readFileToDict(args.file)
+        try:
+            [oligo, rowCond]=readInput(args.file)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+    else:
+        rowCond={}
         
     if args.s1 and args.s2:
         oligo['YourSeq']=args.s1+'\t'+args.s2
     elif args.s1:        
         oligo['YourSeq']=args.s1
         
+    # the strands as given, for the pipelined mode
+    strands=oligo
+    
     oligo=getOligoPair(oligo, args.revS2)
 
     # set up the condition
@@ -97,18 +180,113 @@ def main():
         cond[k]=v
         
     [_setkv(ck[i], cv[i]) for i in range(5) if cv[i] != None]
+    
+    cond['saltModel']=salt.models[args.salt]()
+    
+    try:
+        for nnSet in args.nnset:
+            
+            if len(nnSet) not in (3, 7):
+                raise ValueError("--nnset takes a name and two files, and"
+                                 " optionally four end parameters.")
+                
+            ends=[float(x) for x in nnSet[3:]]
+            thermo.Thermo.registerNN(*nnSet[:3], *([ends[:2], ends[2:]]
+                                                        if ends else []))
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+        
+    cond['nnSets']=[nnSet[0] for nnSet in args.nnset]
+    
+    if args.degenerate and not cond['saltModel'].additive:
+        print("\n*** The degenerate calculation needs the salt model"
+                                                        " santalucia.")
+        print("\n*** See usage below\n\n")
+        argParser.print_help()
+
+        sys.exit(1)
 
     try:
         myThermo=thermo.Thermo(**cond)
+    except (error.NNFileNotFoundError, ValueError) as e:
+        print(e)
+        sys.exit(1)
     except (error.TemperatureRangeError, error.ConcentrationZeroError, error.ConcentrationOrderError) as e:
         print(str(e)+"\n")
         print("***Please see the usage below***\n\n")
         argParser.print_help()
         sys.exit(1)
     
-    out=myThermo.thermoCal(oligo, args.v)
+    try:
+        if args.pipeline is not None:
+            
+            print("Reading input file {} in chunks of {} rows ...".format(
+                                                 args.file, args.pipeline))
+            
+            stats=runPipelined(myThermo, strands, args, tmStats)
+            
+        elif args.aggregate:
+            
+            stats={}
+            out=aggregate.foldBatch(myThermo, oligo, tmStats, rowCond).summary()
+            
+        elif args.degenerate:
+            
+            stats={}
+            out=myThermo.thermoDegen(oligo, args.v>0)
+            
+        else:
+            
+            stats={}
+            out=myThermo.thermoBatch(oligo, args.v, rowCond, stats)
+            
+    except (error.TemperatureRangeError, error.ConcentrationZeroError
+          , error.ConcentrationOrderError, error.NotDNAError
+          , error.DuplexNotFlushError, error.NNnotExistError
+          , ValueError) as e:
+        print(e)
+        sys.exit(1)
+    
+    if stats.get('duplexes', 0)>0:
+        print("Calculated {} unique of {} duplexes (dedup ratio {:.2f})".format(
+              stats['unique'], stats['duplexes']
+            , stats['duplexes']/stats['unique']))
+    
+    if args.pipeline is None:
+        
+        if not args.aggregate:
+            out.insert(0, outputHeader(args))
+        
+        saveOutput(out, args)
+
+
+def outputHeader(args):
+    """The header of the output, by the verbose level and the mode.
+    
+    Parameters:
+    args : Namespace --- the command line arguments.
     
-    # add header
+    Returns:
+    A string, the column names delimited by tab.
+    """
+    
+    delimiter="\t"
+    
+    if args.degenerate:
+        
+        stat=["min", "max", "mean"] if args.v>0 else ["min", "max"]
+        header=["Name", "Duplex", "Tm(C)_min", "Tm(C)_max"]
+        
+        # the Tm of the mean dH and dS, not the mean of Tm
+        if args.v>0:
+            header.append("Tm(C)_of_mean")
+        
+        for h in ["dH(kcal/mol)", "dS(e.u.)"]:
+            header+=[f"{h}_{x}" for x in stat]
+            
+        return delimiter.join(header)
+        
     header1=["Name", "Duplex", "Tm(C)"]
     header2=["PerBound (%)", "dG(kcal/mol)", "dH(kcal/mol)", "dS(e.u.)"
                                             , "Temperature(C)"]
@@ -116,35 +294,280 @@ def main():
     headerCond=["Cprimer(nM)", "Ctemplate(nM)", "C_mono(mM)"
                                               , "C_divalent(mM)"]
 
-    delimiter="\t"
     if args.v==0:
-        out.insert(0, delimiter.join(header1))
+        return delimiter.join(header1)
         
     elif args.v==1:
-        out.insert(0, delimiter.join(header1+header2+headerCond))
+        return delimiter.join(header1+header2+headerCond)
+            
+    return delimiter.join(header1+header2+header3+headerCond)
+
+
+def runPipelined(myThermo, oligo, args, tmStats=None):
+    """Calculate an input file in chunks of rows by pipelined threads.
+    
+    A reader thread reads the chunks, compute threads calculate them
+    with the shared 'Thermo' object, and a writer thread writes the
+    output file (and displays the rows unless '-q') in the input
+    order. See the module pipeline.
+    
+    With '-a', each chunk is folded into its own statistics, merged by
+    the writer thread, and only the statistics are output.
+    
+    Parameters:
+    myThermo : Thermo     --- the object for the calculation.
+    oligo    : dictionary --- duplexes from the command line, calculated
+                              after the file, as for 'getOligoPair'.
+    args     : Namespace  --- the command line arguments.
+    tmStats  : TmStats    --- the accumulator for '-a' (default None).
+    
+    Exceptions:
+    The errors of the calculation, see thermoBatch and thermoDegen,
+    and of a condition cell not a number, see _parseRow.
+    
+    Returns:
+    A dictionary with the total number of duplexes 'duplexes' and of
+    the unique ones calculated 'unique' (empty if degenerate).
+    """
+    
+    fh=open(args.file, "r")
+    
+    condCol=_condColumns(fh.readline())
+    
+    def _chunks():
+        
+        rows=[]
+        for [row, line] in enumerate(fh, 2):
+            
+            line=line.strip()
+            if line=='':
+                continue
+                
+            temp=re.split('[\t,]', line)
+            rows.append([temp[0]]+_parseRow(temp, condCol, row))
+            
+            if len(rows)==args.pipeline:
+                yield rows
+                rows=[]
+                
+        rows+=[[o, oligo[o], {}] for o in oligo]
+        if len(rows)>0:
+            yield rows
+            
+    def _compute(rows):
+        
+        seqs={}
+        rowCond={}
+        for [name, seq, c] in rows:
             
-    elif args.v >=2:
-        out.insert(0, delimiter.join(header1+header2+header3+headerCond))
+            seqs[name]=seq
+            rowCond[name]=c
+            
+        pairs=getOligoPair(seqs, args.revS2)
+        
+        stats={}
+        if tmStats is not None:
+            return [aggregate.foldBatch(myThermo, pairs, tmStats.blank()
+                                                         , rowCond), stats]
+        elif args.degenerate:
+            out=myThermo.thermoDegen(pairs, args.v>0)
+        else:
+            out=myThermo.thermoBatch(pairs, args.v, rowCond, stats)
+            
+        # back from the order of the names to the input order
+        byName=dict(zip(sorted(pairs), out))
+        
+        return [[byName[o] for o in pairs], stats]
+        
+    total={}
+    
+    def _write(res):
+        
+        [out, stats]=res
+        
+        if tmStats is not None:
+            tmStats.merge(out)
+            return
+            
+        if not args.quiet and len(out)>0:
+            print("\n".join(out))
+            
+        fo.writelines("\n"+line for line in out)
+        
+        for k in stats:
+            total[k]=total.get(k, 0)+stats[k]
+            
+    if tmStats is not None:
+        
+        with fh:
+            pipeline.runPipeline(_chunks(), _compute, _write, args.workers)
+            
+        saveOutput(tmStats.summary(), args)
+        
+        return total
+        
+    with fh, open(outputFile(args), "w") as fo:
+        
+        header=outputHeader(args)
+        
+        if not args.quiet:
+            print(header)
+            
+        fo.write(header)
+        
+        pipeline.runPipeline(_chunks(), _compute, _write, args.workers)
+        
+    return total
+
+
+def saveOutput(out, args):
+    """Display the output and save it to a file.
+    
+    The output file is given by option '-o', or inferred from the
+    input. See the accompanying file 'README.txt' for more.
+    
+    Parameters:
+    out  : list      --- lines of the output.
+    args : Namespace --- the command line arguments.
+    """
+    
+    if not args.quiet:
+        print("\n".join(out))
 
-    print("\n".join(out))
+    util.saveListToFile(out, outputFile(args))
 
-    # save the output
+
+def outputFile(args):
+    """The output file, given by option '-o', or inferred from the
+    input.
+    
+    Parameters:
+    args : Namespace --- the command line arguments.
+    
+    Returns:
+    The file path.
+    """
+    
     if args.outfile:
-        outFile=args.outfile
+        return args.outfile
+        
+    outFile="TmPy."
+
+    if args.file:
+        outFile+=Path(args.file).stem
     else:
+        outFile+="YourSeq"
     
-        outFile="TmPy."
+    outFile+=".out.txt"
+
+    return Path(os.getcwd()+'/'+outFile)
+
+
+def readInput(f):
+    """Read the input file into duplexes and per duplex conditions.
     
-        if args.file:
-            outFile+=Path(args.file).stem
-        else:
-            outFile+="YourSeq"
+    The input file is delimited by comma or tab, with a header. The
+    first three columns are the name, the first strand and the 
+    optional second strand. The columns with a header in _condHeader
+    (case insensitive, units in brackets ignored) are conditions, in 
+    the units of the command line options. Empty cells take the 
+    conditions of the command line.
+    
+    Parameters:
+    f : str --- the input file name.
+    
+    Exceptions:
+    ValueError --- a condition cell is not a number (see _parseRow).
+    
+    Returns:
+    A list with two dictionaries. The keys are the duplex names. The 
+    values are the strands delimited by tab, as for 'getOligoPair', and
+    the dictionaries of the conditions given, respectively.
+    """
+    
+    condCol=_condColumns(util.readFileToList(f, level=0)[0])
+            
+    lines=util.readFileToDict(f, valueC=-1)
+    
+    # the line numbers of the names, for the error messages
+    with open(f, "r") as fh:
+        rowOf={re.split('[\t,]', line.strip())[0]:i
+                            for i, line in enumerate(fh, 1) if i>1}
+    
+    oligo={}
+    cond={}
+    for name in lines:
+        
+        [oligo[name], c]=_parseRow(re.split('[\t,]', lines[name]), condCol
+                                 , rowOf.get(name))
+        
+        if len(c)>0:
+            cond[name]=c
+            
+    return [oligo, cond]
+
+
+def _condColumns(line):
+    """The condition columns of the input file by its header line.
+    
+    Parameters:
+    line : str --- the header line.
+    
+    Returns:
+    A dictionary. The keys and values are the columns (1 based) and
+    the conditions (keys of _condHeader's values), respectively.
+    """
+    
+    header=re.split('[\t,]', line.strip())
+    
+    condCol={}
+    for i in range(3, len(header)+1):
+        
+        key=header[i-1].split('(')[0].strip().lower()
         
-        outFile+=".out.txt"
+        if key in _condHeader:
+            condCol[i]=_condHeader[key]
+            
+    return condCol
+
+
+def _parseRow(temp, condCol, row=None):
+    """The strands and the conditions of a row of the input file.
     
-        outFile=Path(os.getcwd()+'/'+outFile)
-                 
-    util.saveListToFile(out, outFile)
+    Parameters:
+    temp    : list       --- the cells of the row.
+    condCol : dictionary --- the condition columns, see _condColumns.
+    row     : int        --- the line number of the row in the file,
+                             for the error message (default None).
+    
+    Exceptions:
+    ValueError --- a condition cell is not a number.
+    
+    Returns:
+    A list with the strands delimited by tab, as for 'getOligoPair',
+    and the dictionary of the conditions given.
+    """
+    
+    seqs=[temp[i-1] for i in (2, 3) if i<=len(temp) and i not in condCol
+                                                and temp[i-1]!='']
+    
+    c={}
+    for i in condCol:
+        
+        if i>len(temp) or temp[i-1].strip()=='':
+            continue
+            
+        if condCol[i]=='nnSet':
+            c['nnSet']=temp[i-1].strip()
+            continue
+            
+        try:
+            c[condCol[i]]=float(temp[i-1])
+        except ValueError:
+            raise ValueError(f"\n*** Row {row}, column {i} ({condCol[i]}):"
+                             f" '{temp[i-1].strip()}' is not a number.")
+                        
+    return ["\t".join(seqs), c]
 
 
 def getOligoPair(oligo, r=True):
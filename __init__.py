@@ -5,4 +5,17 @@ thermo --- a class module for the core calculation.
 error  --- a module for all the specific error handling.
 util   --- a module for common utillity functions.
 utilSeq --- a module for common sequence analysis functions.
+scan   --- a module for scanning templates for windows by Tm.
+dimer  --- a module for screening primer pools for stable dimers.
+offTarget --- a module for searching a reference for primer binding sites.
+equilibrium --- a module for the competitive equilibrium of many strands.
+multiplex --- a module for balancing the Tm of multiplex primers.
+tiling --- a module for tiling a region with probes of uniform Tm.
+buffer --- a module for choosing the buffer conditions of a primer set.
+shared --- a module for sharing numpy arrays between processes.
+pipeline --- a module for running a job in pipelined stages.
+aggregate --- a module for folding Tm into aggregate statistics.
+salt   --- a module of salt correction models.
+storage --- a module for storing large numbers of Tm in a compact form.
+hairpin --- a module for screening primers for hairpins and self-dimers.
 """ 
\ No newline at end of file
@@ -0,0 +1,354 @@
+"""This is a module for folding Tm into aggregate statistics.
+
+Instead of keeping every Tm of a library or a genome scan, the values
+are folded in one pass into a 'TmStats' accumulator of a fixed size:
+the count, mean and variance, a histogram of fixed bins, the counts
+within bands of Tm, and a quantile sketch.
+
+All the parts of the accumulator are integers: the sums of Tm and of
+its square are kept in units of 2**-10 C (each Tm is rounded to the
+unit first), and the quantile sketch counts the values by fine bins
+(0.01 C by default), kept sparse by the bin of each value, round(Tm /
+resolution), so that it covers any Tm whatever the range of the
+histogram. Accumulators folded by parallel workers therefore merge
+exactly, in any order, into the same result as one pass.
+
+The module needs numpy. 'foldBatch' needs a 'Thermo' object.
+
+Classes:
+TmStats --- mergeable aggregate statistics of Tm.
+
+Functions:
+foldBatch(*) --- fold the Tm of a batch of duplexes into a TmStats.
+"""
+
+import math
+from fractions import Fraction
+
+import numpy as np
+
+
+class TmStats(object):
+    """Mergeable aggregate statistics of Tm.
+
+    Constants and default values
+    _unit_   --- units of Tm per celsius in the sums (2**10).
+    _limit_  --- Tm (celsius) at or beyond which, in absolute value, a
+                 value is counted as invalid (1e4).
+    _piece_  --- number of values summed at once in int64 (65536).
+
+    Attributes:
+    lo, hi     --- the range of the histograms (celsius).
+    width      --- the bin width of the histogram.
+    resolution --- the bin width of the quantile sketch.
+    bands      --- the bands (lo, hi) of Tm counted, both inclusive.
+    n          --- number of valid values.
+    invalid    --- number of NaN, infinite or out of limit values.
+    sumQ, sumQ2 --- sums of Tm and Tm**2 in units (Python integers).
+    min, max   --- the extremes of the valid values.
+    hist       --- the histogram, with one more bin below lo and one
+                   more at or above hi at the two ends.
+    fineBin    --- the fine bins holding values, round(Tm/resolution),
+                   sorted.
+    fine       --- the quantile sketch, the counts of the fine bins.
+    bandCount  --- the counts within the bands.
+
+    Methods:
+    add(tm)      --- fold an array of Tm.
+    _addFine(bins, counts) --- fold counts into the quantile sketch.
+    merge(other) --- fold another accumulator with the same bins.
+    blank()      --- an empty accumulator with the same bins.
+    mean(), var(), sd() --- the mean, variance and standard deviation.
+    quantile(p)  --- the quantile at p from the sketch.
+    summary()    --- the statistics as lines of text.
+    """
+
+    _unit_=1<<10
+    _limit_=1e4
+    _piece_=1<<16
+
+
+    def _bins(self, tm, width):
+        """The bin of each value, with 0 below lo and the last at or
+        above hi.
+        """
+
+        nBin=int(round((self.hi-self.lo)/width))
+
+        idx=np.floor((tm-self.lo)/width)+1
+
+        return np.clip(idx, 0, nBin+1).astype(np.intp)
+
+
+    def add(self, tm):
+        """Fold an array of Tm.
+
+        Parameters:
+        tm : array --- Tm in celsius, of any shape.
+
+        Return:
+        The object itself.
+        """
+
+        tm=np.asarray(tm, dtype=float).ravel()
+
+        ok=np.isfinite(tm) & (np.abs(tm)<self._limit_)
+        self.invalid+=int(len(tm)-ok.sum())
+
+        tm=tm[ok]
+        if len(tm)==0:
+            return self
+
+        self.n+=len(tm)
+        self.min=min(self.min, float(tm.min()))
+        self.max=max(self.max, float(tm.max()))
+
+        q=np.rint(tm*self._unit_).astype(np.int64)
+        for i in range(0, len(q), self._piece_):
+
+            p=q[i:i+self._piece_]
+
+            self.sumQ+=int(p.sum())
+            self.sumQ2+=int((p*p).sum())
+
+        self.hist+=np.bincount(self._bins(tm, self.width)
+                             , minlength=len(self.hist))
+        self._addFine(*np.unique(np.rint(tm/self.resolution).astype(np.int64)
+                                                       , return_counts=True))
+
+        for i, [a, b] in enumerate(self.bands):
+            self.bandCount[i]+=int(((tm>=a) & (tm<=b)).sum())
+
+        return self
+
+
+    def _addFine(self, bins, counts):
+        """Fold counts into the quantile sketch.
+
+        Parameters:
+        bins   : array --- fine bins, round(Tm/resolution).
+        counts : array --- the count of each bin.
+        """
+
+        [self.fineBin, inverse]=np.unique(np.concatenate([self.fineBin, bins])
+                                                      , return_inverse=True)
+
+        fine=np.zeros(len(self.fineBin), dtype=np.int64)
+        np.add.at(fine, inverse, np.concatenate([self.fine, counts]))
+
+        self.fine=fine
+
+
+    def merge(self, other):
+        """Fold another accumulator with the same bins.
+
+        Parameters:
+        other : TmStats --- the accumulator, e.g., from a worker.
+
+        Exceptions:
+        ValueError --- the bins or the bands differ.
+
+        Return:
+        The object itself.
+        """
+
+        if self._config()!=other._config():
+            raise ValueError("The statistics have different bins.")
+
+        self.n+=other.n
+        self.invalid+=other.invalid
+        self.sumQ+=other.sumQ
+        self.sumQ2+=other.sumQ2
+        self.min=min(self.min, other.min)
+        self.max=max(self.max, other.max)
+        self.hist+=other.hist
+        self._addFine(other.fineBin, other.fine)
+        self.bandCount=[a+b for a, b in zip(self.bandCount, other.bandCount)]
+
+        return self
+
+
+    def _config(self):
+        """The parameters of the constructor."""
+
+        return (self.lo, self.hi, self.width, self.resolution, self.bands)
+
+
+    def blank(self):
+        """An empty accumulator with the same bins and bands."""
+
+        [lo, hi, width, resolution, bands]=self._config()
+
+        return TmStats(lo, hi, width, resolution, bands)
+
+
+    def mean(self):
+        """The mean of Tm (NaN if no value)."""
+
+        if self.n==0:
+            return math.nan
+
+        return float(Fraction(self.sumQ, self.n*self._unit_))
+
+
+    def var(self):
+        """The (population) variance of Tm (NaN if no value)."""
+
+        if self.n==0:
+            return math.nan
+
+        n=self.n
+
+        return float(Fraction(n*self.sumQ2-self.sumQ**2
+                            , n*n*self._unit_**2))
+
+
+    def sd(self):
+        """The (population) standard deviation of Tm."""
+
+        return math.sqrt(self.var())
+
+
+    def quantile(self, p):
+        """The quantile at p from the sketch.
+
+        The value is the center of the fine bin holding the rank
+        ceil(p*n), kept within the extremes, so it is within half the
+        resolution of the exact order statistic, whatever the range of
+        the histogram.
+
+        Parameters:
+        p : float --- the probability, 0 to 1.
+
+        Return:
+        The quantile (celsius), NaN if no value.
+        """
+
+        if self.n==0:
+            return math.nan
+
+        rank=max(math.ceil(p*self.n), 1)
+
+        i=int(np.searchsorted(np.cumsum(self.fine), rank))
+
+        q=float(self.fineBin[i])*self.resolution
+
+        return min(max(q, self.min), self.max)
+
+
+    def summary(self, probs=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """The statistics as lines of text, delimited by tab.
+
+        Parameters:
+        probs : tuple --- the probabilities of the quantiles given.
+
+        Return:
+        A list of lines: the count, the mean and the standard
+        deviation, the extremes, the quantiles, the counts within the
+        bands, and the histogram (bin lo, bin hi, count).
+        """
+
+        delimiter="\t"
+
+        out=["Statistic"+delimiter+"Value"
+           , "N"+delimiter+str(self.n)
+           , "Invalid"+delimiter+str(self.invalid)
+           , "Mean(C)"+delimiter+f"{self.mean():7.2f}"
+           , "SD(C)"+delimiter+f"{self.sd():7.2f}"
+           , "Min(C)"+delimiter+f"{self.min:7.2f}"
+           , "Max(C)"+delimiter+f"{self.max:7.2f}"]
+
+        for p in probs:
+            out.append(f"Q{p*100:g}(C)"+delimiter+f"{self.quantile(p):7.2f}")
+
+        for [a, b], c in zip(self.bands, self.bandCount):
+            out.append(f"Band[{a:g},{b:g}]"+delimiter+str(c))
+
+        out.append(delimiter.join(["Bin_lo(C)", "Bin_hi(C)", "Count"]))
+
+        edges=[-math.inf]+[self.lo+i*self.width
+                                    for i in range(len(self.hist)-1)]+[math.inf]
+
+        for i, c in enumerate(self.hist):
+            out.append(delimiter.join([f"{edges[i]:g}", f"{edges[i+1]:g}"
+                                                          , str(int(c))]))
+
+        return out
+
+
+    def __init__(self, lo=0.0, hi=100.0, width=1.0, resolution=0.01
+                                                          , bands=()):
+        """Constructor.
+
+        Parameters:
+        lo, hi     : float --- the range of the histograms (celsius)
+                               (default 0 to 100).
+        width      : float --- the bin width of the histogram
+                               (default 1).
+        resolution : float --- the bin width of the quantile sketch
+                               (default 0.01).
+        bands      : list  --- the bands (lo, hi) of Tm to count
+                               (default none).
+
+        Exceptions:
+        ValueError --- the range or the bin widths are not positive.
+        """
+
+        if not hi>lo or not width>0 or not resolution>0:
+            raise ValueError("The range and the bin widths should be"
+                                                          " positive.")
+
+        self.lo=float(lo)
+        self.hi=float(hi)
+        self.width=float(width)
+        self.resolution=float(resolution)
+        self.bands=tuple((float(a), float(b)) for [a, b] in bands)
+
+        self.n=0
+        self.invalid=0
+        self.sumQ=0
+        self.sumQ2=0
+        self.min=math.inf
+        self.max=-math.inf
+
+        nBin=int(round((self.hi-self.lo)/self.width))
+        self.hist=np.zeros(nBin+2, dtype=np.int64)
+
+        self.fineBin=np.zeros(0, dtype=np.int64)
+        self.fine=np.zeros(0, dtype=np.int64)
+
+        self.bandCount=[0]*len(self.bands)
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(__class__.__name__)
+
+
+def foldBatch(myThermo, oligo, stats, cond=None, chunk=1<<16):
+    """Fold the Tm of a batch of duplexes into a TmStats.
+
+    The duplexes are calculated in chunks by Thermo.TmChunks, so that
+    the memory used does not grow with the batch.
+
+    Parameters:
+    myThermo : Thermo     --- the object for the calculation.
+    oligo    : dictionary --- duplexes in "top/bottom" format by name.
+    stats    : TmStats    --- the accumulator.
+    cond     : dictionary --- per duplex conditions (default None).
+                              See Thermo.thermoBatch.
+    chunk    : int        --- number of duplexes per chunk
+                              (default 65536).
+
+    Exceptions:
+    see Thermo.thermoArr.
+
+    Return:
+    The accumulator.
+    """
+
+    for tm in myThermo.TmChunks(oligo, cond, chunk):
+        stats.add(tm)
+
+    return stats
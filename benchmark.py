@@ -0,0 +1,238 @@
+"""This tool benchmarks the vectorized calculations of the 'Thermo'
+class on random duplexes.
+
+The thread test times Thermo.thermoBatch in one thread against
+Thermo.thermoThreads over thread pools of increasing size, all sharing
+one 'Thermo' object. The speedup is limited by the GIL on a regular
+build, and shows the thread scaling on a free-threaded build (e.g.,
+python3.13t).
+
+The salt test times Thermo.TmArr with each salt correction model (see
+the module salt) on the same batch of dH, dS, lengths and GC
+fractions, under the conditions of the object, under distinct per
+duplex conditions, and under per duplex conditions of a few levels,
+whose salt constants are calculated once per level.
+
+The equilibrium test times equilibrium.solveEquilibrium on a random
+network of strands at several temperatures, and splits one run by
+phase with cProfile: the starting point, the Hessian, the Newton
+solve and the line search.
+
+This script imports the custom modules 'thermo', 'salt' and
+'equilibrium', and numpy. 
+"""
+
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+
+import numpy as np
+
+import thermo
+import salt
+import equilibrium
+
+
+def randomOligo(n, lo=18, hi=30, seed=0):
+    """Random perfect match duplexes.
+
+    Parameters:
+    n    : int --- number of duplexes.
+    lo   : int --- shortest length (default 18).
+    hi   : int --- longest length (default 30).
+    seed : int --- random seed (default 0).
+
+    Return:
+    A dictionary of duplexes in "top/bottom" format by name.
+    """
+
+    rng=np.random.default_rng(seed)
+
+    comp=str.maketrans("ACGT", "TGCA")
+
+    oligo={}
+    for i in range(n):
+
+        top="".join(rng.choice(list("ACGT"), rng.integers(lo, hi+1)))
+        oligo[f"d{i:08d}"]=top+"/"+top.translate(comp)
+
+    return oligo
+
+
+def _best(f, repeat):
+    """The best time of repeat runs of f, and its last result."""
+
+    t=[]
+    for _ in range(repeat):
+        t0=time.perf_counter()
+        out=f()
+        t.append(time.perf_counter()-t0)
+
+    return [min(t), out]
+
+
+def benchThreads(myThermo, oligo, workers, chunk, repeat=3):
+    """Time thermoBatch and thermoThreads.
+
+    Parameters:
+    myThermo : Thermo     --- the object shared by the threads.
+    oligo    : dictionary --- duplexes.
+    workers  : list       --- thread pool sizes.
+    chunk    : int        --- number of duplexes per task.
+    repeat   : int        --- the best of repeat runs (default 3).
+
+    Return:
+    A list of tab delimited strings with a header.
+    """
+
+    [base, ref]=_best(lambda: myThermo.thermoBatch(oligo), repeat)
+
+    table=["\t".join(["Workers", "Seconds", "Duplexes/s", "Speedup"])]
+    table.append(f"batch\t{base:.3f}\t{len(oligo)/base:.0f}\t1.00")
+
+    for w in workers:
+
+        [t, out]=_best(lambda: myThermo.thermoThreads(oligo, workers=w
+                                                        , chunk=chunk)
+                       , repeat)
+
+        if out!=ref:
+            raise RuntimeError("The threads and the batch disagree.")
+
+        table.append(f"{w}\t{t:.3f}\t{len(oligo)/t:.0f}\t{base/t:.2f}")
+
+    return table
+
+
+def benchSalt(oligo, na=50, mg=1.5, repeat=3, seed=0):
+    """Time TmArr with each salt correction model on the same batch.
+
+    Parameters:
+    oligo  : dictionary --- duplexes.
+    na     : float      --- monovalent salt concentration in mM (50).
+    mg     : float      --- divalent salt concentration in mM (1.5).
+    repeat : int        --- the best of repeat runs (default 3).
+    seed   : int        --- random seed of the per duplex conditions
+                            (default 0).
+
+    Return:
+    A list of tab delimited strings with a header.
+    """
+
+    pairs=list(oligo.values())
+
+    myThermo=thermo.Thermo(na=na, mg=mg)
+
+    [dH, dS, length]=myThermo._dHdSPairs(pairs)
+    gc=myThermo._gcPairs(pairs)
+
+    # per duplex conditions around those of the object
+    rng=np.random.default_rng(seed)
+    n=len(pairs)
+
+    table=["\t".join(["Model", "Conditions", "Seconds", "Duplexes/s"
+                                                   , "Mean Tm(C)"])]
+
+    for name in sorted(salt.models):
+
+        myThermo=thermo.Thermo(na=na, mg=mg, saltModel=salt.models[name]())
+
+        cond=myThermo._condArr(n, None, None, None, rng.uniform(0.5, 2, n)*na
+                                               , rng.uniform(0.5, 2, n)*mg)
+
+        # a few levels, as in a file of conditions
+        few=myThermo._condArr(n, None, None, None
+                             , rng.choice([0.5, 1, 2], n)*na
+                             , rng.choice([0.5, 1, 2], n)*mg)
+
+        for [label, c] in [["object", None], ["per duplex", cond]
+                                           , ["9 levels", few]]:
+
+            [t, Tm]=_best(lambda: myThermo.TmArr(dH, dS, length, c, gc)
+                                                              , repeat)
+
+            table.append(f"{name}\t{label}\t{t:.4f}\t{n/t:.0f}"
+                                              f"\t{np.mean(Tm):.2f}")
+
+    return table
+
+
+def benchEquilibrium(S=300, D=2000, B=20, repeat=3, seed=0):
+    """Time solveEquilibrium on a random network, split by phase.
+
+    Parameters:
+    S      : int --- number of strands (default 300).
+    D      : int --- number of duplexes (default 2000).
+    B      : int --- number of systems, e.g., temperatures (default 20).
+    repeat : int --- the best of repeat runs (default 3).
+    seed   : int --- random seed (default 0).
+
+    Return:
+    A list of tab delimited strings with a header.
+    """
+
+    rng=np.random.default_rng(seed)
+
+    pair=rng.integers(0, S, (D, 2))
+    lnK=rng.uniform(5, 30, (B, D))
+    conc=rng.uniform(1e-9, 1e-6, S)
+
+    solve=lambda: equilibrium.solveEquilibrium(lnK, pair, conc)
+
+    [total, [_, _, it]]=_best(solve, repeat)
+
+    prof=cProfile.Profile()
+    prof.runcall(solve)
+
+    # cumulative seconds by function name
+    cum={}
+    for [[_, _, name], [_, _, _, ct, _]] in pstats.Stats(prof).stats.items():
+        cum[name]=cum.get(name, 0.0)+ct
+
+    phases=[["start", cum.get("_start", 0.0)]
+           , ["Hessian", cum.get("_hessian", 0.0)]
+           , ["Newton solve", cum.get("solve", 0.0)]
+           , ["line search", cum.get("_lineSearch", 0.0)]]
+    phases.append(["other", cum.get("solveEquilibrium", 0.0)
+                                           -sum(t for [_, t] in phases)])
+
+    table=[f"S={S}, D={D}, B={B}: {total:.3f} s, {it} iterations"]
+    table.append("\t".join(["Phase", "Seconds", "Share"]))
+
+    whole=max(cum.get("solveEquilibrium", 0.0), 1e-12)
+    for [label, t] in phases:
+        table.append(f"{label}\t{t:.3f}\t{t/whole:.0%}")
+
+    return table
+
+
+def main():
+    """Benchmark the vectorized calculations."""
+
+    argParser=argparse.ArgumentParser(description=__doc__)
+    argParser.add_argument('-n', help="number of duplexes (200000)"
+                               , type=int, default=200000)
+    argParser.add_argument('-w', '--workers', help="thread pool sizes"
+                               , type=int, nargs='+', default=[1, 2, 4, 8])
+    argParser.add_argument('-c', '--chunk', help="duplexes per task (10000)"
+                               , type=int, default=10000)
+
+    args=argParser.parse_args()
+
+    gil=getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'on' if gil else 'off'}")
+
+    myThermo=thermo.Thermo()
+    oligo=randomOligo(args.n)
+
+    print("\n".join(benchThreads(myThermo, oligo, args.workers, args.chunk)))
+    print()
+    print("\n".join(benchSalt(oligo)))
+    print()
+    print("\n".join(benchEquilibrium()))
+
+
+if __name__=='__main__':
+    main()
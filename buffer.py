@@ -0,0 +1,155 @@
+"""This is a module for choosing the buffer conditions of a primer set.
+
+The monovalent and the divalent salt and the primer concentrations
+are searched over a grid. dH and dS of each duplex are calculated
+once, and Tm and perB over the whole grid come from the vectorized
+salt correction and perB of 'Thermo' (see Thermo.TmArr and
+Thermo.perBLog).
+
+Two objectives are supported:
+1. With a target window of Tm, the margin of the set, i.e., the
+   smallest distance of a Tm inside the window to its edges, is
+   maximised. It is negative when a Tm falls outside.
+2. Otherwise, the smallest perB of the set at the annealing
+   temperature is maximised.
+
+At the best conditions, the sensitivity of each duplex is the change
+of its Tm and perB for a 10% increase of each condition.
+
+The module needs a 'Thermo' object and numpy.
+
+Functions:
+optimizeBuffer(*) --- search the buffer conditions of a primer set.
+"""
+
+import numpy as np
+
+
+def _score(myThermo, dH, dS, length, gc, cond, window):
+    """The Tm, perB and the objective of a set under conditions.
+
+    Parameters:
+    myThermo : Thermo --- the object for the calculation.
+    dH       : array  --- enthalpy (kcal/mol), one item per duplex.
+    dS       : array  --- entropy (e.u.) before salt correction.
+    length   : array  --- duplex lengths.
+    gc       : array  --- GC fractions (see Thermo.TmArr).
+    cond     : list   --- conditions from Thermo._condArr, one row per
+                          grid point and one column per duplex.
+    window   : tuple  --- (lo, hi) of Tm (celsius), or None.
+
+    Return:
+    A list with the arrays of Tm, perB and the objective, one item per
+    grid point for the objective.
+    """
+
+    R=myThermo._R_
+    [temper, cp, ct]=cond[:3]
+
+    saltK=myThermo._saltConst(cond)
+
+    Tm=myThermo.TmArr(dH, dS, length, cond, gc, saltK)
+
+    dG=dH-temper*(dS+myThermo._dSsalt(length, cond, dH, gc, saltK))/1000
+    perB=myThermo.perBLog(-dG*1000/R/temper, cp, ct)
+
+    if window is None:
+        obj=perB.min(axis=-1)
+    else:
+        obj=np.minimum(Tm-window[0], window[1]-Tm).min(axis=-1)
+
+    return [Tm, perB, obj]
+
+
+def optimizeBuffer(myThermo, oligo, na, mg, cp, window=None, temper=None
+                                                        , batch=1000000):
+    """Search the buffer conditions of a primer set over a grid.
+
+    Parameters:
+    myThermo : Thermo     --- the other conditions (ct), and the
+                              annealing temperature by default.
+    oligo    : dictionary --- duplexes in "top/bottom" format, as in
+                              Thermo.thermoCal0, by name.
+    na       : list       --- monovalent salt concentrations (mM).
+    mg       : list       --- divalent salt concentrations (mM).
+    cp       : list       --- primer concentrations (nM).
+    window   : tuple      --- (lo, hi) of Tm (celsius) to maximise the
+                              margin of, or None to maximise the
+                              smallest perB (default None).
+    temper   : float      --- the annealing temperature (celsius)
+                              (default None, the temperature of
+                              myThermo).
+    batch    : int        --- largest number of duplexes times grid
+                              points evaluated at a time
+                              (default 1000000).
+
+    Exceptions:
+    see Thermo.thermoArr.
+
+    Return:
+    A dictionary with the best conditions 'na', 'mg' (mM) and 'cp'
+    (nM), the objective 'score', 'Tm' and 'perB' of the duplexes by
+    name, and 'sensitivity', a table (a list of tab delimited strings
+    with a header) of the change of Tm and perB of each duplex for a
+    10% increase of each condition.
+    """
+
+    names=sorted(oligo.keys())
+    P=len(names)
+
+    [dH, dS, length]=myThermo._dHdSPairs([oligo[n] for n in names])
+    gc=myThermo._gcPairs([oligo[n] for n in names])
+
+    grid=np.array(np.meshgrid(np.asarray(na, dtype=float)
+                            , np.asarray(mg, dtype=float)
+                            , np.asarray(cp, dtype=float)
+                            , indexing='ij')).reshape(3, -1).T
+
+    def _cond(g):
+        # conditions of the grid points g (G x 3) for all the duplexes
+        n=len(g)*P
+        c=myThermo._condArr(n, temper, g[:, 2].repeat(P), None
+                                , g[:, 0].repeat(P), g[:, 1].repeat(P))
+
+        return [x.reshape(len(g), P) for x in c]
+
+    # the best grid point, evaluated in batches
+    step=max(batch//max(P, 1), 1)
+
+    best=-np.inf
+    at=0
+    for b in range(0, len(grid), step):
+
+        g=grid[b:b+step]
+        obj=_score(myThermo, dH, dS, length, gc, _cond(g), window)[2]
+
+        i=int(np.argmax(obj))
+        if obj[i]>best:
+            [best, at]=[float(obj[i]), b+i]
+
+    point=grid[at]
+
+    # the best point, then each condition increased by 10%
+    probe=np.repeat(point[None, :], 4, axis=0)
+    probe[np.arange(1, 4), np.arange(3)]*=1.1
+
+    [Tm, perB, _]=_score(myThermo, dH, dS, length, gc, _cond(probe), window)
+
+    dTm=Tm[1:]-Tm[0]
+    dPerB=perB[1:]-perB[0]
+
+    delimiter="\t"
+    table=[delimiter.join(["Name", "Tm(C)", "perB"]
+                        +[f"dTm_{c}" for c in ('na', 'mg', 'cp')]
+                        +[f"dperB_{c}" for c in ('na', 'mg', 'cp')])]
+
+    for j, n in enumerate(names):
+
+        row=[f"{Tm[0, j]:.2f}", f"{perB[0, j]:.4f}"] \
+           +[f"{x:.3f}" for x in dTm[:, j]]+[f"{x:.4f}" for x in dPerB[:, j]]
+
+        table.append(delimiter.join([n]+row))
+
+    return {'na':float(point[0]), 'mg':float(point[1]), 'cp':float(point[2])
+          , 'score':best, 'Tm':dict(zip(names, Tm[0].tolist()))
+          , 'perB':dict(zip(names, perB[0].tolist())), 'sensitivity':table}
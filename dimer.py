@@ -0,0 +1,367 @@
+"""This is a module for screening primer pools for stable dimers.
+
+Two primers form a dimer when they pair antiparallel at some offset.
+Along each such alignment (a diagonal), the most stable duplex is
+found among all its flush sub-duplexes, scored with the same nearest
+neighbor parameters, initiation, terminal AT and salt corrections as
+Thermo.thermoCal0 (but no symmetry correction), plus the dangling end
+parameters ('D' in the parameter files) where one strand overhangs 
+the other at the end of the alignment.
+
+Only the diagonals holding a complementary seed of k bases are scored.
+They are found from a k-mer index of the pool, so the cost follows the
+number of plausible alignments rather than all the pairs and offsets.
+
+The module needs the custom modules utilSeq and error, a 'Thermo'
+object and numpy.
+
+Functions:
+screenDimers(*) --- screen a primer pool for stable dimers.
+dimerDG(*)      --- the most stable dG (optionally with dH and dS)
+                    along each given diagonal.
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import error
+import utilSeq
+
+
+# the pool shared by the worker processes, see _initWorker
+_pool={}
+
+
+def _encodePool(seqs):
+    """Encode primers into a padded 2D array of base codes.
+
+    Parameters:
+    seqs : list --- primers (5'->3').
+
+    Return:
+    A list with the codes (one primer per row, padded with 5) and the
+    lengths.
+    """
+
+    lens=np.array([len(s) for s in seqs], dtype=np.intp)
+
+    code=np.full((len(seqs), lens.max()+1), 5, dtype=np.uint8)
+    for i, s in enumerate(seqs):
+        code[i, :lens[i]]=utilSeq.seqEncode(s)
+
+    return [code, lens]
+
+
+def _kmers(code, k):
+    """The k-mers of the primers and of their reverse complements.
+
+    Parameters:
+    code : array --- padded primer codes (see _encodePool).
+    k    : int   --- k-mer length.
+
+    Return:
+    A list with the primer ids, positions, k-mer values and the values
+    of the reverse complements, for the k-mers with only A, C, G and T.
+    """
+
+    win=np.lib.stride_tricks.sliding_window_view(code, k, axis=1)
+    win=win.astype(np.int64)
+
+    weight=4**np.arange(k-1, -1, -1, dtype=np.int64)
+
+    valid=(win<4).all(axis=2)
+    val=(win*weight).sum(axis=2)
+    rc=((3-win[:, :, ::-1])*weight).sum(axis=2)
+
+    [pid, pos]=np.nonzero(valid)
+
+    return [pid, pos, val[pid, pos], rc[pid, pos]]
+
+
+def _bestRun(start, stack, end):
+    """The most stable run of base pairs along each diagonal.
+
+    A run from the pair u to the pair v (u<v) scores start[:, u], the
+    nearest neighbors stack[:, u] to stack[:, v-1] and end[:, v]. The
+    best run is found by one scan over the pairs.
+
+    Parameters:
+    start : list --- the terms of a run starting at each pair, as
+                     arrays of dG and optionally dH and dS, one row
+                     per diagonal. dG is inf where not allowed.
+    stack : list --- the terms of the nearest neighbors, one column
+                     fewer than start.
+    end   : list --- the terms of a run ending at each pair.
+
+    Return:
+    A list with dG, and dH and dS if given, of the best run of each
+    diagonal. dG is inf where no run is allowed.
+    """
+
+    n=len(start[0])
+
+    # F: the best run ending at the pair j, without its end terms
+    F=[np.full(n, np.inf)]+[np.zeros(n) for _ in start[1:]]
+    best=[np.full(n, np.inf)]+[np.zeros(n) for _ in start[1:]]
+
+    for j in range(1, stack[0].shape[1]+1):
+
+        take=start[0][:, j-1]<F[0]
+        F=[np.where(take, s[:, j-1], f)+t[:, j-1]
+                                    for f, s, t in zip(F, start, stack)]
+
+        fin=[f+e[:, j] for f, e in zip(F, end)]
+
+        better=fin[0]<best[0]
+        best=[np.where(better, x, b) for x, b in zip(fin, best)]
+
+    return best
+
+
+def dimerDG(myThermo, code, lens, p, q, c, parts=False):
+    """The most stable dG along each given diagonal.
+
+    On a diagonal c, the base i of primer p pairs with the base c-i
+    of primer q. Every flush sub-duplex on the diagonal is a
+    candidate, found by a scan over the diagonal vectorized over all
+    the diagonals (see _bestRun).
+
+    Parameters:
+    myThermo : Thermo --- the conditions for the calculation.
+    code     : array  --- padded primer codes (see _encodePool).
+    lens     : array  --- primer lengths.
+    p        : array  --- the first primer of each diagonal.
+    q        : array  --- the second primer of each diagonal.
+    c        : array  --- the diagonals.
+    parts    : bool   --- also give dH and dS of the most stable
+                          sub-duplex (default False).
+
+    Return:
+    An array of dG (kcal/mol) at the temperature of myThermo. It is
+    inf where no sub-duplex has all its nearest neighbors supported.
+    With parts, a list with the arrays of dG, dH and dS (salt
+    corrected).
+    """
+
+    T=myThermo._temper
+
+    # the nearest neighbors with the salt correction per nearest
+    # neighbor, and the dangling ends without
+    nnH=myThermo._nnArrH
+    nnS=myThermo._nnArrS+myThermo._dSsalt(2)
+    nnG=nnH-T*nnS/1000
+    nnG[np.isnan(nnG)]=np.inf
+
+    dangleH=np.nan_to_num(myThermo._nnArrH)
+    dangleS=np.nan_to_num(myThermo._nnArrS)
+
+    D=4
+    pad=code.shape[1]-1
+
+    [p, q, c]=[np.asarray(x, dtype=np.intp) for x in (p, q, c)]
+    [mp, nq]=[lens[p], lens[q]]
+
+    a0=np.maximum(0, c-(nq-1))
+    a1=np.minimum(mp-1, c)
+    K=a1-a0+1
+
+    # the base pairs along the diagonals
+    u=np.arange(code.shape[1]-1)
+    a=a0[:, None]+u[None, :]
+
+    inside=u[None, :]<K[:, None]
+
+    top=code[p[:, None], np.where(inside, a, pad)]
+    bottom=code[q[:, None], np.where(inside, c[:, None]-a, pad)]
+
+    # the bases overhanging the ends of the diagonals
+    def _base(seq, i, inside):
+        return np.where(inside, code[seq, np.clip(i, 0, pad)], D)
+
+    topPre=_base(p, a0-1, a0>0)
+    bottomPre=_base(q, c-a0+1, c-a0+1<nq)
+    topPost=_base(p, a1+1, a1+1<mp)
+    bottomPost=_base(q, c-a1-1, c-a1-1>=0)
+
+    nnIndex=myThermo._nnIndex
+
+    left=nnIndex(np.stack([topPre, top[:, 0]], axis=1)
+               , np.stack([bottomPre, bottom[:, 0]], axis=1))[:, 0]
+
+    rows=np.arange(len(p))
+    right=nnIndex(np.stack([top[rows, K-1], topPost], axis=1)
+                , np.stack([bottom[rows, K-1], bottomPost], axis=1))[:, 0]
+
+    isGC=((top==1) & (bottom==2)) | ((top==2) & (bottom==1))
+    idx=nnIndex(top, bottom)
+
+    def _terms(init, term, nn, dangle):
+
+        endX=np.where(isGC, 0.0, term)
+
+        start=init+endX
+        start[:, 0]+=dangle[left]
+
+        end=endX.copy()
+        end[rows, K-1]+=dangle[right]
+
+        return [start, nn[idx], end]
+
+    [startH, stackH, endH]=_terms(0.2, 2.2, nnH, dangleH)
+    [startS, stackS, endS]=_terms(-5.7, 6.9, nnS, dangleS)
+
+    startG=startH-T*startS/1000
+    stackG=nnG[idx]
+    endG=endH-T*endS/1000
+
+    if not parts:
+        return _bestRun([startG], [stackG], [endG])[0]
+
+    return _bestRun([startG, startH, startS], [stackG, stackH, stackS]
+                                            , [endG, endH, endS])
+
+
+def _initWorker(myThermo, code, lens, index, k):
+    """Set up the pool shared by the calls in a worker process."""
+
+    _pool.update(thermo=myThermo, code=code, lens=lens, index=index, k=k)
+
+
+def _screenChunk(first, last, threshold, batch):
+    """Screen the primers first to last-1 against the pool.
+
+    Parameters:
+    first     : int   --- the first primer id.
+    last      : int   --- one past the last primer id.
+    threshold : float --- report pairs with dG <= threshold.
+    batch     : int   --- number of diagonals scored at a time.
+
+    Return:
+    A list with the arrays of the first and the second primer ids, and
+    the worst dG of the pairs reported.
+    """
+
+    myThermo=_pool['thermo']
+    code=_pool['code']
+    lens=_pool['lens']
+    k=_pool['k']
+    [pid, pos, val, rc, order]=_pool['index']
+
+    sortedVal=val[order]
+
+    sel=(pid>=first) & (pid<last)
+    [qp, qi, qrc]=[pid[sel], pos[sel], rc[sel]]
+
+    # the seeds pairing with the reverse complement of each query seed
+    lo=np.searchsorted(sortedVal, qrc, 'left')
+    hi=np.searchsorted(sortedVal, qrc, 'right')
+    n=hi-lo
+
+    hit=order[np.repeat(lo, n)+np.arange(n.sum())-np.repeat(np.cumsum(n)-n, n)]
+
+    p=np.repeat(qp, n)
+    i=np.repeat(qi, n)
+    q=pid[hit]
+    j=pos[hit]
+
+    keep=p<=q
+    [p, q, c]=[p[keep], q[keep], (i+j+k-1)[keep]]
+
+    # one diagonal per pair and offset
+    nPool=len(lens)
+    span=2*code.shape[1]
+
+    key=np.unique((p*nPool+q)*span+c)
+
+    pair=key//span
+    c=key%span
+
+    dG=np.empty(len(key))
+    for b in range(0, len(key), batch):
+
+        s=slice(b, b+batch)
+        dG[s]=dimerDG(myThermo, code, lens, pair[s]//nPool, pair[s]%nPool, c[s])
+
+    # the worst dG of each pair
+    [pair, head]=np.unique(pair, return_index=True)
+    worst=np.minimum.reduceat(dG, head) if len(dG)>0 else dG
+
+    report=worst<=threshold
+    pair=pair[report]
+
+    return [pair//nPool, pair%nPool, worst[report]]
+
+
+def screenDimers(myThermo, primers, threshold=-6.0, k=5, workers=1
+                                                        , batch=100000):
+    """Screen a primer pool for stable dimers.
+
+    Every pair of primers, including each primer with itself, is
+    checked at every offset holding a complementary seed of k bases.
+
+    Parameters:
+    myThermo  : Thermo     --- the conditions for the calculation.
+    primers   : dictionary --- primers (5'->3') by name.
+    threshold : float      --- report the pairs with dG (kcal/mol)
+                               <= threshold (default -6.0).
+    k         : int        --- seed length (default 5).
+    workers   : int        --- number of worker processes (default 1,
+                               no process pool).
+    batch     : int        --- number of diagonals scored at a time
+                               (default 100000).
+
+    Exceptions:
+    NotDNAError --- a primer has a letter other than A, C, G and T.
+    ValueError  --- the salt model of myThermo is not additive, as
+                    needed by the nearest neighbor dG.
+
+    Return:
+    A list of (name1, name2, dG), sorted by dG, with the worst dG of
+    each pair reported.
+    """
+
+    myThermo._additiveSalt()
+
+    names=sorted(primers.keys())
+    if len(names)==0:
+        return []
+
+    for n in names:
+        if re.search("[^ACGT]", primers[n].upper()):
+            raise error.NotDNAError(primers[n])
+
+    [code, lens]=_encodePool([primers[n] for n in names])
+
+    [pid, pos, val, rc]=_kmers(code, k)
+    index=[pid, pos, val, rc, np.argsort(val, kind='stable')]
+
+    N=len(names)
+
+    if workers<=1:
+
+        _initWorker(myThermo, code, lens, index, k)
+        results=[_screenChunk(0, N, threshold, batch)]
+
+    else:
+
+        # more chunks than workers, since the first primers pair with
+        # more of the pool (p<=q)
+        bounds=np.linspace(0, N, 4*workers+1).astype(int)
+
+        with ProcessPoolExecutor(workers, initializer=_initWorker
+                          , initargs=(myThermo, code, lens, index, k)) as ex:
+
+            futures=[ex.submit(_screenChunk, bounds[b], bounds[b+1]
+                          , threshold, batch) for b in range(4*workers)]
+
+            results=[f.result() for f in futures]
+
+    p=np.concatenate([r[0] for r in results])
+    q=np.concatenate([r[1] for r in results])
+    dG=np.concatenate([r[2] for r in results])
+
+    order=np.argsort(dG, kind='stable')
+
+    return [(names[p[i]], names[q[i]], float(dG[i])) for i in order]
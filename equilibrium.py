@@ -0,0 +1,305 @@
+"""This is a module for the competitive hybridization equilibrium of
+a network of strands.
+
+Thermo._perBcal solves the two-state equilibrium of one primer and
+one template. Here any number of strands compete for each other: each
+duplex between strands i and j has an equilibrium constant K from
+Thermo's dH and dS, and the free strand concentrations x solve the
+mass balance
+
+    C_i = x_i + sum over duplexes d of n_id*K_d*prod_j x_j**n_jd
+
+where C_i is the total concentration of strand i and n_id is the
+number of strand i in duplex d (1, or 2 for a self duplex).
+
+The mass balance is the gradient of a strictly convex function of
+y=ln(x), so a Newton iteration with a backtracking line search
+converges from any start. It is vectorized over a batch of systems,
+e.g., the same network at many temperatures.
+
+The module needs a 'Thermo' object and numpy.
+
+Functions:
+networkLnK(*)       --- ln(K) of duplexes at a list of temperatures.
+solveEquilibrium(*) --- equilibrium concentrations from ln(K).
+hybridize(*)        --- equilibrium of a network of named strands.
+"""
+
+import numpy as np
+
+
+# damped fixed point steps before the Newton iteration (see _start)
+_startIter=5
+
+
+def networkLnK(myThermo, pairs, temper):
+    """ln(K) of duplexes at a list of temperatures.
+
+    dS is salt corrected with the conditions of myThermo, as in
+    Thermo.thermoCal0.
+
+    Parameters:
+    myThermo : Thermo --- the conditions for the calculation.
+    pairs    : list   --- duplexes in "top/bottom" format, as in
+                          Thermo.thermoCal0.
+    temper   : list   --- temperatures in celsius.
+
+    Return:
+    An array of ln(K) (K in 1/M), one row per temperature and one
+    column per duplex.
+    """
+
+    R=myThermo._R_
+
+    [dH, dS, length]=myThermo._dHdSPairs(pairs)
+    dSeff=dS+myThermo._dSsalt(length, None, dH, myThermo._gcPairs(pairs))
+
+    T=np.asarray(temper, dtype=float)[:, None]+273.15
+
+    dG=dH[None, :]-T*dSeff[None, :]/1000
+
+    return -dG*1000/R/T
+
+
+def _start(lnK, nu, C):
+    """The starting point of the Newton iteration.
+
+    Starting from the totals, ln(x) of the strands with stable duplexes
+    falls by about 1 per Newton step. A few damped fixed point steps,
+    ln(x_i)=ln(C_i)-ln(1+sum over d of n_id*D_d/x_i) averaged with the
+    last ln(x_i), bring it close to the solution first, at the cost of
+    two matrix products each. The sums are taken in the log domain
+    against overflow.
+
+    Parameters:
+    lnK : array --- scaled ln(K) (B x D).
+    nu  : array --- stoichiometry of the duplexes (D x S).
+    C   : array --- scaled total concentrations (B x S).
+
+    Return:
+    An array of ln(x) (B x S).
+    """
+
+    lnC=np.log(C)
+    y=lnC
+
+    for _ in range(_startIter):
+
+        a=lnK+y@nu.T
+        top=a.max(axis=1, keepdims=True)
+
+        with np.errstate(divide='ignore'):
+            ratio=np.log(np.exp(a-top)@nu)+top-y
+
+        y=(y+lnC-np.logaddexp(0, ratio))/2
+
+    return y
+
+
+def _hessianIndex(pair, S, B):
+    """The flat indexes of the Hessian entries touched by each duplex,
+    in the order of the weights of _hessian.
+
+    Parameters:
+    pair : array --- the two strands of each duplex (D x 2).
+    S    : int   --- number of strands.
+    B    : int   --- number of systems.
+
+    Return:
+    An array of indexes into B x S x S, four per duplex and system.
+    """
+
+    [i, j]=[pair[:, 0], pair[:, 1]]
+
+    hIndex=np.concatenate([i*S+i, j*S+j, i*S+j, j*S+i])
+
+    return (np.arange(B)[:, None]*S*S+hIndex[None, :]).ravel()
+
+
+def _hessian(hIndex, x, D):
+    """The Hessian of the objective, diag(x)+nu^T*diag(D)*nu.
+
+    A self duplex adds 4*D to its one diagonal entry: its two diagonal
+    entries and its two off diagonal entries all fall on the same
+    index.
+
+    Parameters:
+    hIndex : array --- see _hessianIndex.
+    x      : array --- scaled free strand concentrations (B x S).
+    D      : array --- scaled duplex concentrations (B x D).
+
+    Return:
+    An array B x S x S.
+    """
+
+    [B, S]=x.shape
+
+    H=np.bincount(hIndex, np.tile(D, 4).ravel()
+                                  , minlength=B*S*S).reshape(B, S, S)
+    H[:, np.arange(S), np.arange(S)]+=x
+
+    return H
+
+
+def _objective(lnK, nu, C, y):
+    """The convex function of y=ln(x) whose gradient is the mass
+    balance, one item per system.
+    """
+
+    with np.errstate(over='ignore'):
+        return np.exp(y).sum(axis=1)+np.exp(lnK+y@nu.T).sum(axis=1) \
+                                                    -(C*y).sum(axis=1)
+
+
+def _lineSearch(lnK, nu, C, y, grad, step):
+    """A backtracking line search along the Newton steps, per system,
+    with a slack for the round-off of the objective close to the
+    solution.
+
+    Parameters:
+    lnK, nu, C : array --- see _start.
+    y          : array --- ln(x) (B x S).
+    grad       : array --- the gradient at y (B x S).
+    step       : array --- the Newton steps (B x S).
+
+    Return:
+    An array of the new ln(x).
+    """
+
+    g0=_objective(lnK, nu, C, y)
+    slope=(grad*step).sum(axis=1)
+
+    t=np.ones(len(y))
+    for _ in range(60):
+
+        g=_objective(lnK, nu, C, y+t[:, None]*step)
+
+        done=g<=g0+1e-4*t*slope+1e-13*np.abs(g0)
+        if done.all():
+            break
+
+        t=np.where(done, t, t/2)
+
+    return y+t[:, None]*step
+
+
+def solveEquilibrium(lnK, pair, conc, tol=1e-10, maxIter=200):
+    """Equilibrium concentrations of a network of strands from ln(K).
+
+    Parameters:
+    lnK     : array --- ln(K) (K in 1/M) of the duplexes, one row per
+                        system in the batch (B x D), or one row (D).
+    pair    : array --- the two strands of each duplex (D x 2), by
+                        their index.
+    conc    : array --- total strand concentrations (M), one row per
+                        system (B x S), or one row for all (S).
+    tol     : float --- largest relative error of the mass balance
+                        (default 1e-10).
+    maxIter : int   --- largest number of Newton iterations
+                        (default 200).
+
+    Exceptions:
+    ValueError --- a concentration is negative, or all those of a
+                   system are zero, or the iteration does not converge
+                   in maxIter iterations.
+
+    Return:
+    A list with the free strand concentrations (B x S), the duplex
+    concentrations (B x D), both in M, and the number of iterations.
+    """
+
+    lnK=np.atleast_2d(np.asarray(lnK, dtype=float))
+    pair=np.asarray(pair, dtype=np.intp).reshape(-1, 2)
+    conc=np.atleast_2d(np.asarray(conc, dtype=float))
+
+    if (conc<0).any() or not (conc.sum(axis=1)>0).all():
+        raise ValueError("The strand concentrations should not be negative"
+                         " and should not all be zero.")
+
+    B=max(len(lnK), len(conc))
+    S=conc.shape[1]
+
+    lnK=np.broadcast_to(lnK, (B, len(pair)))
+    conc=np.broadcast_to(conc, (B, S))
+
+    # scale the concentrations by the largest in each system
+    c0=conc.max(axis=1, keepdims=True)
+    C=np.maximum(conc/c0, 1e-20)
+    lnK=lnK+np.log(c0)
+
+    # stoichiometry of the duplexes (D x S)
+    nu=np.zeros((len(pair), S))
+    np.add.at(nu, (np.arange(len(pair)), pair[:, 0]), 1.0)
+    np.add.at(nu, (np.arange(len(pair)), pair[:, 1]), 1.0)
+
+    hIndex=_hessianIndex(pair, S, B)
+
+    y=_start(lnK, nu, C)
+
+    for it in range(1, maxIter+2):
+
+        x=np.exp(y)
+        D=np.exp(lnK+y@nu.T)
+
+        grad=x+D@nu-C
+
+        # only the systems not converged yet take a step
+        active=~(np.abs(grad)<=tol*C).all(axis=1)
+        if not active.any():
+            break
+
+        if it>maxIter:
+            raise ValueError(f"The equilibrium of {int(active.sum())} of {B}"
+                             f" systems does not converge in {maxIter}"
+                              " iterations.")
+
+        H=_hessian(hIndex, x, D)
+
+        step=np.zeros((B, S))
+        step[active]=-np.linalg.solve(H[active], grad[active][..., None])[..., 0]
+
+        y=_lineSearch(lnK, nu, C, y, grad, step)
+
+    x=np.exp(y)*c0
+    D=np.exp(lnK+y@nu.T)*c0
+
+    return [x, D, it]
+
+
+def hybridize(myThermo, conc, duplexes, temper):
+    """Equilibrium of a network of named strands at a list of
+    temperatures.
+
+    Parameters:
+    myThermo : Thermo     --- the conditions for the calculation.
+    conc     : dictionary --- total concentration (nM) of each strand
+                              by name.
+    duplexes : dictionary --- duplexes in "top/bottom" format, as in
+                              Thermo.thermoCal0, by a tuple of the
+                              names of the top and the bottom strands.
+    temper   : list       --- temperatures in celsius.
+
+    Exceptions:
+    ValueError --- see solveEquilibrium.
+
+    Return:
+    A list with two dictionaries, one of the free strands and one of
+    the duplexes, by the same keys as the input. The values are arrays
+    of concentrations (nM), one item per temperature.
+    """
+
+    names=list(conc.keys())
+    keys=list(duplexes.keys())
+
+    pair=np.array([[names.index(k[0]), names.index(k[1])] for k in keys]
+                                                                ).reshape(-1, 2)
+
+    lnK=networkLnK(myThermo, [duplexes[k] for k in keys], temper)
+    total=np.array([conc[n] for n in names], dtype=float)*1e-9
+
+    [x, D, _]=solveEquilibrium(lnK, pair, total)
+
+    free={n:x[:, i]*1e9 for i, n in enumerate(names)}
+    bound={k:D[:, d]*1e9 for d, k in enumerate(keys)}
+
+    return [free, bound]
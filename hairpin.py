@@ -0,0 +1,276 @@
+"""This is a module for screening primers for hairpins and self-dimers.
+
+A hairpin folds a primer back on itself: the base i pairs with the
+base c-i, for the pairs with i<c-i, closing a loop of the bases in
+between. It is scored with the nearest neighbor parameters and the
+terminal AT correction of Thermo.thermoCal0 for the stem (with the salt
+correction per nearest neighbor, as the module dimer), no initiation,
+and a loop penalty taken as entropy (SantaLucia J Jr. and Hicks D.,
+(2004), Annu. Rev. Biophys. Biomol. Struct., 33, 415-40), so that the
+Tm of a hairpin, dH/dS, does not depend on the concentrations.
+
+A self-dimer pairs two copies of a primer antiparallel, scored as by
+dimer.dimerDG plus the symmetry correction of two identical strands
+(-1.4 e.u., as in Thermo.thermoCal0). Its Tm is that of a
+self-complementary duplex, with the primer concentration cp as the
+total strand concentration.
+
+Only the diagonals c holding a self-complementary seed of k bases are
+scored. The seeds are matched through an index of the k-mers of the
+primers, keyed by primer and k-mer value, so the cost follows the
+number of plausible stems rather than all the pairs of positions, and
+every diagonal of a batch is scored at once (see dimer._bestRun).
+
+The module needs the custom modules dimer and error, a 'Thermo' object
+and numpy.
+
+Functions:
+hairpinParts(*)    --- dG, dH and dS of the most stable hairpin along
+                       each given diagonal.
+screenStructures(*) --- the most stable hairpin and self-dimer of each
+                       primer.
+"""
+
+import re
+import math
+
+import numpy as np
+
+import error
+import dimer
+
+
+# dG (kcal/mol, 37 C) of hairpin loops by the number of bases
+_loopN=np.array([3, 4, 5, 6, 7, 8, 9, 10, 12, 14, 16, 18, 20, 25, 30])
+_loopG=np.array([3.5, 3.5, 3.3, 4.0, 4.2, 4.3, 4.5, 4.6, 5.0, 5.1, 5.3
+               , 5.5, 5.7, 6.1, 6.3])
+
+
+def _loopS(n):
+    """The entropy (e.u.) of hairpin loops of n bases.
+
+    The dG at 37 C is interpolated from the table, and extrapolated
+    beyond 30 bases by 2.44*R*T*ln(n/30).
+
+    Parameters:
+    n : array --- the number of bases in the loops (>=3).
+
+    Return:
+    An array of dS.
+    """
+
+    n=np.asarray(n, dtype=float)
+
+    G=np.interp(n, _loopN, _loopG)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tail=2.44*1.9872*310.15*np.log(n/_loopN[-1])/1000
+
+    G=np.where(n>_loopN[-1], _loopG[-1]+tail, G)
+
+    return -G*1000/310.15
+
+
+def hairpinParts(myThermo, code, lens, p, c, minLoop=3):
+    """dG, dH and dS of the most stable hairpin along each given
+    diagonal.
+
+    On a diagonal c, the base i of primer p pairs with the base c-i,
+    for i<=(c-1-minLoop)/2. Every run of base pairs on the diagonal is
+    a candidate stem, closing a loop of c-2v-1 bases at its inner
+    pair v.
+
+    Parameters:
+    myThermo : Thermo --- the conditions for the calculation.
+    code     : array  --- padded primer codes (see dimer._encodePool).
+    lens     : array  --- primer lengths.
+    p        : array  --- the primer of each diagonal.
+    c        : array  --- the diagonals.
+    minLoop  : int    --- the fewest bases in a loop (default 3).
+
+    Return:
+    A list with the arrays of dG (kcal/mol) at the temperature of
+    myThermo, dH and dS (salt corrected, with the loop). dG is inf
+    where no stem has all its nearest neighbors supported.
+    """
+
+    T=myThermo._temper
+
+    nnH=myThermo._nnArrH
+    nnS=myThermo._nnArrS+myThermo._dSsalt(2)
+    nnG=nnH-T*nnS/1000
+    nnG[np.isnan(nnG)]=np.inf
+
+    pad=code.shape[1]-1
+
+    [p, c]=[np.asarray(x, dtype=np.intp) for x in (p, c)]
+
+    a0=np.maximum(0, c-(lens[p]-1))
+    a1=(c-1-minLoop)//2
+    K=a1-a0+1
+
+    # the base pairs along the diagonals, from the outer end
+    u=np.arange(max((code.shape[1]-1)//2, 1))
+    a=a0[:, None]+u[None, :]
+
+    inside=u[None, :]<K[:, None]
+
+    top=code[p[:, None], np.where(inside, a, pad)]
+    bottom=code[p[:, None], np.where(inside, c[:, None]-a, pad)]
+
+    isGC=((top==1) & (bottom==2)) | ((top==2) & (bottom==1))
+    idx=myThermo._nnIndex(top, bottom)
+
+    loopS=_loopS(np.maximum(c[:, None]-2*a-1, minLoop))
+
+    endH=np.where(isGC, 0.0, 2.2)
+    endS=np.where(isGC, 0.0, 6.9)
+
+    start=[endH-T*endS/1000, endH, endS]
+    stack=[nnG[idx], nnH[idx], nnS[idx]]
+    end=[endH-T*(endS+loopS)/1000, endH, endS+loopS]
+
+    return dimer._bestRun(start, stack, end)
+
+
+def _seedDiagonals(code, k, minLoop):
+    """The diagonals of the primers holding a self-complementary seed.
+
+    Parameters:
+    code    : array --- padded primer codes (see dimer._encodePool).
+    k       : int   --- seed length.
+    minLoop : int   --- the fewest bases in a hairpin loop.
+
+    Return:
+    A list with the primers, the diagonals and whether a seed on the
+    diagonal leaves room for a hairpin loop, one item per primer and
+    diagonal. The seed at i pairs with the k-mer at j on the diagonal
+    i+j+k-1.
+    """
+
+    [pid, pos, val, rc]=dimer._kmers(code, k)
+
+    # the k-mers keyed by primer and value
+    key=pid.astype(np.int64)*4**k+val
+    order=np.argsort(key, kind='stable')
+    sortedKey=key[order]
+
+    query=pid.astype(np.int64)*4**k+rc
+
+    lo=np.searchsorted(sortedKey, query, 'left')
+    hi=np.searchsorted(sortedKey, query, 'right')
+    n=hi-lo
+
+    hit=order[np.repeat(lo, n)+np.arange(n.sum())-np.repeat(np.cumsum(n)-n, n)]
+
+    p=np.repeat(pid, n)
+    i=np.repeat(pos, n)
+    j=pos[hit]
+
+    # each pair of seeds once, from the seed on the 5' side
+    keep=i<=j
+    [p, i, j]=[p[keep], i[keep], j[keep]]
+
+    fold=j-(i+k-1)-1>=minLoop
+
+    span=2*code.shape[1]
+    key=p.astype(np.int64)*span+(i+j+k-1)
+
+    order=np.argsort(key, kind='stable')
+    [key, fold]=[key[order], fold[order]]
+
+    [key, head]=np.unique(key, return_index=True)
+    fold=np.maximum.reduceat(fold, head) if len(key)>0 else fold
+
+    return [key//span, key%span, fold]
+
+
+def screenStructures(myThermo, primers, k=3, minLoop=3, batch=100000):
+    """The most stable hairpin and self-dimer of each primer.
+
+    Parameters:
+    myThermo : Thermo --- the conditions for the calculation.
+    primers  : list   --- primers (5'->3').
+    k        : int    --- seed length (default 3, since the stems
+                          of primers are often short).
+    minLoop  : int    --- the fewest bases in a hairpin loop
+                          (default 3).
+    batch    : int    --- number of primers screened at a time
+                          (default 100000).
+
+    Exceptions:
+    NotDNAError --- a primer has a letter other than A, C, G and T.
+    ValueError  --- the salt model of myThermo is not additive, as
+                    needed by the nearest neighbor dG.
+
+    Return:
+    A dictionary of arrays, one item per primer: hairpinG and
+    hairpinTm, dimerG and dimerTm, the dG (kcal/mol) at the
+    temperature of myThermo and the Tm (celsius) of the most stable
+    hairpin and self-dimer. dG is inf and Tm NaN where none is found.
+    """
+
+    myThermo._additiveSalt()
+
+    for s in primers:
+        if re.search("[^ACGT]", s.upper()):
+            raise error.NotDNAError(s)
+
+    R=myThermo._R_
+    n=len(primers)
+
+    out={x:np.full(n, np.inf if x.endswith('G') else np.nan)
+                for x in ('hairpinG', 'hairpinTm', 'dimerG', 'dimerTm')}
+
+    if n==0:
+        return out
+
+    for first in range(0, n, batch):
+
+        last=min(first+batch, n)
+
+        [code, lens]=dimer._encodePool([s.upper() for s in primers[first:last]])
+
+        [p, c, fold]=_seedDiagonals(code, k, minLoop)
+
+        # self-dimers on every seeded diagonal, with the symmetry
+        # correction of two copies of one strand
+        [G, H, S]=dimer.dimerDG(myThermo, code, lens, p, p, c, parts=True)
+        S=S-1.4
+        G=G+myThermo._temper*1.4/1000
+        Tm=H*1000/(S+R*math.log(myThermo._cp))-273.15
+
+        _worst(out['dimerG'], out['dimerTm'], first+p, G, Tm)
+
+        # hairpins where the seed leaves room for the loop
+        [p, c]=[p[fold], c[fold]]
+
+        [G, H, S]=hairpinParts(myThermo, code, lens, p, c, minLoop)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Tm=H*1000/S-273.15
+
+        _worst(out['hairpinG'], out['hairpinTm'], first+p, G, Tm)
+
+    return out
+
+
+def _worst(bestG, bestTm, p, G, Tm):
+    """Keep the most stable structure of each primer.
+
+    Parameters:
+    bestG, bestTm : array --- dG and Tm by primer, updated in place.
+    p             : array --- the primer of each structure.
+    G, Tm         : array --- dG and Tm of the structures.
+    """
+
+    ok=np.isfinite(G)
+    [p, G, Tm]=[p[ok], G[ok], Tm[ok]]
+
+    order=np.lexsort((G, p))
+    [p, G, Tm]=[p[order], G[order], Tm[order]]
+
+    [p, head]=np.unique(p, return_index=True)
+
+    better=G[head]<bestG[p]
+    bestG[p[better]]=G[head][better]
+    bestTm[p[better]]=Tm[head][better]
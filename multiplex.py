@@ -0,0 +1,165 @@
+"""This is a module for balancing the Tm of the primers of a multiplex
+panel.
+
+Each primer site is a sequence (5'->3') with the primer anchored at
+its 5' end, and the candidates are its prefixes over a range of
+lengths. The Tm of all the candidates of all the sites come from one
+set of prefix sums of the nearest neighbors (see Thermo.windowSums).
+
+One candidate per site is picked so that the range of Tm over the
+panel is the smallest. With the candidates sorted by Tm, it is the
+shortest run holding a candidate of every site, found by a sweep with
+two pointers in O(N log N) for N candidates.
+
+The module needs the custom module utilSeq, a 'Thermo' object and
+numpy.
+
+Functions:
+candidateTm(*)    --- Tm of the candidate primers of the sites.
+balanceTm(table)  --- pick one candidate per site with the smallest
+                      range of Tm.
+balancePrimers(*) --- balance the forward and the reverse primers of
+                      amplicons.
+"""
+
+import math
+
+import numpy as np
+
+import utilSeq
+
+
+def candidateTm(myThermo, sites, lengths):
+    """Tm of the candidate primers of the sites.
+
+    Parameters:
+    myThermo : Thermo --- the conditions for the calculation.
+    sites    : list   --- primer sites (5'->3'), primer at the 5' end.
+    lengths  : list   --- candidate lengths, each >=2.
+
+    Return:
+    An array of Tm (celsius), one row per site and one column per
+    length. It is NaN where the site is shorter than the length or the
+    candidate has a base other than A, C, G and T.
+    """
+
+    lengths=[int(L) for L in lengths]
+
+    # sites separated by a base coded 5, see Thermo.windowSums
+    code=utilSeq.seqEncode("N".join(sites)+"N")
+    sums=myThermo.windowSums(code)
+
+    size=np.array([len(s) for s in sites], dtype=np.intp)
+    starts=np.concatenate(([0], np.cumsum(size+1)[:-1]))
+
+    table=np.full((len(sites), len(lengths)), np.nan)
+    for j, L in enumerate(lengths):
+
+        fit=np.nonzero(size>=L)[0]
+
+        [dH, dS]=myThermo.windowdHdS(code, L, starts[fit], sums)
+        gc=myThermo.windowGC(code, L, starts[fit])
+        table[fit, j]=myThermo.TmArr(dH, dS, L, None, gc)
+
+    return table
+
+
+def balanceTm(table):
+    """Pick one candidate per site with the smallest range of Tm.
+
+    Parameters:
+    table : array --- Tm of the candidates, one row per site, NaN for
+                      no candidate (see candidateTm).
+
+    Return:
+    A list with the column picked for each site, and the lowest and
+    the highest Tm of the picks. Within the range, the pick of a site
+    is its candidate closest to the middle of the range.
+    """
+
+    table=np.asarray(table, dtype=float)
+    n=len(table)
+
+    [row, col]=np.nonzero(~np.isnan(table))
+
+    missing=np.setdiff1d(np.arange(n), row)
+    if len(missing)>0:
+        raise ValueError(f"Site {missing[0]} has no valid candidate.")
+
+    tm=table[row, col]
+    order=np.argsort(tm, kind='stable')
+
+    group=row[order].tolist()
+    value=tm[order].tolist()
+
+    # the shortest run of sorted candidates covering all the sites
+    count=[0]*n
+    covered=0
+    best=[math.inf, 0.0, 0.0]
+
+    left=0
+    for right, g in enumerate(group):
+
+        if count[g]==0:
+            covered+=1
+        count[g]+=1
+
+        while covered==n:
+
+            span=value[right]-value[left]
+            if span<best[0]:
+                best=[span, value[left], value[right]]
+
+            count[group[left]]-=1
+            if count[group[left]]==0:
+                covered-=1
+            left+=1
+
+    [_, lo, hi]=best
+
+    inside=(table>=lo) & (table<=hi)
+    dist=np.where(inside, np.abs(table-(lo+hi)/2), np.inf)
+
+    return [np.argmin(dist, axis=1), lo, hi]
+
+
+def balancePrimers(myThermo, amplicons, lengths=range(18, 31)):
+    """Balance the forward and the reverse primers of amplicons.
+
+    The forward primer is a prefix of the amplicon, and the reverse
+    primer a prefix of its reverse complement.
+
+    Parameters:
+    myThermo  : Thermo     --- the conditions for the calculation.
+    amplicons : dictionary --- amplicons (5'->3' on the forward strand)
+                               by name.
+    lengths   : list       --- candidate primer lengths
+                               (default 18 to 30).
+
+    Return:
+    A list with a dictionary and the lowest and the highest Tm of the
+    panel. The dictionary holds, by amplicon name, the forward and the
+    reverse primers as (primer, length, Tm).
+    """
+
+    lengths=[int(L) for L in lengths]
+
+    names=list(amplicons.keys())
+    fwd=[amplicons[n].upper() for n in names]
+    rev=[utilSeq.seqRC(s) for s in fwd]
+
+    table=candidateTm(myThermo, fwd+rev, lengths)
+    [pick, lo, hi]=balanceTm(table)
+
+    out={}
+    for i, n in enumerate(names):
+
+        primers=[]
+        for k, site in ((i, fwd[i]), (i+len(names), rev[i])):
+
+            L=lengths[pick[k]]
+            primers.append((site[:L], L, float(table[k, pick[k]])))
+
+        out[n]=primers
+
+    return [out, lo, hi]
@@ -0,0 +1,372 @@
+"""This is a module for searching a reference for off-target binding
+sites of primers.
+
+The reference (a FASTA file) is indexed once by its k-mers. The index
+can be saved to a folder and loaded back memory mapped, so that it is
+built only once per reference.
+
+A primer of length L with at most m mismatches has, by the pigeonhole
+principle, an exact match of at least one of m+1 non-overlapping
+seeds. The candidate sites are looked up from the seeds of the primer
+and of its reverse complement, and then evaluated in bulk with the
+mismatch-aware nearest neighbor sums of Thermo.dHdSArr. Sites with
+consecutive mismatches, which the parameters do not support, are left
+out.
+
+Every position is indexed, including those within k bases of the end
+of a record or of a base other than A, C, G and T: their k-mer holds
+the bases up to there, and its length is kept, so that a seed shorter
+than k is still found up to the end of a record.
+
+The module needs the custom modules error, util and utilSeq, a
+'Thermo' object and numpy.
+
+Classes:
+SeedIndex --- a k-mer index of a reference.
+
+Functions:
+searchOffTargets(*) --- search the reference for primer binding sites.
+"""
+
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+import error
+import util, utilSeq
+
+
+class SeedIndex(object):
+    """A k-mer index of a reference.
+
+    The records of the reference are concatenated into one array of
+    base codes (utilSeq.seqEncode), separated by a base coded 5, so
+    that no k-mer crosses two records.
+
+    Constants and default values
+    _k_      --- default k-mer length (12)
+
+    Attributes:
+    k        --- k-mer length.
+    names    --- record names.
+    starts   --- start of each record in the concatenated codes, plus
+                 the total length at the end.
+    code     --- base codes of the concatenated records.
+    kmer     --- values of the k-mers, sorted. A k-mer cut short by
+                 the end of a record, or by a base other than A, C, G
+                 and T, is padded with A (code 0).
+    pos      --- positions of the k-mers in the same order.
+    run      --- the number of bases of each k-mer up to the cut (at
+                 most k), in the same order.
+
+    Methods:
+    save(folder) --- save the index to a folder.
+    load(folder) --- load an index saved by 'save' (classmethod).
+    lookup(*)    --- positions of the k-mers starting with given seeds.
+    locate(pos)  --- the records and offsets of positions.
+    """
+
+    _k_=12
+
+
+    @staticmethod
+    def _kmerValues(code, k):
+        """The values of all the k-mers of an array of base codes.
+        
+        The value of a k-mer is its base codes read as a number in
+        base 4, the first base being the most significant. A k-mer is
+        taken at every position; the bases from the first one other
+        than A, C, G and T, or past the end, count as A (code 0).
+
+        Parameters:
+        code : array --- base codes.
+        k    : int   --- k-mer length.
+
+        Return:
+        A list with the k-mer values, and the number of bases of each
+        before the first base other than A, C, G and T (at most k).
+        """
+
+        n=len(code)
+        code=np.concatenate((code, np.full(k, 5, dtype=code.dtype)))
+
+        # the distance to the next base other than A, C, G and T
+        badPos=np.nonzero(code>3)[0]
+        nxt=badPos[np.searchsorted(badPos, np.arange(n))]
+        run=np.minimum(nxt-np.arange(n), k)
+
+        val=np.zeros(n, dtype=np.int64)
+        for j in range(k):
+            val=val*4+np.where(j<run, code[j:j+n] & 3, 0)
+
+        return [val, run.astype(np.uint8)]
+
+
+    def save(self, folder):
+        """Save the index to a folder.
+
+        Parameters:
+        folder : str --- the folder, created if not existing.
+        """
+
+        os.makedirs(folder, exist_ok=True)
+
+        for attr in ('code', 'kmer', 'pos', 'run', 'starts'):
+            np.save(Path(folder)/f"seed.{attr}.npy", getattr(self, attr))
+
+        util.saveListToFile([str(self.k)]+self.names
+                          , Path(folder)/"seed.names.txt")
+
+
+    @classmethod
+    def load(cls, folder):
+        """Load an index saved by 'save'.
+
+        The arrays are memory mapped, not read into memory.
+
+        Parameters:
+        folder : str --- the folder.
+
+        Return:
+        A SeedIndex.
+        """
+
+        index=cls.__new__(cls)
+
+        for attr in ('code', 'kmer', 'pos', 'run', 'starts'):
+            arr=np.load(Path(folder)/f"seed.{attr}.npy", mmap_mode='r')
+            setattr(index, attr, arr)
+
+        ls=util.readFileToList(Path(folder)/"seed.names.txt", level=0)
+
+        index.k=int(ls[0])
+        index.names=ls[1:]
+
+        return index
+
+
+    def lookup(self, values, k=None):
+        """Positions of the k-mers with the given values.
+
+        Seeds shorter than the index match every k-mer starting with
+        them, including the k-mers cut short by the end of a record
+        with at least as many bases as the seed.
+
+        Parameters:
+        values : array --- seed values.
+        k      : int   --- seed length, at most the k-mer length
+                           (default None, the k-mer length).
+
+        Return:
+        A list with the index of the value each hit belongs to, and
+        the positions of the hits.
+        """
+
+        kmer=self.kmer
+
+        shift=4**(self.k-(self.k if k is None else k))
+        values=np.asarray(values, dtype=np.int64)
+
+        lo=np.searchsorted(kmer, values*shift, 'left')
+        hi=np.searchsorted(kmer, (values+1)*shift, 'left')
+        n=hi-lo
+
+        which=np.repeat(np.arange(len(values)), n)
+        at=np.repeat(lo, n)+np.arange(n.sum())-np.repeat(np.cumsum(n)-n, n)
+
+        # k-mers cut short before the end of the seed
+        keep=np.asarray(self.run[at])>=(self.k if k is None else k)
+
+        return [which[keep], np.asarray(self.pos[at[keep]])]
+
+
+    def locate(self, pos):
+        """The records and offsets of positions in the concatenated codes.
+
+        Parameters:
+        pos : array --- positions.
+
+        Return:
+        A list with the record ids and the offsets (0 based).
+        """
+
+        rec=np.searchsorted(self.starts, pos, 'right')-1
+
+        return [rec, pos-self.starts[rec]]
+
+
+    def __init__(self, fasta, k=_k_):
+        """Constructor.
+
+        Parameters:
+        fasta : str --- the FASTA file of the reference.
+        k     : int --- k-mer length (default: _k_), at most 31.
+        """
+
+        seqs=util.readFasta(fasta)
+
+        self.k=int(k)
+        self.names=list(seqs.keys())
+
+        lens=np.array([len(seqs[n])+1 for n in self.names], dtype=np.int64)
+        self.starts=np.concatenate(([0], np.cumsum(lens)))
+
+        # records separated by a base coded 5
+        self.code=utilSeq.seqEncode("N".join(seqs[n] for n in self.names)+"N")
+
+        [val, run]=self._kmerValues(self.code, self.k)
+
+        pos=np.nonzero(run>0)[0]
+        val=val[pos]
+
+        order=np.argsort(val, kind='stable')
+
+        self.kmer=val[order]
+        self.pos=pos[order]
+        self.run=run[pos][order]
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(__class__.__name__)
+
+
+def _candidates(index, code, mismatches):
+    """The candidate sites of equal length primers.
+
+    Parameters:
+    index      : SeedIndex --- the index of the reference.
+    code       : array     --- base codes of the primers, one per row,
+                               and of their reverse complements below.
+    mismatches : int       --- the largest number of mismatches.
+
+    A seed holding a base other than A, C, G and T is skipped, so the
+    pigeonhole principle only holds for primers of A, C, G and T (see
+    searchOffTargets).
+
+    Exceptions:
+    ValueError --- the primers are shorter than mismatches+1, so that
+                   the seeds would be empty.
+
+    Return:
+    A list with the row (primer or reverse complement) and the start
+    of each candidate site, without repeats.
+    """
+
+    [n, L]=code.shape
+    k=min(index.k, L//(mismatches+1))
+
+    if k<1:
+        raise ValueError(f"Primers of length {L} are too short for"
+                                        f" {mismatches} mismatches.")
+
+    rows=[]
+    starts=[]
+
+    # m+1 non-overlapping seeds, spread over the primer
+    for off in np.linspace(0, L-k, mismatches+1).astype(int):
+
+        seed=code[:, off:off+k].astype(np.int64)
+
+        valid=np.nonzero((seed<4).all(axis=1))[0]
+        val=(seed[valid]*4**np.arange(k-1, -1, -1)).sum(axis=1)
+
+        [which, pos]=index.lookup(val, k)
+        rows.append(valid[which])
+        starts.append(pos-off)
+
+    rows=np.concatenate(rows)
+    starts=np.concatenate(starts)
+
+    inside=(starts>=0) & (starts+L<=len(index.code))
+
+    key=np.unique(rows[inside]*len(index.code)+starts[inside])
+
+    return [key//len(index.code), key%len(index.code)]
+
+
+def searchOffTargets(myThermo, index, primers, mismatches=2, cutoff=40.0
+                                                        , batch=1000000):
+    """Search the reference for the binding sites of primers.
+
+    A site where the reference reads as the primer is bound on the
+    reverse strand ('-'), and where it reads as the reverse complement
+    on the forward strand ('+').
+
+    Parameters:
+    myThermo   : Thermo     --- the conditions for the calculation.
+    index      : SeedIndex  --- the index of the reference.
+    primers    : dictionary --- primers (5'->3') by name.
+    mismatches : int        --- the largest number of mismatches, none
+                                of them consecutive (default 2).
+    cutoff     : float      --- report the sites with Tm (celsius) >=
+                                cutoff (default 40.0).
+    batch      : int        --- number of sites evaluated at a time
+                                (default 1000000).
+
+    Exceptions:
+    NotDNAError --- a primer has a letter other than A, C, G and T.
+    ValueError  --- a primer is shorter than mismatches+1.
+
+    Return:
+    A list of (primer, record, offset, strand, mismatches, Tm), sorted
+    by primer name and by Tm from the highest. The offset is 0 based,
+    at the 5' end of the site on the forward strand.
+    """
+
+    names=sorted(primers.keys())
+
+    for n in names:
+        if re.search("[^ACGT]", primers[n].upper()):
+            raise error.NotDNAError(primers[n])
+
+    lengths=np.array([len(primers[n]) for n in names])
+
+    out=[]
+    for L in np.unique(lengths):
+
+        group=[names[i] for i in np.nonzero(lengths==L)[0]]
+        n=len(group)
+
+        seqs=[primers[g].upper() for g in group]
+        code=np.stack([utilSeq.seqEncode(s) for s in seqs]
+                    +[utilSeq.seqEncode(utilSeq.seqRC(s)) for s in seqs])
+
+        [rows, starts]=_candidates(index, code, mismatches)
+
+        for b in range(0, len(rows), batch):
+
+            row=rows[b:b+batch]
+            start=starts[b:b+batch]
+
+            win=np.asarray(index.code)[start[:, None]+np.arange(L)[None, :]]
+
+            # top is the primer; the bottom (3'->5') is the complement
+            # of the site, or the site reversed on the forward strand
+            isFwd=row>=n
+            top=code[np.where(isFwd, row-n, row)]
+            bottom=np.where(isFwd[:, None], win[:, ::-1]
+                                          , np.where(win<4, 3-win, 5))
+
+            nMis=(bottom!=np.where(top<4, 3-top, 5)).sum(axis=1)
+
+            [dH, dS]=myThermo.dHdSArr(top, bottom)
+            gc=((top==1) | (top==2)).mean(axis=1)
+            Tm=myThermo.TmArr(dH, dS, L, None, gc)
+
+            keep=np.nonzero((nMis<=mismatches) & (Tm>=cutoff))[0]
+
+            [rec, offset]=index.locate(start[keep])
+
+            for j, i in enumerate(keep):
+                out.append((group[row[i]-n if isFwd[i] else row[i]]
+                          , index.names[rec[j]], int(offset[j])
+                          , '+' if isFwd[i] else '-', int(nMis[i])
+                          , float(Tm[i])))
+
+    out.sort(key=lambda x: (x[0], -x[5]))
+
+    return out
@@ -0,0 +1,169 @@
+"""This is a module for running a job in pipelined stages.
+
+A reader thread takes the chunks of the input, a pool of compute
+threads processes them, and a writer thread takes the results in the
+input order. The stages are connected by bounded queues, so that the
+reading and writing overlap the computation, and the number of chunks
+held in memory stays bounded however long the input is.
+
+The compute threads share the objects used by 'compute'. A 'Thermo'
+object is safe to share (see the module thermo); numpy releases the
+GIL in the array calculations.
+
+Functions:
+runPipeline(*) --- run the reader, compute and writer stages.
+"""
+
+import queue
+import threading
+
+
+# the end of a stage's items
+_END=object()
+
+# seconds between checks for a failed stage while waiting
+_poll_=0.1
+
+
+def _put(q, item, stop):
+    """Put an item in a queue unless the pipeline is stopped.
+
+    Return:
+    False if the pipeline was stopped, or else True.
+    """
+
+    while not stop.is_set():
+
+        try:
+            q.put(item, timeout=_poll_)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def _get(q, stop):
+    """Get an item from a queue unless the pipeline is stopped.
+
+    Return:
+    The item, or _END if the pipeline was stopped.
+    """
+
+    while not stop.is_set():
+
+        try:
+            return q.get(timeout=_poll_)
+        except queue.Empty:
+            pass
+
+    return _END
+
+
+def runPipeline(chunks, compute, write, workers=2, depth=4):
+    """Run the reader, compute and writer stages.
+
+    Parameters:
+    chunks  : iterable --- the chunks of the input, read in the reader
+                          thread (e.g., a generator reading a file).
+    compute : callable --- takes a chunk and returns its result, run
+                          in the compute threads.
+    write   : callable --- takes the results in the order of the
+                          chunks, run in the writer thread.
+    workers : int      --- number of compute threads (default 2).
+    depth   : int      --- number of chunks read ahead of the writer
+                          (default 4), at least one per compute
+                          thread.
+
+    Exceptions:
+    The error of the first stage failing. The other stages are stopped
+    and the results written so far are kept.
+    """
+
+    depth=max(depth, workers)
+
+    inQ=queue.Queue(depth)
+    outQ=queue.Queue(depth)
+
+    # chunks read but not yet written, so that a slow chunk does not
+    # let the others pile up in the writer
+    slots=threading.Semaphore(depth)
+
+    stop=threading.Event()
+    errors=[]
+
+    def _guard(stage):
+
+        def _run():
+            try:
+                stage()
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        return _run
+
+    def _read():
+
+        for item in enumerate(chunks):
+
+            while not slots.acquire(timeout=_poll_):
+                if stop.is_set():
+                    return
+
+            if not _put(inQ, item, stop):
+                return
+
+        for _ in range(workers):
+            _put(inQ, _END, stop)
+
+    def _compute():
+
+        while True:
+
+            item=_get(inQ, stop)
+            if item is _END:
+                break
+
+            if not _put(outQ, (item[0], compute(item[1])), stop):
+                return
+
+        _put(outQ, _END, stop)
+
+    def _write():
+
+        pending={}
+        nxt=0
+        ended=0
+        while ended<workers:
+
+            item=_get(outQ, stop)
+
+            if stop.is_set():
+                return
+
+            if item is _END:
+                ended+=1
+                continue
+
+            pending[item[0]]=item[1]
+
+            while nxt in pending:
+
+                write(pending.pop(nxt))
+                nxt+=1
+                slots.release()
+
+    threads=[threading.Thread(target=_guard(_read))]
+    threads+=[threading.Thread(target=_guard(_compute))
+                                        for _ in range(workers)]
+    threads.append(threading.Thread(target=_guard(_write)))
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,228 @@
+"""This is a module of salt correction models for 'Thermo'.
+
+A model turns the salt concentrations into constants once, by the
+method 'constants', and applies them to a batch of duplexes as array
+operations, by the method 'dS', giving the correction added to dS.
+A 'Thermo' object calculates the constants of its conditions once in
+the constructor, and those of per duplex conditions once per distinct
+pair of salt concentrations of a batch (see Thermo._saltConst).
+
+Two kinds of models are supported:
+1. A correction of dS depending on the duplex length only (SantaLucia
+   J Jr., (1998), PNAS, 95, 1460-65, with the effective monovalent
+   concentration of Ahsen et. al, (2001), Clinical Chemistry, 47(11),
+   1956-61). It is 'additive': it adds the same term to every nearest
+   neighbor, which the pruning bounds of the scans and the degenerate
+   and dimer calculations rely on.
+2. A correction of 1/Tm depending on the GC fraction and the length
+   (Owczarzy et. al, (2004), Biochemistry, 43, 3537-54, for
+   monovalent salt, and Owczarzy et. al, (2008), Biochemistry, 47,
+   5336-53, for mixtures with Mg2+). 1/Tm=1/Tm(1 M Na+)+x is applied
+   as the correction 1000*dH*x of dS, which gives the same Tm and is
+   also used for dG at other temperatures.
+
+The module needs numpy.
+
+Classes:
+SantaLucia1998 --- the length dependent dS correction (the default).
+Owczarzy2004   --- the 1/Tm correction for monovalent salt.
+Owczarzy2008   --- the 1/Tm correction for Mg2+ and monovalent salt.
+
+Variables:
+models --- the models by their names on the command line.
+"""
+
+import numpy as np
+
+
+class SantaLucia1998(object):
+    """The length dependent correction of dS.
+
+    dS is corrected by 0.368*(N-1)*ln([Na+]eff), where N is the duplex
+    length and [Na+]eff=[Na+]+0.12*sqrt([Mg2+] in mM) (M).
+
+    Attributes:
+    additive --- True, the correction depends on the length only.
+
+    Methods:
+    constants(na, mg) --- the constants of the conditions.
+    dS(*)             --- the correction of dS for a batch.
+    """
+
+    additive=True
+
+
+    def constants(self, na, mg):
+        """The constants of the conditions.
+
+        Parameters:
+        na : float or array --- monovalent salt concentration (M).
+        mg : float or array --- divalent salt concentration (M).
+
+        Return:
+        The correction of dS per nearest neighbor (e.u.).
+        """
+
+        na_eff=na+0.12*np.sqrt(mg*1000)
+
+        return 0.368*np.log(na_eff)
+
+
+    def dS(self, k, length, dH=None, gc=None):
+        """The correction of dS for a batch.
+
+        Parameters:
+        k      : array --- the constants from 'constants'.
+        length : array --- duplex lengths (number of base pairs).
+        dH     : array --- not used.
+        gc     : array --- not used.
+
+        Return:
+        An array (or float) in e.u.
+        """
+
+        return k*(np.asarray(length)-1)
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(__class__.__name__)
+
+
+class _InverseTm(object):
+    """The base of the models correcting 1/Tm.
+
+    1/Tm=1/Tm(1 M Na+)+A+B*fGC+C/(2*(N-1)), where fGC is the GC
+    fraction, N the duplex length, and A, B and C the constants of
+    the conditions.
+
+    Attributes:
+    additive --- False, the correction depends on dH and fGC.
+
+    Methods:
+    dS(*) --- the correction of dS for a batch.
+    """
+
+    additive=False
+
+
+    @staticmethod
+    def _monovalent(lnNa):
+        """A, B and C of the 2004 correction for monovalent salt."""
+
+        return [-3.95e-5*lnNa+9.40e-6*lnNa**2, 4.29e-5*lnNa, 0.0*lnNa]
+
+
+    def dS(self, k, length, dH=None, gc=None):
+        """The correction of dS for a batch.
+
+        Parameters:
+        k      : list  --- the constants A, B and C from 'constants'.
+        length : array --- duplex lengths (number of base pairs).
+        dH     : array --- enthalpy (kcal/mol).
+        gc     : array --- GC fractions.
+
+        Return:
+        An array (or float) in e.u.
+        """
+
+        [A, B, C]=k
+
+        x=A+B*np.asarray(gc)+C/(2*(np.asarray(length)-1))
+
+        return 1000*np.asarray(dH)*x
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(self.__class__.__name__)
+
+
+class Owczarzy2004(_InverseTm):
+    """The 1/Tm correction for monovalent salt.
+
+    Divalent salt is ignored.
+
+    Methods:
+    constants(na, mg) --- the constants of the conditions.
+    """
+
+
+    def constants(self, na, mg):
+        """The constants of the conditions.
+
+        Parameters:
+        na : float or array --- monovalent salt concentration (M).
+        mg : float or array --- not used.
+
+        Return:
+        A list with A, B and C (see _InverseTm).
+        """
+
+        return self._monovalent(np.log(na))
+
+
+class Owczarzy2008(_InverseTm):
+    """The 1/Tm correction for Mg2+ and monovalent salt.
+
+    By the ratio R=sqrt([Mg2+])/[Mon+]: below 0.22, or without Mg2+,
+    the monovalent correction of 2004 is used; from 0.22 to 6, the Mg2+
+    correction with a, d and g adjusted for [Mon+]; from 6, or without
+    monovalent salt, the Mg2+ correction alone.
+
+    Constants and default values
+    _a_ to _g_ --- the constants of the Mg2+ correction.
+
+    Methods:
+    constants(na, mg) --- the constants of the conditions.
+    """
+
+    [_a_, _b_, _c_, _d_, _e_, _f_, _g_]=[3.92e-5, -9.11e-6, 6.26e-5
+                                      , 1.42e-5, -4.82e-4, 5.25e-4, 8.31e-5]
+
+
+    def constants(self, na, mg):
+        """The constants of the conditions.
+
+        Parameters:
+        na : float or array --- monovalent salt concentration (M).
+        mg : float or array --- divalent salt concentration (M).
+
+        Return:
+        A list with A, B and C (see _InverseTm).
+        """
+
+        na=np.asarray(na, dtype=float)
+        mg=np.asarray(mg, dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            lnNa=np.log(na)
+            lnMg=np.log(mg)
+
+            ratio=np.where(mg>0, np.sqrt(mg)/na, 0.0)
+
+            # [Mon+] adjusted a, d and g where 0.22<=R<6
+            mixed=ratio<6
+            a=np.where(mixed, self._a_*(0.843-0.352*np.sqrt(na)*lnNa)
+                            , self._a_)
+            d=np.where(mixed, self._d_*(1.279-4.03e-3*lnNa-8.03e-3*lnNa**2)
+                            , self._d_)
+            g=np.where(mixed, self._g_*(0.486-0.258*lnNa+5.25e-3*lnNa**3)
+                            , self._g_)
+
+            kMg=[a+self._b_*lnMg, self._c_+d*lnMg
+               , self._e_+self._f_*lnMg+g*lnMg**2]
+
+            kNa=self._monovalent(lnNa)
+
+        mono=(mg<=0) | (ratio<0.22)
+
+        return [np.where(mono, x, y) for x, y in zip(kNa, kMg)]
+
+
+# the models by their names on the command line
+models={'santalucia':SantaLucia1998, 'owczarzy2004':Owczarzy2004
+      , 'owczarzy2008':Owczarzy2008}
@@ -0,0 +1,898 @@
+"""This is a module for scanning templates for windows by their
+thermodynamics.
+
+Every window of a template is taken as the top strand of a perfect
+match duplex, the bottom strand being its complement. The windows are
+evaluated under the conditions of a 'Thermo' object, using the prefix
+sums of the nearest neighbors (see Thermo.windowSums).
+
+A long template can be scanned by a pool of processes (see
+TmRangeScan.scanParallel). The template codes and the nearest neighbor
+arrays are put once in shared memory, and the workers attach them by
+name, so that the memory used stays flat as workers are added.
+
+The Tm of all the windows can be folded into aggregate statistics
+instead (see TmRangeScan.scanStats and the module aggregate), by one
+process or a pool whose partial statistics merge exactly, or kept
+compactly in a store spilling to memory mapped files (see
+TmRangeScan.scanStore and the module storage).
+
+The Tm of all the windows can also be kept with their prefix sums
+(see WindowScan), and updated after edits of the template (SNPs and
+short indels), recalculating only the windows overlapping an edit.
+
+The module needs the custom modules utilSeq, shared and storage, and
+numpy.
+
+Classes:
+TmRangeScan --- scan a template for windows with Tm in a range.
+WindowScan  --- the Tm of all the windows of a template, updatable
+                after edits.
+"""
+
+import math
+import copy
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import utilSeq
+import shared
+import storage
+
+
+# the scanner and the template shared by the calls in a worker
+# process, see _initWorker
+_pool={}
+
+
+def _initWorker(scanner, spec):
+    """Set up the scanner and attach the template in a worker process."""
+
+    _pool.update(scanner=scanner, code=shared.attach(spec))
+
+
+def _scanRange(first, last):
+    """Scan the windows starting from first to last-1 in a worker.
+
+    Return:
+    A list with the windows found, as by TmRangeScan.scan, and the
+    counts of this range.
+    """
+
+    scanner=_pool['scanner']
+
+    for k in scanner.counts:
+        scanner.counts[k]=0
+
+    hits=list(scanner.scan(_pool['code'], first, last))
+
+    return [hits, dict(scanner.counts)]
+
+
+def _statsRange(first, last, stats):
+    """Fold the Tm of the windows starting from first to last-1 in a
+    worker.
+
+    Return:
+    The statistics, see TmRangeScan.scanStats.
+    """
+
+    return _pool['scanner'].scanStats(_pool['code'], stats, first, last)
+
+
+class TmRangeScan(object):
+    """A class to scan templates for windows with Tm in a range.
+
+    Most windows of a long template fall outside a Tm range of
+    interest. They are pruned first by a bound on Tm from the GC
+    count of the window alone, then by a bound from the counts of 
+    its nearest neighbors with 0, 1 or 2 G/C. Only the windows 
+    surviving both bounds are calculated exactly. With a salt model
+    which is not additive (see the module salt), no window is pruned.
+
+    The bounds come from the fact that Tm>=T if and only if
+    dH-T*(dS+dSTm)/1000<=0, which is linear in the nearest neighbors
+    (see Thermo._dSTm). Each nearest neighbor is bounded by the 
+    extremes in its G/C class.
+
+    Constants and default values
+    _chunk_  --- default number of window starts per chunk (1048576)
+
+    Attributes:
+    counts   --- a dictionary of counters accumulated over the scans.
+                 windows : windows considered.
+                 invalid : windows with a base other than A, C, G, T.
+                 pruned_gc : windows skipped by the GC count bound.
+                 pruned_nn : windows skipped by the bound from the
+                             nearest neighbor G/C classes.
+                 exact   : windows calculated exactly.
+                 hits    : windows with Tm in the range.
+
+    Methods:
+    scan(template) --- generate the windows with Tm in the range.
+    scanParallel(*) --- scan over a pool of processes sharing the
+                        template.
+    scanStats(*)   --- fold the Tm of all the windows into statistics.
+    scanStore(*)   --- store the Tm of all the windows compactly.
+
+    _classBound() --- the extremes of the nearest neighbors by G/C class.
+    _endTerm(*)   --- the terms of the bounds other than nearest neighbors.
+    _gcBound(length) --- the GC counts which may have Tm in the range.
+    _nnBound(*)   --- the bound from the nearest neighbor G/C classes.
+    _allTm(*)     --- generate the Tm of all the windows chunk by chunk.
+    _spans(*)     --- the ranges of window starts of the worker tasks.
+    _sharedScanner(store) --- a copy of the object for worker processes.
+    """
+
+    _chunk_=1<<20
+
+
+    def _classBound(self):
+        """The extremes of dH-T*dS/1000 of the nearest neighbors in
+        each G/C class.
+
+        Return:
+        A list with two lists, the smallest at the lower bound of the
+        range and the largest at the upper bound, each indexed by the
+        number of G/C (0, 1 or 2) in the nearest neighbor.
+        """
+
+        myThermo=self._thermo
+
+        # the perfect match nearest neighbors by their G/C count
+        code=np.arange(4)
+        [t0, t1]=np.meshgrid(code, code, indexing='ij')
+        [t0, t1]=[t0.ravel(), t1.ravel()]
+
+        idx=myThermo._nnIndex(np.stack([t0, t1], axis=1)
+                            , np.stack([3-t0, 3-t1], axis=1))[:, 0]
+        nGC=((t0==1) | (t0==2)).astype(int)+((t1==1) | (t1==2))
+
+        nnH=myThermo._nnArrH[idx]
+        nnS=myThermo._nnArrS[idx]
+
+        wLo=nnH-self._lo*nnS/1000
+        wHi=nnH-self._hi*nnS/1000
+
+        fLo=[np.min(wLo[nGC==k]) for k in range(3)]
+        fHi=[np.max(wHi[nGC==k]) for k in range(3)]
+
+        return [fLo, fHi]
+
+
+    def _endTerm(self, length, a, sym):
+        """The terms of dH-T*(dS+dSTm)/1000 other than the nearest
+        neighbors, at the lower and the upper bound of the range.
+
+        Parameters:
+        length : int   --- window length.
+        a      : array --- number of ends other than G/C (0, 1 or 2).
+        sym    : float --- symmetry correction (0 or 1.4) assumed.
+
+        Return:
+        A list with the terms at the lower and the upper bound.
+        """
+
+        dSTm=float(self._thermo._dSTm(length))
+
+        dH=0.2+2.2*a
+        dS=-5.7+6.9*a+dSTm
+
+        return [dH-self._lo*dS/1000, dH-self._hi*(dS-sym)/1000]
+
+
+    def _gcBound(self, length):
+        """The GC counts with which a window may have Tm in the range.
+
+        The counts of the nearest neighbors in each G/C class are
+        relaxed to all those adding up to the GC count.
+
+        Parameters:
+        length : int --- window length.
+
+        Return:
+        A boolean array indexed by the GC count (0 to length).
+        """
+
+        [fLo, fHi]=self._f
+
+        ok=np.zeros(length+1, dtype=bool)
+        nStack=length-1
+
+        for g in range(length+1):
+
+            minLo=math.inf
+            maxHi=-math.inf
+
+            # e: number of G/C at the two ends
+            for e in range(3):
+
+                a=2-e
+                if e>g or a>length-g:
+                    continue
+
+                n2=np.arange(g+1)
+                n1=2*g-e-2*n2
+                n0=nStack-n1-n2
+
+                feasible=(n1>=0) & (n0>=0)
+                if not feasible.any():
+                    continue
+
+                [n0, n1, n2]=[n0[feasible], n1[feasible], n2[feasible]]
+
+                # symmetry correction only when exactly half is G/C
+                sym=1.4 if length%2==0 and 2*g==length else 0.0
+                [cLo, cHi]=self._endTerm(length, a, sym)
+
+                minLo=min(minLo, cLo+np.min(n0*fLo[0]+n1*fLo[1]+n2*fLo[2]))
+                maxHi=max(maxHi, cHi+np.max(n0*fHi[0]+n1*fHi[1]+n2*fHi[2]))
+
+            ok[g]=minLo<=0.0 and maxHi>=0.0
+
+        return ok
+
+
+    def _nnBound(self, length, n1, n2, a):
+        """If windows may have Tm in the range, from the counts of
+        their nearest neighbors in each G/C class.
+
+        Parameters:
+        length : int   --- window length.
+        n1     : array --- nearest neighbors with one G/C.
+        n2     : array --- nearest neighbors with two G/C.
+        a      : array --- number of ends other than G/C.
+
+        Return:
+        A boolean array.
+        """
+
+        [fLo, fHi]=self._f
+
+        n0=length-1-n1-n2
+
+        sym=1.4 if length%2==0 else 0.0
+        [cLo, cHi]=self._endTerm(length, a, sym)
+
+        minLo=cLo+n0*fLo[0]+n1*fLo[1]+n2*fLo[2]
+        maxHi=cHi+n0*fHi[0]+n1*fHi[1]+n2*fHi[2]
+
+        return (minLo<=0.0) & (maxHi>=0.0)
+
+
+    def scan(self, template, first=0, last=None):
+        """Generate the windows with Tm in the range.
+
+        The template is processed in chunks, so that the memory used
+        does not grow with the template length.
+
+        Parameters:
+        template : str or array --- the template (5'->3'), or its base
+                                    codes by utilSeq.seqEncode.
+        first    : int          --- the first window start (default 0).
+        last     : int          --- one past the last window start
+                                    (default None, to the end).
+
+        Yields:
+        (start, length, Tm) for each window with Tm in the range,
+        ordered by start (0 based) and then by length.
+        """
+
+        myThermo=self._thermo
+        lengths=self._lengths
+        counts=self.counts
+
+        lmin=lengths[0]
+        lmax=lengths[-1]
+
+        N=len(template)
+        chunk=self._chunk
+
+        stop=N-lmin+1 if last is None else min(last, N-lmin+1)
+
+        for s0 in range(first, max(stop, first), chunk):
+
+            s1=min(s0+chunk, stop)
+
+            seg=template[s0:min(s1+lmax-1, N)]
+            code=utilSeq.seqEncode(seg) if isinstance(seg, str) else seg
+            code=np.asarray(code, dtype=np.uint8)
+
+            sums=myThermo.windowSums(code)
+            cumBad=sums[2]
+
+            isGC=(code==1) | (code==2)
+            cumGC=np.concatenate(([0], np.cumsum(isGC)))
+
+            nnGC=isGC[:-1].astype(np.int8)+isGC[1:]
+            cum1=np.concatenate(([0], np.cumsum(nnGC==1)))
+            cum2=np.concatenate(([0], np.cumsum(nnGC==2)))
+
+            starts=[]
+            lens=[]
+            tms=[]
+            for L in lengths:
+
+                nWin=min(s1, N-L+1)-s0
+                if nWin<=0:
+                    continue
+
+                start=np.arange(nWin)
+
+                bad=cumBad[start+L-1]-cumBad[start]>0
+                gc=cumGC[start+L]-cumGC[start]
+
+                # bound from the GC count
+                start=start[self._ok[L][gc] & ~bad]
+                nGC=len(start)
+
+                # bound from the nearest neighbor G/C classes
+                end=start+L-1
+                n1=cum1[end]-cum1[start]
+                n2=cum2[end]-cum2[start]
+                a=2-isGC[start].astype(int)-isGC[end]
+
+                if self._prune:
+                    start=start[self._nnBound(L, n1, n2, a)]
+
+                nBad=int(bad.sum())
+                counts['windows']+=nWin
+                counts['invalid']+=nBad
+                counts['pruned_gc']+=nWin-nBad-nGC
+                counts['pruned_nn']+=nGC-len(start)
+                counts['exact']+=len(start)
+
+                [dH, dS]=myThermo.windowdHdS(code, L, start, sums)
+                gc=(cumGC[start+L]-cumGC[start])/L
+                Tm=myThermo.TmArr(dH, dS, L, None, gc)
+
+                hit=(Tm>=self._loC) & (Tm<=self._hiC)
+                counts['hits']+=int(hit.sum())
+
+                starts.append(start[hit]+s0)
+                lens.append(np.full(int(hit.sum()), L))
+                tms.append(Tm[hit])
+
+            if len(starts)==0:
+                continue
+
+            starts=np.concatenate(starts)
+            lens=np.concatenate(lens)
+            tms=np.concatenate(tms)
+
+            order=np.lexsort((lens, starts))
+
+            for i in order:
+                yield (int(starts[i]), int(lens[i]), float(tms[i]))
+
+
+    def scanParallel(self, template, workers=2, span=None):
+        """Generate the windows with Tm in the range, scanned by a pool
+        of processes.
+
+        The template is encoded once into shared memory and split into
+        ranges of window starts, scanned by the workers on views of
+        the shared codes. The nearest neighbor arrays are shared too
+        (see Thermo.shareTables).
+
+        Parameters:
+        template : str or array --- the template (5'->3'), or its base
+                                    codes by utilSeq.seqEncode.
+        workers  : int          --- number of worker processes
+                                    (default 2).
+        span     : int          --- number of window starts per task
+                                    (default None, the template split
+                                    into 4 tasks per worker, and at
+                                    least one chunk).
+
+        Yields:
+        The same windows in the same order as 'scan'.
+        """
+
+        code=utilSeq.seqEncode(template) if isinstance(template, str) \
+                                            else np.asarray(template, dtype=np.uint8)
+
+        [first, last]=self._spans(len(code), workers, span)
+
+        with shared.SharedArrays() as store:
+
+            spec=store.put(code)
+
+            with ProcessPoolExecutor(workers, initializer=_initWorker
+                       , initargs=(self._sharedScanner(store), spec)) as ex:
+
+                for [hits, counts] in ex.map(_scanRange, first, last):
+
+                    for k in counts:
+                        self.counts[k]+=counts[k]
+
+                    yield from hits
+
+
+    def scanStats(self, template, stats, first=0, last=None, workers=1
+                                                          , span=None):
+        """Fold the Tm of all the windows into aggregate statistics.
+
+        Every window of the lengths is calculated, whatever the Tm
+        range. Windows with a base other than A, C, G and T are
+        counted as invalid.
+
+        Parameters:
+        template : str or array --- the template (5'->3'), or its base
+                                    codes by utilSeq.seqEncode.
+        stats    : TmStats      --- the accumulator (see the module
+                                    aggregate).
+        first    : int          --- the first window start (default 0).
+        last     : int          --- one past the last window start
+                                    (default None, to the end).
+        workers  : int          --- number of worker processes
+                                    (default 1, no pool). The workers
+                                    share the template as in
+                                    'scanParallel' and their partial
+                                    statistics are merged.
+        span     : int          --- number of window starts per task
+                                    of a pool, see 'scanParallel'.
+
+        Return:
+        The accumulator.
+        """
+
+        if workers>1:
+
+            code=utilSeq.seqEncode(template) if isinstance(template, str) \
+                                            else np.asarray(template, dtype=np.uint8)
+
+            [starts, stops]=self._spans(len(code), workers, span)
+            starts=[max(s, first) for s in starts]
+            if last is not None:
+                stops=[min(s, last) for s in stops]
+
+            with shared.SharedArrays() as store:
+
+                spec=store.put(code)
+
+                with ProcessPoolExecutor(workers, initializer=_initWorker
+                       , initargs=(self._sharedScanner(store), spec)) as ex:
+
+                    for part in ex.map(_statsRange, starts, stops
+                                     , [stats.blank()]*len(starts)):
+                        stats.merge(part)
+
+            return stats
+
+        for [L, tm] in self._allTm(template, first, last):
+            stats.add(tm)
+
+        return stats
+
+
+    def scanStore(self, template, store=None, first=0, last=None
+                         , dtype='float32', budget=None, folder=None):
+        """Store the Tm of all the windows, one series per length.
+
+        Every window of the lengths is calculated, whatever the Tm
+        range, chunk by chunk, so that with a memory budget the store
+        spills the chunks to files as the scan goes (see the module
+        storage).
+
+        Parameters:
+        template : str or array --- the template (5'->3'), or its base
+                                    codes by utilSeq.seqEncode.
+        store    : TmStore      --- the store (default None, a new
+                                    store of dtype, budget and
+                                    folder). The Tm of the window
+                                    starting at first+i is item i of
+                                    the series keyed by its length.
+        first    : int          --- the first window start (default 0).
+        last     : int          --- one past the last window start
+                                    (default None, to the end).
+        dtype, budget, folder   --- see storage.TmStore, for a new
+                                    store (default float32, no budget,
+                                    a temporary folder).
+
+        Exceptions:
+        ValueError --- see storage.TmStore.
+
+        Return:
+        The store.
+        """
+
+        if store is None:
+            store=storage.TmStore(dtype, budget, folder)
+
+        for [L, tm] in self._allTm(template, first, last):
+            store.append(tm, L)
+
+        return store
+
+
+    def _allTm(self, template, first=0, last=None):
+        """Generate the Tm of all the windows chunk by chunk.
+
+        Parameters:
+        template, first, last --- see 'scanStats'.
+
+        Yields:
+        (length, Tm) for each chunk and length, the Tm of the windows
+        in the order of their starts. Windows with a base other than
+        A, C, G and T are NaN.
+        """
+
+        myThermo=self._thermo
+        lengths=self._lengths
+
+        lmin=lengths[0]
+        lmax=lengths[-1]
+
+        N=len(template)
+        chunk=self._chunk
+
+        stop=N-lmin+1 if last is None else min(last, N-lmin+1)
+
+        for s0 in range(first, max(stop, first), chunk):
+
+            s1=min(s0+chunk, stop)
+
+            seg=template[s0:min(s1+lmax-1, N)]
+            code=utilSeq.seqEncode(seg) if isinstance(seg, str) else seg
+            code=np.asarray(code, dtype=np.uint8)
+
+            sums=myThermo.windowSums(code)
+
+            for L in lengths:
+
+                nWin=min(s1, N-L+1)-s0
+                if nWin<=0:
+                    continue
+
+                start=np.arange(nWin)
+
+                [dH, dS]=myThermo.windowdHdS(code, L, start, sums)
+                gc=myThermo.windowGC(code, L, start)
+
+                yield (L, myThermo.TmArr(dH, dS, L, None, gc))
+
+
+    def _spans(self, N, workers, span):
+        """The ranges of window starts of the worker tasks.
+
+        Parameters:
+        N       : int --- the template length.
+        workers : int --- number of worker processes.
+        span    : int --- number of window starts per task, or None,
+                          see 'scanParallel'.
+
+        Return:
+        A list with the lists of the first and of one past the last
+        window starts.
+        """
+
+        if span is None:
+            span=max(self._chunk, -(-N//(4*workers)))
+
+        first=list(range(0, max(N-self._lengths[0]+1, 0), span))
+        last=[f+span for f in first]
+
+        return [first, last]
+
+
+    def _sharedScanner(self, store):
+        """A copy of the object for worker processes, with the nearest
+        neighbor arrays in shared memory and the counts reset.
+
+        Parameters:
+        store : shared.SharedArrays --- the owner of the shared memory.
+
+        Return:
+        A TmRangeScan object.
+        """
+
+        scanner=copy.copy(self)
+        scanner._thermo=self._thermo.shareTables(store)
+        scanner.counts=dict.fromkeys(self.counts, 0)
+
+        return scanner
+
+
+    def __init__(self, myThermo, lo, hi, lengths, chunk=_chunk_):
+        """Constructor.
+
+        Parameters:
+        myThermo : Thermo --- the conditions for the calculation.
+        lo       : float  --- lower bound of the Tm range (celsius).
+        hi       : float  --- upper bound of the Tm range (celsius).
+        lengths  : int or list --- window length(s), each >=2.
+        chunk    : int    --- number of window starts per chunk
+                              (default: _chunk_)
+        """
+
+        if isinstance(lengths, int):
+            lengths=[lengths]
+
+        self._thermo=myThermo
+        self._loC=float(lo)
+        self._hiC=float(hi)
+        self._lo=self._loC+273.15
+        self._hi=self._hiC+273.15
+        self._lengths=sorted(set(int(L) for L in lengths))
+        self._chunk=int(chunk)
+
+        if self._lengths[0]<2:
+            raise ValueError("The window length should be at least 2.")
+
+        # the bounds hold for an additive salt model only; otherwise
+        # every window is calculated exactly
+        self._prune=myThermo._salt.additive
+
+        self._f=self._classBound()
+        self._ok={L: self._gcBound(L) if self._prune
+                        else np.ones(L+1, dtype=bool) for L in self._lengths}
+
+        self.counts={'windows':0, 'invalid':0, 'pruned_gc':0
+                            , 'pruned_nn':0, 'exact':0, 'hits':0}
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(__class__.__name__)
+
+
+class WindowScan(object):
+    """The Tm of all the windows of a template, updatable after edits.
+
+    The prefix sums of the nearest neighbors (see Thermo.windowSums)
+    and the Tm of every window are kept. Applying edits gives a new
+    object for the edited template: a window inside a stretch left
+    unchanged keeps its Tm and is only shifted by the length change
+    of the edits before it, and the prefix sums of the stretch are
+    shifted by a constant. Only the windows and the nearest neighbors
+    overlapping an edit are calculated, so the calculation costs
+    O(edits x window) instead of O(template); the arrays are still
+    copied once, so that the object edited stays valid (e.g., the
+    reference rescanned per sample).
+
+    Attributes:
+    code    --- base codes (utilSeq.seqEncode) of the template.
+    lengths --- the window lengths, sorted.
+    sums    --- the prefix sums of dH, dS and of the invalid nearest
+                neighbors (see Thermo.windowSums).
+    tm      --- a dictionary of the Tm (celsius) of the windows by
+                length, one item per start, NaN for the windows with a
+                base other than A, C, G and T.
+    changed --- a dictionary of the ranges (first, one past the last)
+                of the window starts calculated by the last edits, by
+                length (empty for a new scan).
+
+    Methods:
+    hits(lo, hi)      --- generate the windows with Tm in a range.
+    applyEdits(edits) --- a new object for the edited template.
+
+    _windowTm(L, first, last) --- Tm of a range of windows.
+    _sorted(edits)    --- the edits checked and sorted.
+    """
+
+
+    def _windowTm(self, L, first, last):
+        """Tm of the windows of length L starting from first to last-1,
+        from the template codes and the prefix sums of the object.
+        """
+
+        seg=self.code[first:last+L-1]
+        sums=[c[first:last+L-1] for c in self.sums]
+
+        [dH, dS]=self._thermo.windowdHdS(seg, L, None, sums)
+        gc=self._thermo.windowGC(seg, L)
+
+        return self._thermo.TmArr(dH, dS, L, None, gc)
+
+
+    def hits(self, lo, hi):
+        """Generate the windows with Tm in a range.
+
+        Parameters:
+        lo : float --- lower bound of the Tm range (celsius).
+        hi : float --- upper bound of the Tm range (celsius).
+
+        Yields:
+        (start, length, Tm) for each window with Tm in the range,
+        ordered by start (0 based) and then by length, as by
+        TmRangeScan.scan.
+        """
+
+        starts=[]
+        lens=[]
+        for L in self.lengths:
+
+            tm=self.tm[L]
+            start=np.nonzero((tm>=lo) & (tm<=hi))[0]
+
+            starts.append(start)
+            lens.append(np.full(len(start), L))
+
+        starts=np.concatenate(starts)
+        lens=np.concatenate(lens)
+
+        for i in np.lexsort((lens, starts)):
+            yield (int(starts[i]), int(lens[i]), float(self.tm[lens[i]][starts[i]]))
+
+
+    def _sorted(self, edits):
+        """The edits checked and sorted.
+
+        Parameters:
+        edits : list --- (position, ref, alt), see 'applyEdits'.
+
+        Exceptions:
+        ValueError --- an edit is out of the template, overlaps another
+                       one or its ref differs from the template.
+
+        Return:
+        A list of (position, ref length, alt codes), sorted by position.
+        """
+
+        out=[]
+        for [pos, ref, alt] in sorted(edits, key=lambda e: e[0]):
+
+            pos=int(pos)
+            ref=utilSeq.seqEncode(ref.upper())
+
+            if pos<0 or pos+len(ref)>len(self.code):
+                raise ValueError(f"The edit at {pos} is out of the template.")
+
+            if out and pos<out[-1][0]+out[-1][1]:
+                raise ValueError(f"The edit at {pos} overlaps another edit.")
+
+            if not np.array_equal(ref, self.code[pos:pos+len(ref)]):
+                raise ValueError(f"The ref of the edit at {pos} differs from"
+                                                          " the template.")
+
+            out.append((pos, len(ref), utilSeq.seqEncode(alt.upper())))
+
+        return out
+
+
+    def applyEdits(self, edits):
+        """A new object for the edited template.
+
+        Parameters:
+        edits : list --- the edits as (position, ref, alt) of the
+                         template (0 based position, ref and alt
+                         strings), e.g., (100, "A", "G") for a SNP,
+                         (100, "AT", "A") for a deletion and
+                         (100, "", "GG") for an insertion before the
+                         position. The positions refer to this object's
+                         template; the edits should not overlap.
+
+        Exceptions:
+        ValueError --- see '_sorted'.
+
+        Return:
+        A WindowScan, with the ranges of the windows calculated in
+        'changed'.
+        """
+
+        edits=self._sorted(edits)
+
+        # the stretches left unchanged, as (old start, old end, shift)
+        keep=[]
+        pieces=[]
+        [prev, shift]=[0, 0]
+        for [pos, nRef, alt] in edits:
+
+            keep.append((prev, pos, shift))
+            pieces+=[self.code[prev:pos], alt]
+
+            prev=pos+nRef
+            shift+=len(alt)-nRef
+
+        keep.append((prev, len(self.code), shift))
+        pieces.append(self.code[prev:])
+
+        new=copy.copy(self)
+        new.code=np.concatenate(pieces).astype(np.uint8)
+
+        N=len(new.code)
+
+        # the prefix sums, shifted by a constant within the unchanged
+        # stretches and calculated in between
+        new.sums=[np.empty(max(N, 1), dtype=c.dtype) for c in self.sums]
+        for c in new.sums:
+            c[0]=0
+
+        def _fill(known, pos):
+            loc=self._thermo.windowSums(new.code[known:pos+1])
+            for c, x in zip(new.sums, loc):
+                c[known:pos+1]=c[known]+x
+
+        known=0
+        for [a, b, sh] in keep:
+
+            if b<=a:
+                continue
+
+            if a+sh>known:
+                _fill(known, a+sh)
+
+            for c, x in zip(new.sums, self.sums):
+                c[a+sh:b+sh]=c[a+sh]+(x[a:b]-x[a])
+
+            known=b+sh-1
+
+        if known<N-1:
+            _fill(known, N-1)
+
+        # the windows inside the unchanged stretches shifted, the others
+        # calculated
+        new.tm={}
+        new.changed={}
+        for L in self.lengths:
+
+            nWin=max(N-L+1, 0)
+
+            tm=np.empty(nWin)
+            ranges=[]
+
+            done=0
+            for [a, b, sh] in keep:
+
+                n=b-a-L+1
+                if n<=0:
+                    continue
+
+                if a+sh>done:
+                    ranges.append((done, a+sh))
+
+                tm[a+sh:a+sh+n]=self.tm[L][a:a+n]
+                done=a+sh+n
+
+            if done<nWin:
+                ranges.append((done, nWin))
+
+            for [first, last] in ranges:
+                tm[first:last]=new._windowTm(L, first, last)
+
+            new.tm[L]=tm
+            new.changed[L]=ranges
+
+        return new
+
+
+    def __init__(self, myThermo, template, lengths):
+        """Constructor.
+
+        Parameters:
+        myThermo : Thermo --- the conditions for the calculation.
+        template : str or array --- the template (5'->3'), or its base
+                                    codes by utilSeq.seqEncode.
+        lengths  : int or list  --- window length(s), each >=2.
+
+        Exceptions:
+        ValueError --- a window length is less than 2.
+        """
+
+        if isinstance(lengths, int):
+            lengths=[lengths]
+
+        self._thermo=myThermo
+        self.lengths=sorted(set(int(L) for L in lengths))
+
+        if self.lengths[0]<2:
+            raise ValueError("The window length should be at least 2.")
+
+        if isinstance(template, str):
+            template=utilSeq.seqEncode(template.upper())
+
+        self.code=np.array(template, dtype=np.uint8)
+        self.sums=myThermo.windowSums(self.code)
+
+        self.tm={L: self._windowTm(L, 0, max(len(self.code)-L+1, 0))
+                                                    for L in self.lengths}
+        self.changed={L: [] for L in self.lengths}
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(__class__.__name__)
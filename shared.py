@@ -0,0 +1,129 @@
+"""This is a module for sharing numpy arrays between processes.
+
+An array is copied once into a block of shared memory
+(multiprocessing.shared_memory). Other processes, e.g., the workers of
+a process pool, attach the block by its name and work on a numpy view
+of it, with no copy, so that the memory used does not grow with the
+number of workers.
+
+The module needs numpy.
+
+Classes:
+SharedArrays --- shared memory blocks owned by a process.
+
+Functions:
+attach(spec) --- a read only view of an array in shared memory.
+"""
+
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# the blocks attached by this process, by name, kept open for the
+# views on them
+_attached={}
+
+
+def attach(spec):
+    """A read only view of an array in shared memory.
+
+    A block is attached once per process, e.g., a worker of a process
+    pool. It stays owned by the SharedArrays that put it there.
+
+    Parameters:
+    spec : tuple --- the name, shape and dtype of the array, as given
+                     by SharedArrays.put.
+
+    Return:
+    A numpy array.
+    """
+
+    [name, shape, dtype]=spec
+
+    if name not in _attached:
+
+        # the workers of a pool share the resource tracker of the
+        # owner, which unlinks the block once, on 'close'
+        if sys.version_info>=(3, 13):
+            shm=shared_memory.SharedMemory(name, track=False)
+        else:
+            shm=shared_memory.SharedMemory(name)
+
+        _attached[name]=shm
+
+    arr=np.ndarray(shape, dtype=dtype, buffer=_attached[name].buf)
+    arr.flags.writeable=False
+
+    return arr
+
+
+class SharedArrays(object):
+    """Shared memory blocks owned by a process.
+
+    The blocks live until 'close', which is called on leaving a 'with'
+    block.
+
+    Attributes:
+    blocks --- the shared memory blocks.
+
+    Methods:
+    put(arr) --- copy an array into a new block.
+    close()  --- release and unlink all the blocks.
+    """
+
+
+    def put(self, arr):
+        """Copy an array into a new block of shared memory.
+
+        Parameters:
+        arr : array --- the array.
+
+        Return:
+        A tuple (name, shape, dtype) to attach the array by (see the
+        function 'attach').
+        """
+
+        arr=np.ascontiguousarray(arr)
+
+        shm=shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        self.blocks.append(shm)
+
+        view=np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+        view[...]=arr
+
+        return (shm.name, arr.shape, arr.dtype.str)
+
+
+    def close(self):
+        """Release and unlink all the blocks."""
+
+        for shm in self.blocks:
+
+            shm.close()
+            shm.unlink()
+
+        self.blocks=[]
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, *exc):
+
+        self.close()
+
+
+    def __init__(self):
+        """Constructor."""
+
+        self.blocks=[]
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(__class__.__name__)
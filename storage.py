@@ -0,0 +1,360 @@
+"""This is a module for storing large numbers of Tm in a compact form.
+
+A genome scale scan gives billions of Tm, too many for Python floats
+or float64 arrays. A 'TmStore' keeps them as float64, float32 or
+fixed point int16 in units of 0.01 C (2, 4 or 8 bytes per value), in
+chunks appended in order. Once the chunks held in memory exceed a
+budget, the oldest are written to .npy files in a folder and mapped
+back read only (numpy.memmap), so that the memory used stays within
+the budget and any region can still be read without loading the rest.
+
+The values are kept in series by a key, e.g., one series per window
+length of a scan.
+
+The module needs numpy. 'storeBatch' needs a 'Thermo' object.
+
+Classes:
+TmStore --- Tm in compact chunks, spilled to memory mapped files.
+
+The scan and batch functions (TmRangeScan.scanStore in the module
+scan, and storeBatch) take either a store or the dtype and the budget
+of a new one.
+
+Functions:
+storeBatch(*) --- store the Tm of a batch of duplexes in a TmStore.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+class TmStore(object):
+    """Tm in compact chunks, spilled to memory mapped files.
+
+    Constants and default values
+    _scale_   --- units of the int16 values per celsius (100).
+    _missing_ --- the int16 value of NaN, and of Tm beyond the range
+                  of int16 (-32768).
+    _dtypes_  --- the dtypes allowed.
+
+    Attributes:
+    dtype  --- the dtype of the stored values.
+    budget --- the largest number of bytes held in memory, None for no
+               limit.
+    folder --- the folder of the spilled chunks.
+    chunks --- the chunks by key, arrays in memory or memory mapped.
+    starts --- the start of each chunk in its series, by key.
+
+    Methods:
+    append(tm, key) --- append an array of Tm to a series.
+    region(*)  --- the Tm of a region of a series.
+    size(key)  --- the number of values of a series.
+    keys()     --- the keys of the series.
+    nbytes()   --- the number of bytes held in memory.
+    flush()    --- write all the chunks held in memory to files.
+    load(folder) --- a store from a folder of flushed chunks
+                     (classmethod).
+    close()    --- release the chunks, deleting a temporary folder.
+
+    _encode(tm), _decode(arr) --- to and from the stored dtype.
+    _spill()   --- write chunks to files until within the budget.
+    """
+
+    _scale_=100
+    _missing_=-32768
+    _dtypes_=('float64', 'float32', 'int16')
+
+
+    def _encode(self, tm):
+        """An array of Tm (celsius) in the stored dtype."""
+
+        tm=np.asarray(tm, dtype=float).ravel()
+
+        if self.dtype!=np.int16:
+            return tm.astype(self.dtype)
+
+        q=np.rint(tm*self._scale_)
+
+        with np.errstate(invalid='ignore'):
+            ok=np.abs(q)<=np.iinfo(np.int16).max
+
+        return np.where(ok, q, self._missing_).astype(np.int16)
+
+
+    def _decode(self, arr):
+        """An array in the stored dtype as Tm (celsius), float32 for
+        float32 and float64 otherwise.
+        """
+
+        if self.dtype!=np.int16:
+            return np.array(arr)
+
+        return np.where(arr==self._missing_, np.nan, arr/self._scale_)
+
+
+    def append(self, tm, key=0):
+        """Append an array of Tm to a series.
+
+        Parameters:
+        tm  : array --- Tm in celsius.
+        key : int or str --- the key of the series (default 0).
+
+        Return:
+        The object itself.
+        """
+
+        arr=self._encode(tm)
+        if len(arr)==0:
+            return self
+
+        if key not in self.chunks:
+            self.chunks[key]=[]
+            self.starts[key]=[0]
+
+        self.chunks[key].append(arr)
+        self.starts[key].append(self.starts[key][-1]+len(arr))
+
+        self._inMemory.append((key, len(self.chunks[key])-1))
+
+        if self.budget is not None:
+            self._spill()
+
+        return self
+
+
+    def _spill(self, budget=None):
+        """Write the oldest chunks held in memory to files until the
+        bytes held are within the budget.
+
+        Parameters:
+        budget : int --- the bytes allowed (default None, the budget of
+                         the object).
+        """
+
+        budget=self.budget if budget is None else budget
+
+        total=self.nbytes()
+        while self._inMemory and total>budget:
+
+            [key, i]=self._inMemory.pop(0)
+            arr=self.chunks[key][i]
+
+            if self.folder is None:
+                self.folder=tempfile.mkdtemp(prefix="tmstore.")
+                self._temporary=True
+
+            path=Path(self.folder)/f"tm.{key}.{i:06d}.npy"
+            np.save(path, arr)
+
+            self.chunks[key][i]=np.load(path, mmap_mode='r')
+            total-=arr.nbytes
+
+
+    def region(self, first, last, key=0):
+        """The Tm of a region of a series.
+
+        Only the chunks overlapping the region are read.
+
+        Parameters:
+        first : int --- the first index.
+        last  : int --- one past the last index.
+        key   : int or str --- the key of the series (default 0).
+
+        Exceptions:
+        KeyError --- no series by the key.
+
+        Return:
+        An array of Tm (celsius), NaN for missing values.
+        """
+
+        chunks=self.chunks[key]
+        starts=np.array(self.starts[key])
+
+        first=max(int(first), 0)
+        last=min(int(last), int(starts[-1]))
+
+        if last<=first:
+            return self._decode(np.zeros(0, dtype=self.dtype))
+
+        lo=int(np.searchsorted(starts, first, 'right'))-1
+        hi=int(np.searchsorted(starts, last, 'left'))
+
+        parts=[chunks[i][max(first-starts[i], 0):last-starts[i]]
+                                                for i in range(lo, hi)]
+
+        return self._decode(np.concatenate(parts))
+
+
+    def size(self, key=0):
+        """The number of values of a series (0 if none)."""
+
+        return self.starts[key][-1] if key in self.starts else 0
+
+
+    def keys(self):
+        """The keys of the series, in the order first appended."""
+
+        return list(self.chunks.keys())
+
+
+    def nbytes(self):
+        """The number of bytes of the chunks held in memory."""
+
+        return sum(self.chunks[k][i].nbytes for [k, i] in self._inMemory)
+
+
+    def flush(self):
+        """Write all the chunks held in memory to files, e.g., to load
+        the store later from its folder.
+
+        Return:
+        The object itself.
+        """
+
+        self._spill(0)
+
+        return self
+
+
+    @classmethod
+    def load(cls, folder):
+        """A store from a folder of flushed chunks.
+
+        The chunks are memory mapped, not read into memory. Keys made
+        of digits are read as int.
+
+        Parameters:
+        folder : str --- the folder.
+
+        Return:
+        A TmStore, with no budget.
+        """
+
+        store=cls(folder=folder)
+
+        for path in sorted(Path(folder).glob("tm.*.npy")):
+
+            [key, i]=path.name[3:-4].rsplit(".", 1)
+            key=int(key) if key.isdigit() else key
+
+            arr=np.load(path, mmap_mode='r')
+            store.dtype=arr.dtype
+
+            if key not in store.chunks:
+                store.chunks[key]=[]
+                store.starts[key]=[0]
+
+            store.chunks[key].append(arr)
+            store.starts[key].append(store.starts[key][-1]+len(arr))
+
+        return store
+
+
+    def close(self):
+        """Release the chunks, deleting the folder if it is temporary."""
+
+        self.chunks={}
+        self.starts={}
+        self._inMemory=[]
+
+        if self._temporary:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder=None
+            self._temporary=False
+
+
+    def __enter__(self):
+        """Enter a 'with' block."""
+
+        return self
+
+
+    def __exit__(self, *exc):
+        """Close on leaving a 'with' block."""
+
+        self.close()
+
+
+    def __init__(self, dtype='float32', budget=None, folder=None):
+        """Constructor.
+
+        Parameters:
+        dtype  : str  --- float64, float32 or int16 (fixed point in
+                          units of 0.01 C) (default float32).
+        budget : int  --- the largest number of bytes held in memory
+                          (default None, no limit).
+        folder : str  --- the folder of the spilled chunks, created if
+                          not existing and kept by 'close' (default
+                          None, a temporary folder deleted by 'close').
+
+        Exceptions:
+        ValueError --- the dtype is not allowed or the budget is
+                       negative.
+        """
+
+        if str(np.dtype(dtype)) not in self._dtypes_:
+            raise ValueError(f"The dtype should be one of {self._dtypes_}.")
+
+        if budget is not None and budget<0:
+            raise ValueError("The memory budget should not be negative.")
+
+        self.dtype=np.dtype(dtype)
+        self.budget=budget
+        self.folder=folder
+        self._temporary=False
+
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+
+        self.chunks={}
+        self.starts={}
+
+        # the chunks held in memory as (key, index), oldest first
+        self._inMemory=[]
+
+
+    def __repr__(self):
+        """A string representation of the class."""
+
+        return "class:{}".format(__class__.__name__)
+
+
+def storeBatch(myThermo, oligo, store=None, cond=None, chunk=1<<16, key=0
+                               , dtype='float32', budget=None, folder=None):
+    """Store the Tm of a batch of duplexes in a TmStore.
+
+    The duplexes are calculated in chunks by Thermo.TmChunks, and
+    their Tm appended to a series in the order of the batch, so that
+    with a memory budget the chunks spill to files as they come.
+
+    Parameters:
+    myThermo : Thermo     --- the object for the calculation.
+    oligo    : dictionary --- duplexes in "top/bottom" format by name.
+    store    : TmStore    --- the store (default None, a new store of
+                              dtype, budget and folder).
+    cond     : dictionary --- per duplex conditions (default None).
+                              See Thermo.thermoBatch.
+    chunk    : int        --- number of duplexes per chunk
+                              (default 65536).
+    key      : int or str --- the key of the series (default 0).
+    dtype, budget, folder --- see TmStore, for a new store (default
+                              float32, no budget, a temporary folder).
+
+    Exceptions:
+    see TmStore and Thermo.thermoArr.
+
+    Return:
+    The store.
+    """
+
+    if store is None:
+        store=TmStore(dtype, budget, folder)
+
+    for tm in myThermo.TmChunks(oligo, cond, chunk):
+        store.append(tm, key)
+
+    return store
@@ -0,0 +1,10 @@
+"""Make the library modules and the nearest neighbor parameter files
+of the repository available to the tests."""
+
+import os
+import sys
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+os.environ.setdefault('NNDIR', ROOT)
@@ -0,0 +1,40 @@
+"""Checks of the quantile sketch of TmStats."""
+
+import math
+
+import numpy as np
+
+import aggregate
+
+
+def test_quantileOutsideRange():
+    """Quantiles of values mostly outside the histogram range."""
+
+    rng=np.random.default_rng(0)
+    tm=rng.normal(-20, 40, 5000)
+
+    stats=aggregate.TmStats(0, 100, 1).add(tm)
+
+    exact=np.sort(tm)
+    for p in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0):
+
+        rank=max(math.ceil(p*len(tm)), 1)
+
+        assert abs(stats.quantile(p)-exact[rank-1])<=stats.resolution/2+1e-9
+
+
+def test_mergeExact():
+    """Chunks folded apart and merged give the sketch of one pass."""
+
+    rng=np.random.default_rng(1)
+    tm=rng.uniform(-150, 250, 3000)
+
+    whole=aggregate.TmStats().add(tm)
+
+    merged=aggregate.TmStats()
+    for part in np.array_split(tm, 7)[::-1]:
+        merged.merge(merged.blank().add(part))
+
+    assert np.array_equal(whole.fineBin, merged.fineBin)
+    assert np.array_equal(whole.fine, merged.fine)
+    assert whole.summary()==merged.summary()
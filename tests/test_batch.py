@@ -0,0 +1,229 @@
+"""Checks of the batch calculation, which calculates each unique
+duplex once, against the calculation of one duplex at a time.
+"""
+
+import math
+import os
+import random
+import re
+
+import pytest
+
+import error
+import salt
+import thermo
+import utilSeq
+
+
+def _mismatched():
+    """Mismatched duplexes and their rotations, whose two strands
+    differ in GC count.
+    """
+
+    comp=str.maketrans("ACGT", "TGCA")
+
+    pairs={}
+    for i, top in enumerate(["ACGCTGCAGGCTATCG", "GGCCTCCAGTAGCC"
+                           , "TTAGCGCGCTCAGT"]):
+
+        bottom=list(top.translate(comp))
+
+        # G.T or C.A mismatches, apart and inside
+        for j in (3, 8):
+            bottom[j]={'G':'T', 'C':'A'}[top[j]]
+        bottom="".join(bottom)
+
+        rot=utilSeq.seqRev(bottom)+"/"+utilSeq.seqRev(top)
+
+        pairs[f"{i}a"]=top+"/"+bottom
+        pairs[f"{i}b"]=rot
+
+    return pairs
+
+
+@pytest.mark.parametrize("name", sorted(salt.models))
+def test_rotations(name):
+    """Each row of thermoBatch equals thermoCal0, whichever of a duplex
+    and its rotation comes first.
+    """
+
+    oligo=_mismatched()
+
+    myThermo=thermo.Thermo(saltModel=salt.models[name]())
+
+    for verbose in (0, 1):
+
+        res=myThermo.thermoBatch(oligo, verbose)
+
+        for line in res:
+
+            [o, pair]=line.split("\t")[:2]
+            one=myThermo.thermoCal0(oligo[o], verbose)
+
+            assert line==o+"\t"+one
+
+
+@pytest.mark.parametrize("name", sorted(salt.models))
+def test_perRowConditions(name):
+    """Repeated duplexes, rotations and per row conditions: each row of
+    thermoBatch equals thermoCal of an object with the conditions of
+    the row.
+    """
+
+    pairs=_mismatched()
+
+    # each duplex under several names and conditions
+    levels=[{}, {'temper':37.0}, {'na':20.0, 'mg':3.0}, {'cp':500.0}
+          , {'temper':55.0, 'na':150.0}]
+
+    oligo={}
+    cond={}
+    for o, pair in pairs.items():
+        for i, c in enumerate(levels+[levels[1]]):
+
+            oligo[f"{o}.{i}"]=pair
+            if c:
+                cond[f"{o}.{i}"]=c
+
+    stats={}
+    myThermo=thermo.Thermo(saltModel=salt.models[name]())
+
+    res=myThermo.thermoBatch(oligo, 2, cond, stats)
+
+    # the rotations apart under the models not additive
+    assert stats['unique']<len(oligo)
+
+    for line in res:
+
+        o=line.split("\t")[0]
+
+        one=thermo.Thermo(saltModel=salt.models[name](), **cond.get(o, {}))
+
+        assert [line]==one.thermoCal({o:oligo[o]}, 2)
+
+
+@pytest.mark.parametrize("name", sorted(salt.models))
+@pytest.mark.parametrize("block", [7, 40, 1<<22])
+def test_thermoMatrix(name, block):
+    """Each pair of thermoMatrix equals thermoArr of the duplex, and is
+    NaN where thermoArr rejects a nearest neighbor.
+    """
+
+    rng=random.Random(3)
+    comp=str.maketrans("ACGT", "TGCA")
+
+    L=14
+    probes=["".join(rng.choice("ACGT") for _ in range(L)) for _ in range(9)]
+    # self complementary, with the symmetry correction
+    probes.append("CGACGTTAACGTCG")
+
+    targets=[p.translate(comp) for p in probes]
+
+    # single mismatches, and consecutive ones
+    for p in probes[:4]:
+
+        bottom=list(p.translate(comp))
+        j=rng.randrange(1, L-2)
+        bottom[j]={'A':'G', 'C':'T', 'G':'A', 'T':'C'}[bottom[j]]
+        targets.append("".join(bottom))
+
+        bottom[j+1]={'A':'G', 'C':'T', 'G':'A', 'T':'C'}[bottom[j+1]]
+        targets.append("".join(bottom))
+
+    myThermo=thermo.Thermo(saltModel=salt.models[name]())
+
+    res=myThermo.thermoMatrix(probes, targets, block=block)
+
+    nNaN=0
+    for i, p in enumerate(probes):
+        for j, t in enumerate(targets):
+
+            try:
+                one=myThermo.thermoArr([p+"/"+t])
+            except error.NNnotExistError:
+                assert all(math.isnan(res[k][i, j])
+                                for k in ('Tm', 'dG', 'dH', 'dS'))
+                nNaN+=1
+                continue
+
+            for k in ('Tm', 'dG', 'dH', 'dS'):
+                assert math.isclose(res[k][i, j], one[k][0], rel_tol=1e-12
+                                                           , abs_tol=1e-9)
+
+    assert 0<nNaN<len(probes)*len(targets)
+
+
+def _altFiles(folder):
+    """The DNA parameter files in a folder, and a copy with every
+    parameter scaled, as 'altH.csv' and 'altS.csv' and as the default
+    files of the subfolder 'alt'.
+    """
+
+    def _scale(line):
+        if line.startswith("#"):
+            return line
+        return re.sub(r"-?\d+\.\d+", lambda m: f"{float(m[0])*1.1:.4f}", line)
+
+    (folder/"alt").mkdir()
+
+    for [src, alt] in (("nnSH.csv", "altH.csv"), ("nnSS.csv", "altS.csv")):
+
+        text=open(os.path.join(thermo.Thermo._nnFolder(), src)).read()
+        scaled="\n".join(_scale(x) for x in text.split("\n"))
+
+        (folder/src).write_text(text)
+        (folder/alt).write_text(scaled)
+        (folder/"alt"/src).write_text(scaled)
+
+
+@pytest.mark.parametrize("name", sorted(salt.models))
+def test_nnSets(tmp_path, monkeypatch, name):
+    """Rows of thermoBatch mixing two parameter sets and per row
+    conditions equal thermoCal of separate objects, each reading the
+    files of its set as the default ones.
+    """
+
+    _altFiles(tmp_path)
+
+    monkeypatch.setattr(thermo, "_nnSets", dict(thermo._nnSets))
+    monkeypatch.setenv("NNDIR", str(tmp_path))
+
+    thermo.Thermo.registerNN("alt", "altH.csv", "altS.csv")
+
+    pairs=_mismatched()
+
+    oligo={}
+    cond={}
+    for o, pair in pairs.items():
+        for i, c in enumerate([{}, {'nnSet':'alt'}, {'nnSet':'DNA', 'na':20.0}
+                             , {'nnSet':'alt', 'temper':37.0, 'mg':3.0}]):
+
+            oligo[f"{o}.{i}"]=pair
+            cond[f"{o}.{i}"]=c
+
+    myThermo=thermo.Thermo(saltModel=salt.models[name](), nnSets=["alt"])
+
+    res=myThermo.thermoBatch(oligo, 2, cond)
+
+    for line in res:
+
+        o=line.split("\t")[0]
+
+        c=dict(cond[o])
+        folder=tmp_path/"alt" if c.pop('nnSet', 'DNA')=='alt' else tmp_path
+        monkeypatch.setenv("NNDIR", str(folder))
+
+        one=thermo.Thermo(saltModel=salt.models[name](), **c)
+
+        assert [line]==one.thermoCal({o:oligo[o]}, 2)
+
+    # the two sets give different rows
+    assert len(set(x.split("\t", 1)[1] for x in res))>len(res)//2
+
+    monkeypatch.setenv("NNDIR", str(tmp_path))
+
+    with pytest.raises(ValueError):
+        thermo.Thermo(nnSets=["RNA"])
+
+    with pytest.raises(ValueError):
+        myThermo.thermoBatch(oligo, 0, {o:{'nnSet':'RNA'} for o in oligo})
@@ -0,0 +1,92 @@
+"""Checks of the command line input of Tm.py."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import salt
+import thermo
+import utilSeq
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(tmp_path, rows, *args):
+    """Run Tm.py on an input file, returning the process."""
+
+    f=tmp_path/"in.csv"
+    f.write_text("\n".join(rows)+"\n")
+
+    return subprocess.run([sys.executable, os.path.join(ROOT, "Tm.py")
+                         , "-f", str(f), "-o", str(tmp_path/"out.txt")
+                         , *args]
+                        , capture_output=True, text=True, cwd=ROOT)
+
+
+@pytest.mark.parametrize("args", [(), ("-p", "1")])
+def test_badCell(tmp_path, args):
+    """A condition cell not a number is reported by row and column."""
+
+    proc=_run(tmp_path, ["Name,S1,S2,na", "x1,ACGTTGCAGGCTATCG,,50"
+                       , "x2,GGCATCCATTAGCC,,abc"], *args)
+
+    assert proc.returncode==1
+    assert "Row 3, column 4 (na): 'abc' is not a number." in proc.stdout
+    assert "Traceback" not in proc.stderr
+
+
+def test_negativeSalt():
+    """Negative concentrations are rejected, not turned into NaN."""
+
+    with pytest.raises(ValueError):
+        thermo.Thermo(na=-5)
+
+    with pytest.raises(ValueError):
+        thermo.Thermo().thermoArr(["ACGT/TGCA"]*2, na=[50, -5])
+
+
+@pytest.mark.parametrize("args", [(), ("-p", "2")])
+@pytest.mark.parametrize("name", ["santalucia", "owczarzy2008"])
+def test_perRowConditions(tmp_path, args, name):
+    """Each row with its own conditions equals thermoCal of an object
+    with the options of the command line and the conditions of the row.
+    """
+
+    header=["temper", "cp", "na", "mg"]
+    rows=[("x1", "ACGTTGCAGGCTATCG", ["", "", "", ""])
+        , ("x2", "GGCATCCATTAGCC", ["55", "", "20", "3"])
+        , ("x3", "ACGTTGCAGGCTATCG", ["37", "500", "", ""])
+        , ("x4", "TTAGCGCGCTCAGT", ["", "", "150", ""])
+        , ("x5", "GGCATCCATTAGCC", ["55", "", "20", "3"])]
+
+    proc=_run(tmp_path, ["Name,S1,S2,"+",".join(header)]
+                      + [f"{o},{s},,"+",".join(c) for o, s, c in rows]
+            , "-vv", "-q", "-n", "80", "-m", "1", "--salt", name, *args)
+
+    assert proc.returncode==0
+
+    out=(tmp_path/"out.txt").read_text().splitlines()[1:]
+    assert len(out)==len(rows)
+
+    for line, [o, s, c] in zip(out, rows):
+
+        cond={'na':80.0, 'mg':1.0}
+        cond.update({k:float(v) for k, v in zip(header, c) if v})
+
+        one=thermo.Thermo(saltModel=salt.models[name](), **cond)
+        pair=s+"/"+utilSeq.seqComp(s)
+
+        assert [line]==one.thermoCal({o:pair}, 2)
+
+
+def test_nnSetNotRegistered(tmp_path):
+    """A row naming a set not registered by '--nnset' is an error."""
+
+    proc=_run(tmp_path, ["Name,S1,S2,nnset", "x1,ACGTTGCAGGCTATCG,,DNA"
+                       , "x2,GGCATCCATTAGCC,,RNA"])
+
+    assert proc.returncode==1
+    assert "The parameter set RNA is not" in proc.stdout
+    assert "Traceback" not in proc.stderr
@@ -0,0 +1,97 @@
+"""Checks of Thermo.degenerate against a brute force expansion."""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import error
+import thermo
+
+
+def _expansions(myThermo, pair):
+    """All the expansions of a degenerate duplex as "top/bottom"."""
+
+    allowed=myThermo._degenPairs(pair)[2]
+
+    bases="ACGT"
+    for picks in itertools.product(*[np.nonzero(a)[0] for a in allowed]):
+
+        yield ("".join(bases[p//4] for p in picks)+"/"
+              +"".join(bases[p%4] for p in picks))
+
+
+def _brute(myThermo, pair):
+    """dH, dS (salt corrected), Tm and the denominator of Tm of the
+    expansions with all their nearest neighbors supported."""
+
+    rows=[]
+    for x in _expansions(myThermo, pair):
+
+        try:
+            res=myThermo.thermoArr([x])
+        except error.NNnotExistError:
+            continue
+
+        L=len(x)//2
+        denom=res['dSs'][0]+float(myThermo._dSTm(L))
+        rows.append((res['dH'][0], res['dS'][0], res['Tm'][0], denom))
+
+    return np.array(rows)
+
+
+def _pairs(n, seed=1):
+    """Short random degenerate duplexes."""
+
+    rng=random.Random(seed)
+    codes="ACGTACGTACGTRYSWKMBDHVN"
+
+    for _ in range(n):
+
+        L=rng.randint(4, 8)
+        top="".join(rng.choice(codes) for _ in range(L))
+        bottom="".join(rng.choice(codes) if rng.random()<0.3
+                                else _comp(t) for t in top)
+
+        yield top+"/"+bottom
+
+
+def _comp(code):
+    """The complement of an IUPAC code."""
+
+    return "ACGTRYSWKMBDHVN"["TGCAYRSWMKVHDBN".index(code)]
+
+
+@pytest.mark.parametrize("pair", list(_pairs(60)))
+def test_degenerate_brute_force(pair):
+
+    myThermo=thermo.Thermo()
+    rows=_brute(myThermo, pair)
+
+    if len(rows)==0:
+        with pytest.raises(error.NNnotExistError):
+            myThermo.degenerate(pair, mean=True)
+        return
+
+    if (rows[:, 3]>=0).any():
+        with pytest.raises(ValueError):
+            myThermo.degenerate(pair, mean=True)
+        return
+
+    out=myThermo.degenerate(pair, mean=True)
+
+    assert out['n']==len(rows) and isinstance(out['n'], int)
+
+    assert out['Tm']==pytest.approx([rows[:, 2].min(), rows[:, 2].max()])
+    assert out['dH']==pytest.approx([rows[:, 0].min(), rows[:, 0].max()
+                                   , rows[:, 0].mean()])
+    assert out['dS']==pytest.approx([rows[:, 1].min(), rows[:, 1].max()
+                                   , rows[:, 1].mean()])
+
+
+@pytest.mark.parametrize("pair", ['TWCWCA/AWHWYT', 'TCAGA/ABTCN'])
+def test_degenerate_no_melting(pair):
+
+    with pytest.raises(ValueError):
+        thermo.Thermo().degenerate(pair, mean=True)
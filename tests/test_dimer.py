@@ -0,0 +1,101 @@
+"""Checks of the primer pool dimer screen."""
+
+import random
+
+import numpy as np
+import pytest
+
+import dimer
+import error
+import thermo
+import utilSeq
+
+
+def _brute(myThermo, primers, threshold, k):
+    """The worst dG of each pair by a scan of every offset holding a
+    run of k complementary bases.
+    """
+
+    comp={'A':'T', 'C':'G', 'G':'C', 'T':'A'}
+
+    names=sorted(primers)
+    [code, lens]=dimer._encodePool([primers[n] for n in names])
+
+    out=[]
+    for x in range(len(names)):
+        for y in range(x, len(names)):
+
+            [P, Q]=[primers[names[x]], primers[names[y]]]
+
+            seeded=[]
+            for c in range(len(P)+len(Q)-1):
+
+                run=0
+                for a in range(max(0, c-len(Q)+1), min(len(P)-1, c)+1):
+
+                    run=run+1 if comp[P[a]]==Q[c-a] else 0
+                    if run>=k:
+                        seeded.append(c)
+                        break
+
+            if not seeded:
+                continue
+
+            c=np.array(seeded)
+            dG=dimer.dimerDG(myThermo, code, lens, np.full(len(c), x)
+                                               , np.full(len(c), y), c).min()
+
+            if dG<=threshold:
+                out.append((names[x], names[y], round(float(dG), 9)))
+
+    return sorted(out)
+
+
+def test_bruteForce():
+    """The seed index finds every pair of the offset scan."""
+
+    rng=random.Random(5)
+
+    primers={f"p{i:02d}":"".join(rng.choice("ACGT")
+                          for _ in range(rng.randint(12, 24))) for i in range(30)}
+
+    # a few planted complementary stretches
+    for i in range(0, 30, 6):
+        s=primers[f"p{i:02d}"]
+        primers[f"p{i+1:02d}"]+=utilSeq.seqRC(s[2:11])
+
+    myThermo=thermo.Thermo()
+
+    found=dimer.screenDimers(myThermo, primers, threshold=-2.0, k=4)
+
+    assert len(found)>0
+    assert sorted((a, b, round(g, 9)) for a, b, g in found) \
+                                ==_brute(myThermo, primers, -2.0, 4)
+
+
+def test_fullDuplex():
+    """A primer against its reverse complement, aligned end to end,
+    scores the dG of the duplex by thermoArr.
+    """
+
+    myThermo=thermo.Thermo()
+
+    for p in ("GCATTGCAGGCTATCG", "CCGATAGCCTGCAATGC"):
+
+        q=utilSeq.seqRC(p)
+        [code, lens]=dimer._encodePool([p, q])
+
+        dG=dimer.dimerDG(myThermo, code, lens, np.array([0]), np.array([1])
+                                             , np.array([len(p)-1]))[0]
+
+        ref=myThermo.thermoArr([p+"/"+utilSeq.seqComp(p)])['dG'][0]
+
+        assert np.isclose(dG, ref, atol=1e-9)
+
+
+@pytest.mark.parametrize("primer", ["ACGTNACGT", "ACGTDACGT", "ACG-TAC"])
+def test_notDNA(primer):
+    """Primers with other letters than A, C, G and T are rejected."""
+
+    with pytest.raises(error.NotDNAError):
+        dimer.screenDimers(thermo.Thermo(), {'a':"ACGTACGT", 'b':primer})
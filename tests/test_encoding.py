@@ -0,0 +1,70 @@
+"""Checks that IUPAC letters are coded as unknown bases, never as the
+dangling end code of the nearest neighbor tables.
+"""
+
+import numpy as np
+import pytest
+
+import dimer
+import error
+import offTarget
+import thermo
+import utilSeq
+
+
+def test_seqEncode():
+    """Only A, C, G, T and U get the codes 0 to 3."""
+
+    assert utilSeq.seqEncode("ACGTUacgtu").tolist()==[0, 1, 2, 3, 3]*2
+    assert (utilSeq.seqEncode("DNRYKMSWBHV-").astype(int)==5).all()
+
+
+@pytest.mark.parametrize("letter", list("DRYHB"))
+def test_reference(tmp_path, letter):
+    """A site with an IUPAC letter is found as with N, i.e., not at
+    all.
+    """
+
+    primer="ACGTTGCAGGCTATCG"
+    site=utilSeq.seqRC(primer)
+
+    found=[]
+    for x in ("N", letter):
+
+        fasta=tmp_path/f"ref{x}.fa"
+        fasta.write_text(f">r\nTTTT{site[:8]}{x}{site[9:]}TTTT\n")
+
+        index=offTarget.SeedIndex(str(fasta), k=6)
+        found.append(offTarget.searchOffTargets(thermo.Thermo(), index
+                                              , {'p':primer}, 2, 0.0))
+
+    assert found[0]==found[1]==[]
+
+
+@pytest.mark.parametrize("letter", list("DRYHB"))
+def test_primer(tmp_path, letter):
+    """A primer with an IUPAC letter scores as with N in the dimer
+    model, and is rejected by the off-target search.
+    """
+
+    myThermo=thermo.Thermo()
+
+    G=[]
+    for x in ("N", letter):
+
+        [code, lens]=dimer._encodePool([f"GGGGCCCC{x}GGGGCCCC"])
+        c=np.arange(2*lens[0]-1)
+        z=np.zeros(len(c), dtype=np.intp)
+
+        G.append(dimer.dimerDG(myThermo, code, lens, z, z, c))
+
+    assert np.array_equal(G[0], G[1])
+
+    fasta=tmp_path/"ref.fa"
+    fasta.write_text(">r\nACGTACGTACGTACGTACGT\n")
+
+    index=offTarget.SeedIndex(str(fasta), k=6)
+
+    with pytest.raises(error.NotDNAError):
+        offTarget.searchOffTargets(myThermo, index
+                                 , {'p':f"ACGTAC{letter}TACGT"}, 2, 0.0)
@@ -0,0 +1,74 @@
+"""Checks of the equilibrium solver against closed forms."""
+
+import numpy as np
+import pytest
+
+import equilibrium
+
+
+def test_twoStrands():
+    """One duplex of two strands against the root of the quadratic."""
+
+    lnK=np.log(np.array([1e6, 1e8, 1e10]))
+    [a, b]=[2e-7, 5e-7]
+
+    [x, D, _]=equilibrium.solveEquilibrium(lnK[:, None], [[0, 1]], [a, b])
+
+    K=np.exp(lnK)
+    s=a+b+1/K
+    d=(s-np.sqrt(s*s-4*a*b))/2
+
+    assert np.allclose(D[:, 0], d, rtol=1e-8)
+    assert np.allclose(x, np.stack([a-d, b-d], axis=1), rtol=1e-8)
+
+
+def test_selfDuplex():
+    """A self duplex, C=x+2*K*x**2."""
+
+    K=1e7
+    C=1e-6
+
+    [x, D, _]=equilibrium.solveEquilibrium([np.log(K)], [[0, 0]], [C])
+
+    assert np.isclose(x[0, 0], (np.sqrt(1+8*K*C)-1)/(4*K), rtol=1e-8)
+    assert np.isclose(x[0, 0]+2*D[0, 0], C, rtol=1e-8)
+
+
+def test_network():
+    """The mass balance of a random network with strong duplexes."""
+
+    rng=np.random.default_rng(0)
+    [S, N, B]=[40, 150, 4]
+
+    pair=rng.integers(0, S, (N, 2))
+    lnK=rng.uniform(5, 30, (B, N))
+    conc=rng.uniform(1e-9, 1e-6, S)
+
+    [x, D, _]=equilibrium.solveEquilibrium(lnK, pair, conc)
+
+    nu=np.zeros((N, S))
+    np.add.at(nu, (np.arange(N), pair[:, 0]), 1.0)
+    np.add.at(nu, (np.arange(N), pair[:, 1]), 1.0)
+
+    assert np.abs((x+D@nu-conc)/conc).max()<1e-9
+
+
+def test_zeroConcentration():
+    """No strand at all is rejected instead of dividing by zero."""
+
+    with pytest.raises(ValueError):
+        equilibrium.solveEquilibrium([10.0], [[0, 1]], [0.0, 0.0])
+
+    with pytest.raises(ValueError):
+        equilibrium.solveEquilibrium([10.0], [[0, 1]], [1e-7, -1e-7])
+
+
+def test_noConvergence():
+    """Running out of iterations is an error, not a result."""
+
+    rng=np.random.default_rng(2)
+    pair=rng.integers(0, 20, (60, 2))
+
+    with pytest.raises(ValueError):
+        equilibrium.solveEquilibrium(rng.uniform(20, 30, 60), pair
+                                   , rng.uniform(1e-9, 1e-6, 20), maxIter=2)
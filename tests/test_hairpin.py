@@ -0,0 +1,76 @@
+"""Checks of the self-dimer screen against thermoCal0."""
+
+import numpy as np
+import pytest
+
+import dimer
+import error
+import hairpin
+import thermo
+import utilSeq
+
+
+@pytest.mark.parametrize("primer", ["GGGGCCCC", "ACGCGCGT", "GACGATATCGTC"])
+def test_selfComplementary(primer):
+    """The self-dimer of a fully self-complementary primer is its
+    perfect match duplex, with the symmetry correction.
+    """
+
+    assert utilSeq.seqRC(primer)==primer
+
+    myThermo=thermo.Thermo()
+
+    out=hairpin.screenStructures(myThermo, [primer])
+    res=myThermo.thermoArr([primer+"/"+utilSeq.seqRC(primer)[::-1]])
+
+    assert np.isclose(out['dimerTm'][0], res['Tm'][0], atol=1e-6)
+    assert np.isclose(out['dimerG'][0], res['dG'][0], atol=1e-6)
+
+
+@pytest.mark.parametrize("stem", ["GGAC", "CGTGC", "GCCTGA"])
+def test_hairpinStem(stem):
+    """A stem closing a loop of 4 A's: the nearest neighbors of its
+    duplex, with no initiation, plus the loop entropy.
+    """
+
+    myThermo=thermo.Thermo()
+
+    primer=stem+"AAAA"+utilSeq.seqRC(stem)
+    out=hairpin.screenStructures(myThermo, [primer])
+
+    res=myThermo.thermoArr([stem+"/"+utilSeq.seqComp(stem)])
+
+    dH=res['dH'][0]-0.2
+    dS=res['dS'][0]+5.7+hairpin._loopS(4)
+
+    assert np.isclose(out['hairpinG'][0], dH-myThermo._temper*dS/1000
+                                                          , atol=1e-9)
+    assert np.isclose(out['hairpinTm'][0], dH*1000/dS-273.15, atol=1e-9)
+
+
+@pytest.mark.parametrize("primer", ["TTTTGAATTCTTTT", "ACGTGGCCACGTTT"
+                                  , "GATCGGTACCAGTA"])
+def test_selfDimer(primer):
+    """The self-dimer of a primer which is not self-complementary is
+    the worst self pair of the dimer screen, with the symmetry
+    correction.
+    """
+
+    assert utilSeq.seqRC(primer)!=primer
+
+    myThermo=thermo.Thermo()
+
+    out=hairpin.screenStructures(myThermo, [primer])
+    [[_, _, G]]=dimer.screenDimers(myThermo, {'a':primer}, threshold=10, k=3)
+
+    assert np.isclose(out['dimerG'][0], G+myThermo._temper*1.4/1000
+                                                          , atol=1e-9)
+    assert np.isfinite(out['dimerTm'][0])
+
+
+@pytest.mark.parametrize("primer", ["ACGTNACGT", "ACGTDACGT", "ACG-TAC"])
+def test_notDNA(primer):
+    """Primers with other letters than A, C, G and T are rejected."""
+
+    with pytest.raises(error.NotDNAError):
+        hairpin.screenStructures(thermo.Thermo(), ["ACGTACGT", primer])
@@ -0,0 +1,93 @@
+"""Checks of the off-target search against a brute force scan."""
+
+import random
+
+import numpy as np
+import pytest
+
+import offTarget
+import thermo
+import utilSeq
+
+
+def _brute(myThermo, records, primers, mismatches, cutoff):
+    """All the sites by a scan of every offset of both strands."""
+
+    comp={'A':'T', 'C':'G', 'G':'C', 'T':'A'}
+
+    out=[]
+    for name in sorted(primers):
+
+        p=primers[name]
+        L=len(p)
+
+        for rec, seq in records.items():
+            for off in range(len(seq)-L+1):
+
+                site=seq[off:off+L]
+                if 'N' in site:
+                    continue
+
+                for strand, bottom in (('-', "".join(comp[c] for c in site))
+                                     , ('+', site[::-1])):
+
+                    nMis=sum(comp[a]!=b for a, b in zip(p, bottom))
+                    if nMis>mismatches:
+                        continue
+
+                    Tm=myThermo.TmArr(*myThermo.dHdSArr(
+                            utilSeq.seqEncode(p), utilSeq.seqEncode(bottom))
+                        , L, None, (p.count('G')+p.count('C'))/L)[0]
+
+                    if Tm>=cutoff:
+                        out.append((name, rec, off, strand, nMis))
+
+    return sorted(out)
+
+
+def test_offTarget_brute_force(tmp_path):
+
+    rng=random.Random(3)
+    myThermo=thermo.Thermo()
+
+    records={f"r{i}":"".join(rng.choice("ACGT") for _ in range(rng.randint(60, 120)))
+                                                                for i in range(4)}
+    records['r1']=records['r1'][:40]+"NN"+records['r1'][42:]
+
+    primers={}
+    for i in range(12):
+
+        rec=rng.choice(sorted(records))
+        seq=records[rec]
+
+        # sites at the ends of the records, where the short seeds are
+        # cut short in the index
+        off=rng.choice([0, len(seq)-16, rng.randrange(len(seq)-16)])
+        p=list(seq[off:off+16].replace("N", "A"))
+
+        for j in rng.sample(range(0, 16, 2), 2):
+            p[j]=rng.choice([b for b in "ACGT" if b!=p[j]])
+
+        p="".join(p)
+        primers[f"p{i}"]=utilSeq.seqRC(p) if i%2 else p
+
+    fasta=tmp_path/"ref.fa"
+    fasta.write_text("".join(f">{n}\n{s}\n" for n, s in records.items()))
+
+    index=offTarget.SeedIndex(str(fasta), k=12)
+
+    found=offTarget.searchOffTargets(myThermo, index, primers, 2, 0.0)
+
+    assert sorted(x[:5] for x in found)==_brute(myThermo, records, primers
+                                                                  , 2, 0.0)
+
+
+def test_offTarget_short_primer(tmp_path):
+
+    fasta=tmp_path/"ref.fa"
+    fasta.write_text(">r\nACGTACGTACGT\n")
+
+    index=offTarget.SeedIndex(str(fasta), k=4)
+
+    with pytest.raises(ValueError):
+        offTarget.searchOffTargets(thermo.Thermo(), index, {'p':'AC'}, 2)
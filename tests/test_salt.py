@@ -0,0 +1,43 @@
+"""Checks that the salt constants are calculated once per batch."""
+
+import numpy as np
+import pytest
+
+import salt
+import thermo
+
+
+@pytest.mark.parametrize("name", sorted(salt.models))
+def test_constantsOnce(name):
+    """Per duplex salt gives the Tm of one object per condition, with
+    one call of 'constants' on the distinct pairs.
+    """
+
+    pairs=["ACGTGCATGCAAGT/TGCACGTACGTTCA", "GGCATCCA/CCGTAGGT"
+         , "ATTGCAGCAGGACTTA/TAACGTCGTCCTGAAT"]*4
+    na=np.array([20, 50, 100]*4, dtype=float)
+    mg=np.array([0, 0, 0, 1.5, 1.5, 1.5]*2)
+
+    myThermo=thermo.Thermo(na=50, mg=1.5, saltModel=salt.models[name]())
+
+    sizes=[]
+    constants=myThermo._salt.constants
+    myThermo._salt.constants=lambda a, b: sizes.append(np.size(a)) \
+                                                      or constants(a, b)
+
+    res=myThermo.thermoArr(pairs, na=na, mg=mg)
+
+    assert sizes==[6]
+
+    for i, pair in enumerate(pairs):
+
+        one=thermo.Thermo(na=na[i], mg=mg[i], saltModel=salt.models[name]())
+
+        assert np.isclose(res['Tm'][i], one.thermoArr([pair])['Tm'][0]
+                                                           , rtol=1e-12)
+
+    # the conditions of the object reuse its constants
+    sizes.clear()
+    myThermo.thermoArr(pairs, na=50, mg=1.5, temper=np.arange(12.0))
+
+    assert sizes==[]
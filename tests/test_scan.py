@@ -0,0 +1,169 @@
+"""Checks of the template scans against a brute force calculation of
+every window.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import salt
+import scan
+import thermo
+import utilSeq
+
+
+def _template(n, seed):
+    """A random template with GC rich and AT rich stretches, and runs
+    of N.
+    """
+
+    rng=random.Random(seed)
+
+    parts=[]
+    while sum(len(p) for p in parts)<n:
+
+        bases=rng.choice(["ACGT", "GGCCA", "ATTAC"])
+        parts.append("".join(rng.choice(bases) for _ in range(rng.randint(20, 200))))
+
+        if rng.random()<0.2:
+            parts.append("N"*rng.randint(1, 5))
+
+    return "".join(parts)[:n]
+
+
+def _brute(myThermo, template, lo, hi, lengths):
+    """The windows with Tm in [lo, hi], each calculated by thermoArr."""
+
+    out={}
+    for L in lengths:
+
+        starts=[s for s in range(len(template)-L+1)
+                            if "N" not in template[s:s+L]]
+        pairs=[template[s:s+L]+"/"+utilSeq.seqComp(template[s:s+L])
+                                                        for s in starts]
+
+        Tm=myThermo.thermoArr(pairs)['Tm']
+
+        for s, tm in zip(starts, Tm):
+            if lo<=tm<=hi:
+                out[(s, L)]=tm
+
+    return out
+
+
+@pytest.mark.parametrize("model", ["santalucia", "owczarzy2008"])
+@pytest.mark.parametrize("lo, hi", [(50, 60), (-20, 30), (68, 75), (0, 100)])
+def test_scanBruteForce(model, lo, hi):
+    """The pruned scan finds exactly the windows of the brute force."""
+
+    template=_template(4000, 7)
+    lengths=[12, 18, 25]
+
+    myThermo=thermo.Thermo(saltModel=salt.models[model]())
+    scanner=scan.TmRangeScan(myThermo, lo, hi, lengths, chunk=997)
+
+    hits=list(scanner.scan(template))
+    ref=_brute(myThermo, template, lo, hi, lengths)
+
+    assert sorted((s, L) for s, L, _ in hits)==sorted(ref)
+    assert np.allclose([tm for _, _, tm in hits]
+                     , [ref[(s, L)] for s, L, _ in hits], atol=1e-9)
+
+    counts=scanner.counts
+    assert counts['hits']==len(ref)
+
+    if model=="santalucia" and (lo, hi)!=(0, 100):
+        assert counts['pruned_gc']+counts['pruned_nn']>0
+
+
+def _edits(template, rng, n, gap):
+    """Random SNPs, insertions and deletions, some at the ends of the
+    template, some inserting just before a deletion, and at most gap
+    bases apart.
+    """
+
+    edits=[(0, template[0], "G"), (len(template)-1, template[-1], "C")
+         , (len(template), "", "AT")]
+
+    pos=rng.randint(2, gap)
+    while pos<len(template)-gap and len(edits)<n:
+
+        kind=rng.choice(["snp", "ins", "del", "indel"])
+
+        if kind=="snp":
+            edits.append((pos, template[pos], rng.choice("ACGT")))
+        elif kind=="ins":
+            edits.append((pos, "", "".join(rng.choice("ACGT")
+                                            for _ in range(rng.randint(1, 4)))))
+        elif kind=="del":
+            edits.append((pos, template[pos:pos+rng.randint(1, 4)], ""))
+        else:
+            edits+=[(pos, "", "GC"), (pos, template[pos:pos+3], "")]
+
+        pos+=rng.randint(5, gap)
+
+    return edits
+
+
+def _edited(template, edits):
+    """The template with the edits applied, one at a time from the end
+    (a deletion before the insertion at the same position).
+    """
+
+    out=template
+    for [pos, ref, alt] in sorted(edits, key=lambda e: (e[0], len(e[1]))
+                                                            , reverse=True):
+        out=out[:pos]+alt+out[pos+len(ref):]
+
+    return out
+
+
+@pytest.mark.parametrize("gap", [8, 40])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_applyEdits(gap, seed):
+    """The edited scan equals a new scan of the edited template."""
+
+    rng=random.Random(seed)
+
+    template=_template(600, seed)
+    lengths=[12, 20]
+
+    myThermo=thermo.Thermo()
+    ref=scan.WindowScan(myThermo, template, lengths)
+
+    edits=_edits(template, rng, 40, gap)
+    rng.shuffle(edits)
+    # an insertion stays before the deletion at the same position
+    edits.sort(key=lambda e: (e[0], len(e[1])))
+
+    new=ref.applyEdits(edits)
+    fresh=scan.WindowScan(myThermo, _edited(template, edits), lengths)
+
+    assert np.array_equal(new.code, fresh.code)
+
+    for c, f in zip(new.sums, fresh.sums):
+        assert np.allclose(c, f, atol=1e-6)
+
+    for L in lengths:
+        assert np.allclose(new.tm[L], fresh.tm[L], atol=1e-9, equal_nan=True)
+
+    # the object edited is left as it was
+    assert np.array_equal(ref.code, utilSeq.seqEncode(template))
+
+
+def test_applyEditsShort():
+    """Edits leaving a template shorter than a window."""
+
+    myThermo=thermo.Thermo()
+    ref=scan.WindowScan(myThermo, "ACGTTGCAGGCTA", [5, 12])
+
+    new=ref.applyEdits([(0, "ACG", ""), (6, "CAGG", "T")])
+    fresh=scan.WindowScan(myThermo, "TTGTCTA", [5, 12])
+
+    assert np.array_equal(new.code, fresh.code)
+    assert np.allclose(new.tm[5], fresh.tm[5])
+    assert len(new.tm[12])==0
+
+    with pytest.raises(ValueError):
+        ref.applyEdits([(2, "GT", ""), (3, "T", "A")])
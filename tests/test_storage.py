@@ -0,0 +1,56 @@
+"""Checks of the compact Tm storage of scans and batches."""
+
+import numpy as np
+
+import scan
+import storage
+import thermo
+
+
+def test_storeBatch():
+    """A batch stored in int16 chunks under a budget matches
+    thermoArr.
+    """
+
+    rng=np.random.default_rng(0)
+    comp=str.maketrans("ACGT", "TGCA")
+
+    oligo={}
+    for i in range(500):
+        top="".join(rng.choice(list("ACGT"), rng.integers(15, 30)))
+        oligo[f"d{i:04d}"]=top+"/"+top.translate(comp)
+
+    myThermo=thermo.Thermo()
+    Tm=myThermo.thermoArr(list(oligo.values()))['Tm']
+
+    with storage.storeBatch(myThermo, oligo, chunk=64, dtype='int16'
+                                               , budget=256) as store:
+
+        assert store.nbytes()<=256
+        assert np.allclose(store.region(0, len(oligo)), Tm, atol=0.005)
+        assert np.allclose(store.region(100, 130), Tm[100:130], atol=0.005)
+
+
+def test_scanStore():
+    """A scan stored by a new store of the given dtype, one series per
+    window length.
+    """
+
+    rng=np.random.default_rng(1)
+    template="".join(rng.choice(list("ACGT"), 3000))
+
+    scanner=scan.TmRangeScan(thermo.Thermo(), 0, 100, [18, 22], chunk=500)
+
+    with scanner.scanStore(template, dtype='float32', budget=4096) as store:
+
+        assert store.dtype==np.float32
+        assert store.keys()==[18, 22]
+
+        for L in (18, 22):
+
+            ref=np.concatenate([tm for [k, tm] in scanner._allTm(template)
+                                                                if k==L])
+
+            assert store.size(L)==len(template)-L+1
+            assert np.allclose(store.region(0, store.size(L), L), ref
+                                                            , rtol=1e-6)
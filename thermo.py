@@ -2,167 +2,2160 @@
 using nearest neighbor parameters.
 
 The module contains only one class 'Thermo'. The class needs the
-following custom modules: error, util and utilSeq. They should
-come together with this module.
+following custom modules: error, util, utilSeq, shared and salt. They should
+come together with this module. The vectorized calculation needs
+numpy.
+
+A 'Thermo' object is safe to share between threads: its conditions
+are set once by the constructor, the nearest neighbor parameters are
+read once per folder and shared by all the objects as read only
+tables, and errors are raised rather than exiting. See the method
+'thermoThreads' for a thread pool batch calculation.
+
+For a process pool (see the method 'thermoProcesses'), the compiled
+parameter arrays are put once in shared memory by the module 'shared',
+and the workers attach them by name instead of each loading a copy.
 
 For more information about class 'Thermo', see the class for
 details
 """ 
 
-import sys, os
-from pathlib import Path
-import re
-import math
+import os
+from pathlib import Path
+import re
+import math
+import threading
+import types
+import copy
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+import error
+import util, utilSeq
+import shared
+import salt
+
+
+# the nearest neighbor parameters shared by all the Thermo objects, by
+# the folder of the parameter files and the parameter set (see
+# Thermo._loadNN)
+_nnTables={}
+_nnLock=threading.Lock()
+
+# the nearest neighbor parameter sets by name: the files for dH and dS,
+# and (dH, dS) of the initiation and of each terminal pair other than
+# G/C (see Thermo.registerNN)
+_nnSets={'DNA':('nnSH.csv', 'nnSS.csv', (0.2, -5.7), (2.2, 6.9))}
+
+# the object shared by the calls in a worker process of
+# Thermo.thermoProcesses, see _initWorker
+_pool={}
+
+
+def _initWorker(myThermo):
+    """Set up the object in a worker process."""
+
+    _pool['thermo']=myThermo
+
+
+def _batchWorker(oligo, verbose, cond):
+    """thermoBatch on the object of a worker process."""
+
+    return _pool['thermo'].thermoBatch(oligo, verbose, cond)
+
+
+class Thermo(object):
+    """A class to calculate thermodynamics using nearest neighbor
+    parameters.
+    
+    Constants and default values
+    _R_      --- The gas constant
+    _cp_     --- default concentration of primer (300 nM)
+    _ct_     --- default concentration of template (1.38e-15 nM)
+    _na_     --- default concentration of monovalent salt (100 mM)
+    _mg_     --- default concentration of divalent salt (0.0 mM)
+    _temper_ --- default temperature (65 C)
+    _degenIter_ --- the largest number of iterations for the extremes
+                 of Tm of a degenerate duplex (100).
+    _IUPAC_  --- IUPAC codes and the bases they stand for.
+
+    Attributes:
+    _nndH    --- nearest neighbor parameters for enthalpy.
+    _nndS    --- nearest neighbor parameters for entropy.
+    _nnArrH  --- _nndH compiled into an array (see _compileNN).
+    _nnArrS  --- _nndS compiled into an array (see _compileNN).
+    _salt    --- the salt correction model (see the module salt).
+    _saltK   --- the constants of the salt model for the conditions
+                 of the object.
+                 The four are read only and shared by all the objects
+                 using the same parameter files (see _loadNN). They
+                 are those of the parameter set 'DNA'.
+    _nnSetNames --- the names of the parameter sets compiled, 'DNA'
+                 first (see registerNN).
+    _nnSetSpecs --- the files and the end parameters of the sets.
+    _nnStackH, _nnStackS --- the arrays of the sets stacked, one row
+                 per set.
+    _nnEnds  --- the initiation and terminal dH and dS of the sets,
+                 one row per set.
+    
+    Methods:
+    thermoCal(*)  ---   calculates Tm, perB, dG, dH, dS, Tms, dGs
+                        and dSs for all duplexes given in a dictionary.
+                        perB is the percentage bound.
+                        Tms, dGs and dSs are values under standard
+                        conditions.                     
+    thermoCal0(*) ---   calculates thermodynamics for one duplex.
+    getMelting(*) ---   calculates the percentage bound for a duplex
+                        at various temperatures given in a list.
+    dHdSArr(*)    ---   calculates dH and dS for equal length duplexes
+                        given as arrays of base codes.
+    TmArr(*)      ---   calculates Tm for arrays of dH, dS and lengths.
+    perBArr(*)    ---   calculates perB for arrays.
+    perBLog(*)    ---   calculates perB from the log of the equilibrium
+                        constant, stable for any value.
+    TfArr(*)      ---   the temperatures at given fractions bound for
+                        arrays of dH, dS and lengths.
+    meltingArr(*) ---   the temperatures at given fractions bound for a
+                        batch of duplexes.
+    thermoArr(*)  ---   vectorized calculation for a batch of duplexes
+                        with optional per duplex conditions.
+    thermoMatrix(*) --- all the pairs of equal length probes and
+                        targets as matrices.
+    thermoBatch(*) ---  vectorized counterpart of thermoCal with optional
+                        per duplex conditions.
+    TmChunks(*)   ---   the Tm of a batch of duplexes, chunk by chunk.
+    thermoThreads(*) --- thermoBatch in chunks over a thread pool.
+    thermoProcesses(*) --- thermoBatch in chunks over a process pool.
+    shareTables(store) --- a copy of the object with its parameter
+                        arrays in shared memory for process pools.
+    registerNN(*) ---   register a nearest neighbor parameter set.
+    windowdHdS(*) ---   calculates dH and dS for the perfect match 
+                        windows of a template from prefix sums.
+    windowSums(*) ---   prefix sums of the nearest neighbors along a
+                        template.
+    windowGC(*)   ---   the GC fractions of the windows of a template.
+    degenerate(*) ---   calculates the minimum and maximum Tm, dH and dS
+                        (and the mean dH and dS) of a duplex with IUPAC
+                        degenerate codes.
+    thermoDegen0(*) --- degenerate calculation for one duplex as text.
+    thermoDegen(*) ---  degenerate calculation for duplexes in a
+                        dictionary.
+   
+    _get_dHdS(*)  ---   Calculates dH and dS for one duplex.
+    _readNN(*)    ---   read the nearest neighbor parameters for dH or dS.
+    _loadNN(*)    ---   the shared, read only nearest neighbor tables.
+    _loadSets()   ---   the parameter sets of the object, stacked.
+    _nnSetIndex(*) ---  the parameter sets of a batch by index.
+    _tablesFromArrays(*) --- the parameter dictionaries from the arrays.
+    _perBcal(k, cp, ct)  --- calculate the percentage bound (perB).
+    _compileNN()  ---   compile the nearest neighbor parameters into
+                        arrays.
+    _nnIndex(*)   ---   index the nearest neighbors of coded duplexes.
+    _condArr(*)   ---   per duplex conditions as arrays.
+    _encodePairs(pairs) --- check and encode duplexes.
+    _encodeStrands(*) --- check and encode equal length strands.
+    _dHdSPairs(pairs) --- dH and dS for a batch of duplexes.
+    _condLists(*) ---   per duplex conditions from a dictionary as lists.
+    _uniquePairs(*) --- the unique duplexes of a batch.
+    _gcPairs(pairs) --- the GC fractions of the top strands of a batch.
+    _saltConst(cond) --- the constants of the salt model for per
+                        duplex conditions.
+    _dSsalt(*)    ---   the salt correction for dS.
+    _dSTm(*)      ---   the entropy term added to dS at Tm.
+    _additiveSalt() --- check that the salt model is additive.
+    _degenPairs(pair) --- the base pairs allowed at each position of
+                        a degenerate duplex.
+    _pairTables() ---   the nearest neighbor parameters by base pairs.
+    _degenDP(*)   ---   the extreme of a*dH+b*dS over the expansions of
+                        a degenerate duplex.
+    _degenMean(allowed) --- the mean dH and dS over the expansions.
+    _degenTm(*)   ---   the extreme of Tm over the expansions.
+    """
+
+    _R_=1.987
+    _cp_=300.0
+    _ct_=1.38e-15
+    _na_=100.0
+    _mg_=0.0
+    _temper_=65.0
+    _degenIter_=100
+    
+    _IUPAC_=types.MappingProxyType({'A':'A', 'C':'C', 'G':'G', 'T':'T'
+           , 'U':'T', 'R':'AG', 'Y':'CT', 'S':'CG', 'W':'AT', 'K':'GT'
+           , 'M':'AC', 'B':'CGT', 'D':'AGT', 'H':'ACT', 'V':'ACG'
+           , 'N':'ACGT'})
+
+
+    @staticmethod
+    def _nnFolder():
+        """The folder of the nearest neighbor parameter files, by the
+        environment variable 'NNDIR' or the current working directory.
+        """
+
+        if 'NNDIR' in os.environ:
+            return os.environ['NNDIR']
+
+        return os.getcwd()
+
+
+    @staticmethod
+    def _readNN(HorS, stem=None):
+        """Read the nearest neighbor parameters from a file.
+        
+        The file path is specified by an environment variable 'NNDIR'
+        or at the current working directory.
+        
+        The parameters are made up of 4 6x6 blocks, ignoring blank and
+        comment lines.
+        
+        The first row in each block is the top nearest neighbors
+        in 3'->5'. The first columns in the following 5 rows are the
+        bottom nearest neighbors in 5'->3' orientation. Together they
+        form one complete nearest neighbor 5'-top-3'/3'-bottom-5'. 
+
+        Parameters:
+        HorS : str   --- flag if to read for dH or dS.
+        stem : str   --- the file name (default None, "nnSH.csv" or
+                         "nnSS.csv" by HorS).
+        
+        Exceptions:
+        NNFileNotFoundError  --- a custom error class, raised when
+                                 neither of the parameter files
+                                 "nnSH.csv" and "nnSS.csv" not found.
+                                 This could happen when the environment
+                                 variable 'NNDIR' not set or not pointing
+                                 to the folder where the parameter files
+                                 are or the parameter files are not at 
+                                 the current working folder.
+        
+        Return:
+        A dictionary. Its keys and values are the nearest neighbors and
+                      the corresponding parameters, respectively 
+        """
+ 
+        folder=Thermo._nnFolder()
+            
+        if stem is None:
+            stem="nnSH.csv" if HorS=='dH' else "nnSS.csv"        
+        name=Path(folder+'/'+stem)
+
+        if not Path(name).exists():
+            raise error.NNFileNotFoundError()
+              
+        ls=util.readFileToList(name)
+        
+        index=0
+        NN={}
+        while index < len(ls):
+            
+            # read six (6) rows
+            # first row
+            bottom=re.split("[\t,]", ls[index])
+            
+            # the following five (5) rows
+            for i in range(5):
+                
+                index+=1
+                top=re.split("[\t,]", ls[index])
+                
+                for j in range(1, 6):
+                    
+                    value=float(top[j]) if len(top[j]) >0 else 0.0
+                    
+                    NN[top[0]+"/"+bottom[j]]=value
+                    
+                    # get reverse complementary
+                    nn_t=''.join(reversed(bottom[j]))+"/"+''.join(reversed(top[0]))
+                    NN[nn_t]=value
+                
+            index+=1
+        
+        return NN
+
+
+    @staticmethod
+    def _perBcal(k, cp, ct):
+        """Calculate the percentage bound.
+        
+        Paramaters:
+        k  : float   --- equilibrium constant
+        cp : float   --- primer concentration
+        ct : float   --- template concentration
+        
+        Return:
+        float  ---  percentage bound          
+        """
+
+        lnK=math.log(k) if k>0 else -math.inf
+        
+        return float(Thermo.perBLog(lnK, cp, ct))
+
+
+    @staticmethod
+    def _nnIndex(top, bottom):
+        """Index the nearest neighbors of duplexes coded by
+        utilSeq.seqEncode.
+
+        The nearest neighbor 5'-t0t1-3'/3'-b0b1-5' has the index
+        ((t0*6+t1)*6+b0)*6+b1 in the compiled parameter arrays.
+        
+        Parameters:
+        top    : array --- base codes of the top strands (5'->3')
+                           along the last axis.
+        bottom : array --- base codes of the bottom strands (3'->5'),
+                           with the same shape as top.
+        
+        Return:
+        An integer array, one item shorter than the input along the
+        last axis.
+        """
+        
+        t=np.asarray(top, dtype=np.intp)
+        b=np.asarray(bottom, dtype=np.intp)
+        
+        return ((t[..., :-1]*6+t[..., 1:])*6+b[..., :-1])*6+b[..., 1:]
+
+
+    def _compileNN(self, nndH, nndS):
+        """Compile the nearest neighbor parameters into arrays.
+        
+        The arrays are indexed as described in _nnIndex. The position
+        opposite a dangling end, 'D' in the parameter files, is coded
+        4 here only, so that no input sequence reaches the dangling end
+        parameters (see utilSeq.seqEncode). Nearest neighbors not
+        supported, including any with a base coded 5, are NaN.
+        
+        Parameters:
+        nndH : dictionary --- nearest neighbor parameters for dH.
+        nndS : dictionary --- nearest neighbor parameters for dS.
+
+        Return:
+        A list with the arrays for dH and dS.
+        """
+        
+        nnH=np.full(6**4, np.nan)
+        nnS=np.full(6**4, np.nan)
+        
+        for nn in nndH:
+            
+            bases=nn.replace('/', '')
+            
+            code=utilSeq.seqEncode(bases)
+            code[np.array(list(bases.upper()))=='D']=4
+            idx=self._nnIndex(code[:2], code[2:])[0]
+            
+            nnH[idx]=nndH[nn]
+            nnS[idx]=nndS[nn]
+            
+        return [nnH, nnS]
+
+
+    def _loadNN(self, spec=None):
+        """The nearest neighbor parameters, shared by all the objects.
+
+        The parameter files are read and compiled once per folder and
+        parameter set, the first time an object is constructed, under
+        a lock. The tables
+        are read only: the dictionaries are mapping proxies and the
+        arrays are not writeable, so that any number of objects and
+        threads can use them at the same time. Changes to the files
+        after the first read take effect in a new process.
+
+        Parameters:
+        spec : tuple --- the files and the end parameters of the set,
+                         as registered (default None, the set 'DNA').
+
+        Exceptions:
+        NNFileNotFoundError --- see _readNN.
+
+        Return:
+        A list with _nndH, _nndS, _nnArrH and _nnArrS.
+        """
+
+        if spec is None:
+            spec=_nnSets['DNA']
+
+        key=(self._nnFolder(), spec[:2])
+
+        with _nnLock:
+
+            if key not in _nnTables:
+
+                nndH=types.MappingProxyType(self._readNN("dH", spec[0]))
+                nndS=types.MappingProxyType(self._readNN("dS", spec[1]))
+
+                [nnArrH, nnArrS]=self._compileNN(nndH, nndS)
+                nnArrH.flags.writeable=False
+                nnArrS.flags.writeable=False
+
+                _nnTables[key]=(nndH, nndS, nnArrH, nnArrS)
+
+            return list(_nnTables[key])
+
+
+    def _loadSets(self):
+        """The nearest neighbor parameter sets of the object, stacked.
+
+        Exceptions:
+        NNFileNotFoundError --- see _readNN.
+
+        Return:
+        A list with _nndH, _nndS, _nnArrH and _nnArrS of the set 'DNA',
+        and the read only arrays _nnStackH, _nnStackS and _nnEnds.
+        """
+
+        tables=[self._loadNN(spec) for spec in self._nnSetSpecs]
+
+        stackH=np.stack([t[2] for t in tables])
+        stackS=np.stack([t[3] for t in tables])
+        ends=np.array([spec[2]+spec[3] for spec in self._nnSetSpecs])
+
+        for x in (stackH, stackS, ends):
+            x.flags.writeable=False
+
+        return tables[0]+[stackH, stackS, ends]
+
+
+    @staticmethod
+    def registerNN(name, fileH, fileS, init=(0.2, -5.7), terminal=(2.2, 6.9)):
+        """Register a nearest neighbor parameter set, e.g., for RNA/RNA
+        or DNA/RNA duplexes.
+
+        The files are in the same format as "nnSH.csv" and "nnSS.csv"
+        (see _readNN), found in the same folder, with T standing for U.
+        The objects constructed afterwards can compile the set (see the
+        constructor) and select it per duplex in thermoArr and
+        thermoBatch.
+
+        Parameters:
+        name     : str   --- the name of the set. 'DNA' is the set of
+                             the default files and cannot be changed.
+        fileH    : str   --- the file name of the parameters for dH.
+        fileS    : str   --- the file name of the parameters for dS.
+        init     : tuple --- dH (kcal/mol) and dS (e.u.) of the
+                             initiation (default those of DNA).
+        terminal : tuple --- dH and dS of each terminal pair other
+                             than G/C (default those of DNA).
+
+        Exceptions:
+        ValueError --- the name is 'DNA'.
+        """
+
+        if name=='DNA':
+            raise ValueError("The parameter set 'DNA' cannot be changed.")
+
+        with _nnLock:
+            _nnSets[name]=(fileH, fileS, tuple(map(float, init))
+                                       , tuple(map(float, terminal)))
+
+
+    def _nnSetIndex(self, nnSet, n):
+        """The parameter sets of a batch by their index in the stack.
+
+        Parameters:
+        nnSet : str or list --- the name of the set of all the duplexes
+                                or of each, None for 'DNA'.
+        n     : int         --- number of duplexes.
+
+        Exceptions:
+        ValueError --- a set is not compiled by the object.
+
+        Return:
+        An integer array, one item per duplex.
+        """
+
+        names=self._nnSetNames
+
+        if nnSet is None or isinstance(nnSet, str):
+            nnSet=[nnSet]*n
+
+        try:
+            return np.array([0 if x is None else names.index(x)
+                                    for x in nnSet], dtype=np.intp)
+        except ValueError:
+            missing=[x for x in nnSet if x is not None and x not in names][0]
+            raise ValueError(f"The parameter set {missing} is not compiled.")
+
+
+    @staticmethod
+    def _tablesFromArrays(nnArrH, nnArrS):
+        """The nearest neighbor parameter dictionaries from the arrays
+        compiled by _compileNN.
+
+        Parameters:
+        nnArrH : array --- compiled parameters for dH.
+        nnArrS : array --- compiled parameters for dS.
+
+        Return:
+        A list with the read only dictionaries for dH and dS.
+        """
+
+        base="ACGTD"
+
+        nndH={}
+        nndS={}
+        for idx in np.nonzero(~np.isnan(nnArrH))[0]:
+
+            [t0, t1, b0, b1]=np.unravel_index(idx, (6, 6, 6, 6))
+            nn=base[t0]+base[t1]+"/"+base[b0]+base[b1]
+
+            nndH[nn]=float(nnArrH[idx])
+            nndS[nn]=float(nnArrS[idx])
+
+        return [types.MappingProxyType(nndH), types.MappingProxyType(nndS)]
+
+
+    def shareTables(self, store):
+        """A copy of the object with its nearest neighbor arrays in
+        shared memory.
+
+        When the copy is pickled into another process, e.g., as an
+        argument to a process pool, the arrays are not pickled with
+        it. The process attaches them by name instead (see
+        __setstate__).
+
+        Parameters:
+        store : shared.SharedArrays --- the owner of the shared memory.
+                                        It should stay open while the
+                                        copy is used by other processes.
+
+        Return:
+        A Thermo object.
+        """
+
+        other=copy.copy(self)
+        other._nnShared=[store.put(x) for x in (self._nnStackH
+                                              , self._nnStackS, self._nnEnds)]
+
+        return other
+
+
+    def __getstate__(self):
+        """The state for pickling, without the nearest neighbor tables.
+
+        See __setstate__.
+        """
+
+        state=self.__dict__.copy()
+
+        for k in ('_nndH', '_nndS', '_nnArrH', '_nnArrS', '_nnStackH'
+                , '_nnStackS', '_nnEnds'):
+            state.pop(k, None)
+
+        return state
+
+
+    def __setstate__(self, state):
+        """Restore a pickled object.
+
+        The nearest neighbor arrays are attached from shared memory if
+        the object came from shareTables, or else loaded as by the
+        constructor.
+        """
+
+        self.__dict__.update(state)
+
+        spec=state.get('_nnShared')
+
+        if spec is None:
+            [self._nndH, self._nndS, self._nnArrH, self._nnArrS
+           , self._nnStackH, self._nnStackS, self._nnEnds]=self._loadSets()
+        else:
+            [self._nnStackH, self._nnStackS, self._nnEnds]=[shared.attach(x)
+                                                                for x in spec]
+            [self._nnArrH, self._nnArrS]=[self._nnStackH[0], self._nnStackS[0]]
+            [self._nndH, self._nndS]=self._tablesFromArrays(self._nnArrH
+                                                          , self._nnArrS)
+
+
+    def dHdSArr(self, top, bottom, nnSet=None):
+        """Calculates dH and dS for equal length duplexes.
+        
+        It is the vectorized counterpart of _get_dHdS.
+        
+        Parameters:
+        top    : array --- base codes (utilSeq.seqEncode) of the top
+                           strands (5'->3'), one duplex per row.
+        bottom : array --- base codes of the bottom strands (3'->5'),
+                           with the same shape as top.
+        nnSet  : array --- the parameter set of each row by index (see
+                           _nnSetIndex) (default None, all 'DNA').
+        
+        Return:
+        A list with the arrays of dH and dS, one item per row. Duplexes
+        with a nearest neighbor not supported are NaN.
+        """
+        
+        top=np.atleast_2d(np.asarray(top, dtype=np.uint8))
+        bottom=np.atleast_2d(np.asarray(bottom, dtype=np.uint8))
+        
+        idx=self._nnIndex(top, bottom)
+        
+        if nnSet is None:
+            nnSet=np.zeros(len(top), dtype=np.intp)
+            nnH=self._nnArrH[idx]
+            nnS=self._nnArrS[idx]
+        else:
+            nnSet=np.asarray(nnSet, dtype=np.intp)
+            nnH=self._nnStackH[nnSet[:, None], idx]
+            nnS=self._nnStackS[nnSet[:, None], idx]
+            
+        [initH, initS, termH, termS]=self._nnEnds[nnSet].T
+        
+        # initiation and propagation
+        dH=initH+nnH.sum(axis=1)
+        dS=initS+nnS.sum(axis=1)
+        
+        # symmetry correction
+        rc=np.where(top<4, 3-top, 5)[:, ::-1]
+        isSymm=(top==rc).all(axis=1)
+        dS-=1.4*isSymm
+        
+        # terminal AT correction
+        for end in (0, -1):
+            
+            isGC=((top[:, end]==1) & (bottom[:, end]==2)) \
+                | ((top[:, end]==2) & (bottom[:, end]==1))
+            
+            dH+=np.where(isGC, 0.0, termH)
+            dS+=np.where(isGC, 0.0, termS)
+            
+        return [dH, dS]
+        
+
+    def TmArr(self, dH, dS, length, cond=None, gc=None, saltK=None):
+        """Calculates Tm for arrays of dH, dS and duplex lengths.
+        
+        The same salt correction and the equilibrium constant at
+        the melting temperature as in thermoCal0 are used.
+        
+        Parameters:
+        dH     : array --- enthalpy (kcal/mol)
+        dS     : array --- entropy (e.u.) before salt correction
+        length : array --- duplex lengths (number of base pairs)
+        cond   : list  --- per duplex conditions from _condArr
+                           (default None, the conditions of the class)
+        gc     : array --- GC fractions, needed by the salt models
+                           which are not additive (default None).
+        saltK  : array --- the constants of the salt model for cond,
+                           from _saltConst (default None, calculated
+                           here).
+        
+        Return:
+        An array of Tm in celsius.
+        """
+        
+        dSTm=np.asarray(dS)+self._dSTm(length, cond, dH, gc, saltK)
+        
+        return np.asarray(dH)*1000/dSTm-273.15
+
+
+    def TfArr(self, dH, dS, length, fraction, cond=None, gc=None):
+        """Calculates the temperature at given fractions bound for
+        arrays of dH, dS and duplex lengths.
+        
+        With the two-state model of _perBcal, a fraction f of the
+        template is bound when the equilibrium constant is
+        k=f/((1-f)*(cp-f*ct)), so that the temperature solves
+        dH*1000/(dS-R*ln(k)), with dS salt corrected as in thermoCal0.
+        At f=0.5 it is Tm.
+        
+        Parameters:
+        dH       : array --- enthalpy (kcal/mol)
+        dS       : array --- entropy (e.u.) before salt correction
+        length   : array --- duplex lengths (number of base pairs)
+        fraction : array --- fractions bound, each in (0, 1).
+        cond     : list  --- per duplex conditions from _condArr
+                             (default None, the conditions of the class)
+        gc       : array --- GC fractions, see TmArr (default None).
+        
+        Return:
+        An array of temperatures in celsius, one row per duplex and one
+        column per fraction. With a scalar fraction, one item per 
+        duplex.
+        """
+        
+        R=self._R_
+        
+        if cond is None:
+            cp=self._cp
+            ct=self._ct
+        else:
+            [cp, ct]=cond[1:3]
+            
+        f=np.asarray(fraction, dtype=float)
+        
+        dSeff=np.asarray(dS)+self._dSsalt(length, cond, dH, gc)
+        dH=np.asarray(dH)
+        
+        if f.ndim>0:
+            [dH, dSeff, cp, ct]=[np.asarray(x)[..., None] for x in (dH, dSeff, cp, ct)]
+            
+        k=f/((1-f)*(cp-f*ct))
+        
+        return dH*1000/(dSeff-R*np.log(k))-273.15
+
+
+    def meltingArr(self, pairs, fraction=(0.1, 0.5, 0.9), temper=None
+                                , cp=None, ct=None, na=None, mg=None):
+        """Calculates the temperatures at given fractions bound for a
+        batch of duplexes.
+        
+        The temperatures are solved directly (see TfArr), with no 
+        sampling of temperatures as in getMelting. E.g., the width of
+        the melting transition from 90% to 10% bound is the difference
+        of the columns for 0.1 and 0.9. Note that dS is salt corrected
+        here, as for Tm, while getMelting uses dS without correction.
+        
+        Parameters:
+        pairs    : list  --- duplexes in "top/bottom" format, as in
+                             thermoCal0.
+        fraction : array --- fractions bound, each in (0, 1)
+                             (default (0.1, 0.5, 0.9)).
+        temper, cp, ct, na, mg --- optional per duplex conditions, see
+                             method 'thermoArr'.
+        
+        Return:
+        An array of temperatures in celsius, one row per duplex and one
+        column per fraction.
+        """
+        
+        cond=self._condArr(len(pairs), temper, cp, ct, na, mg)
+        
+        [dH, dS, length]=self._dHdSPairs(pairs)
+        
+        return self.TfArr(dH, dS, length, np.atleast_1d(fraction), cond
+                                                , self._gcPairs(pairs))
+
+
+    @staticmethod
+    def perBArr(k, cp, ct):
+        """Calculates the percentage bound for arrays.
+        
+        It is the vectorized counterpart of _perBcal.
+        
+        Paramaters:
+        k  : array   --- equilibrium constant
+        cp : array   --- primer concentration
+        ct : array   --- template concentration
+        
+        Return:
+        An array of the percentage bound.
+        """
+        
+        with np.errstate(divide='ignore'):
+            lnK=np.log(k)
+            
+        return Thermo.perBLog(lnK, cp, ct)
+
+
+    @staticmethod
+    def perBLog(lnK, cp, ct):
+        """Calculates the percentage bound from the log of the
+        equilibrium constant.
+        
+        The percentage bound p is the smaller root of
+        p*p-(c+1+u)*p+c=0, where c=cp/ct and u=1/k/ct. It is taken in
+        the form 2c/(c+1+u+sqrt((c-1+u)**2+4u)), which has no
+        cancellation since c>=1, with c, u and 1 scaled by the largest
+        of them in log space. So it neither overflows for extreme k,
+        nor aborts an array calculation: p goes to 1 as ln(k) goes to
+        inf, and to 0 as ln(k) goes to -inf.
+        
+        Paramaters:
+        lnK : array   --- natural log of the equilibrium constant,
+                          i.e., -dG*1000/R/T
+        cp  : array   --- primer concentration
+        ct  : array   --- template concentration
+        
+        Return:
+        An array of the percentage bound.
+        """
+        
+        lnK=np.asarray(lnK, dtype=float)
+        
+        lc=np.log(cp)-np.log(ct)
+        lu=-lnK-np.log(ct)
+        
+        # scale by the largest of c, u and 1
+        lm=np.maximum(np.maximum(lc, lu), 0.0)
+        
+        with np.errstate(invalid='ignore', over='ignore', under='ignore'):
+            
+            cM=np.exp(lc-lm)
+            uM=np.exp(lu-lm)
+            oneM=np.exp(-lm)
+            
+            d=cM-oneM+uM
+            x=np.sqrt(d*d+4.0*uM*oneM)
+            
+            perB=2.0*cM/(cM+oneM+uM+x)
+            
+        return np.where(lu==np.inf, 0.0, perB)
+
+
+    def _condArr(self, n, temper=None, cp=None, ct=None, na=None, mg=None):
+        """Per duplex conditions as arrays.
+        
+        The conditions are checked as in the constructor and turned 
+        into the units used inside the class. Conditions not given, 
+        or NaN, take the values of the class.
+        
+        Parameters:
+        n      : int   --- number of duplexes.
+        temper : array --- temperature in celsius.
+        cp     : array --- primer concentration in nM.
+        ct     : array --- template concentration in nM.
+        na     : array --- monovalent salt concentration in mM.
+        mg     : array --- divalent salt concentration in mM.
+        
+        Exceptions:
+        see the constructor.
+        
+        Return:
+        A list of arrays for temper (K), cp, ct, na and mg (M).
+        """
+        
+        def _arr(x, default, scale, offset):
+            
+            if x is None:
+                return np.full(n, default)
+                
+            x=np.broadcast_to(np.asarray(x, dtype=float), (n,))
+            
+            return np.where(np.isnan(x), default, x*scale+offset)
+            
+        temper=_arr(temper, self._temper, 1.0, 273.15)
+        cp=_arr(cp, self._cp, 1e-9, 0.0)
+        ct=_arr(ct, self._ct, 1e-9, 0.0)
+        na=_arr(na, self._na, 1e-3, 0.0)
+        mg=_arr(mg, self._mg, 1e-3, 0.0)
+        
+        if ((cp<0) | (ct<0) | (na<0) | (mg<0)).any():
+            raise ValueError("The concentrations should not be negative.")
+            
+        if (cp==0).any():
+            raise error.ConcentrationZeroError('cp')
+
+        if (ct==0).any():
+            raise error.ConcentrationZeroError('ct')
+        
+        if (cp<ct).any():
+            raise error.ConcentrationOrderError
+        
+        if ((temper>200+273.15) | (temper<-100+273.15)).any():
+            raise error.TemperatureRangeError
+            
+        return [temper, cp, ct, na, mg]
+
+
+    def _saltConst(self, cond):
+        """The constants of the salt model for per duplex conditions.
+        
+        They are those of the object where the salt concentrations are
+        all the object's, and otherwise calculated once per distinct
+        pair of salt concentrations and spread over the duplexes.
+        
+        Parameters:
+        cond : list --- per duplex conditions from _condArr, or None
+                        for the conditions of the object.
+        
+        Return:
+        The constants, as from the method 'constants' of the model.
+        """
+        
+        if cond is None:
+            return self._saltK
+            
+        [na, mg]=np.broadcast_arrays(*[np.asarray(x, dtype=float)
+                                                   for x in cond[3:]])
+        
+        if (na==self._na).all() and (mg==self._mg).all():
+            return self._saltK
+            
+        # one pair for all the duplexes
+        if na.size>0 and (na==na.flat[0]).all() and (mg==mg.flat[0]).all():
+            k=self._salt.constants(na.flat[0], mg.flat[0])
+            
+            if isinstance(k, (list, tuple)):
+                return [np.broadcast_to(x, na.shape) for x in k]
+                
+            return np.broadcast_to(k, na.shape)
+            
+        # the pairs as complex numbers, sorted by na then mg
+        [salt, inverse]=np.unique((na+1j*mg).ravel(), return_inverse=True)
+        inverse=inverse.reshape(na.shape)
+        
+        k=self._salt.constants(salt.real, salt.imag)
+        
+        if isinstance(k, (list, tuple)):
+            return [np.broadcast_to(x, len(salt))[inverse] for x in k]
+            
+        return np.broadcast_to(k, len(salt))[inverse]
+        
+        
+    def _dSsalt(self, length, cond=None, dH=None, gc=None, saltK=None):
+        """The salt correction for dS by the salt model.
+        
+        The constants of the model are those of the object, or those
+        of the per duplex conditions (see _saltConst).
+        
+        Parameters:
+        length : array --- duplex lengths (number of base pairs)
+        cond   : list  --- per duplex conditions from _condArr
+                           (default None, the conditions of the class)
+        dH     : array --- enthalpy (kcal/mol) (default None).
+        gc     : array --- GC fractions (default None).
+                           dH and gc are needed by the salt models
+                           which are not additive.
+        saltK  : array --- the constants of the salt model for cond,
+                           from _saltConst (default None, calculated
+                           here).
+        
+        Exceptions:
+        ValueError --- dH or gc is missing for a model not additive.
+        
+        Return:
+        An array (or float) in e.u.
+        """
+        
+        k=self._saltConst(cond) if saltK is None else saltK
+            
+        if not self._salt.additive and (dH is None or gc is None):
+            raise ValueError("The salt model needs dH and the GC fraction.")
+        
+        return self._salt.dS(k, length, dH, gc)
+        
+        
+    def _additiveSalt(self):
+        """Check that the salt model is additive, as needed by the
+        calculations bounding or summing over nearest neighbors.
+        
+        Exceptions:
+        ValueError --- the model is not additive.
+        """
+        
+        if not self._salt.additive:
+            raise ValueError("The calculation needs an additive salt"
+                                                " model (see salt.py).")
+        
+        
+    def _dSTm(self, length, cond=None, dH=None, gc=None, saltK=None):
+        """The entropy term added to dS at the melting temperature.
+        
+        It is the salt correction of thermoCal0 minus R*ln(ktm), so 
+        that Tm (kelvin) is dH*1000/(dS+_dSTm(length)).
+        
+        Parameters:
+        length : array --- duplex lengths (number of base pairs)
+        cond   : list  --- per duplex conditions from _condArr
+                           (default None, the conditions of the class)
+        dH, gc, saltK : array --- see _dSsalt (default None).
+        
+        Return:
+        An array (or float) in e.u.
+        """
+        
+        R=self._R_
+        
+        if cond is None:
+            cp=self._cp
+            ct=self._ct
+        else:
+            [cp, ct]=cond[1:3]
+        
+        ktm=1/(cp-ct/2)
+        
+        return self._dSsalt(length, cond, dH, gc, saltK)-R*np.log(ktm)
+
+
+    def _encodePairs(self, pairs):
+        """Check and encode duplexes for the vectorized calculation.
+        
+        Parameters:
+        pairs : list --- duplexes in "top/bottom" format, as in
+                         thermoCal0. 
+        
+        U is read as T, for the RNA parameter sets.
+        
+        Exceptions:
+        NotDNAError         --- a duplex has letters other than A, C,
+                                G, T and U.
+        DuplexNotFlushError --- the two strands differ in length.
+        
+        Return:
+        A list with the top and the bottom codes (lists of arrays, one
+        per duplex) and the lengths.
+        """
+        
+        top=[]
+        bottom=[]
+        for pair in pairs:
+            
+            pair=pair.upper().replace("U", "T")
+            
+            if re.search("[^ACGT/]", pair) or pair.count("/")!=1:
+                raise error.NotDNAError(pair)
+                
+            temp=pair.split("/")
+            
+            if len(temp[0])!=len(temp[1]):
+                raise error.DuplexNotFlushError(pair)
+                
+            top.append(utilSeq.seqEncode(temp[0]))
+            bottom.append(utilSeq.seqEncode(temp[1]))
+            
+        length=np.array([len(t) for t in top], dtype=np.intp)
+            
+        return [top, bottom, length]
+
+
+    @staticmethod
+    def _encodeStrands(seqs, length=None):
+        """Check and encode equal length strands.
+        
+        U is read as T, for the RNA parameter sets.
+        
+        Parameters:
+        seqs   : list --- the strands.
+        length : int  --- the length required (default None, that of
+                          the first strand).
+        
+        Exceptions:
+        NotDNAError         --- a strand has letters other than A, C,
+                                G, T and U.
+        DuplexNotFlushError --- a strand differs in length.
+        
+        Return:
+        An array of base codes, one strand per row.
+        """
+        
+        code=[]
+        for seq in seqs:
+            
+            seq=seq.upper().replace("U", "T")
+            
+            if re.search("[^ACGT]", seq):
+                raise error.NotDNAError(seq)
+                
+            if length is None:
+                length=len(seq)
+                
+            if len(seq)!=length:
+                raise error.DuplexNotFlushError(seq)
+                
+            code.append(utilSeq.seqEncode(seq))
+            
+        if len(code)==0:
+            return np.zeros((0, length or 0), dtype=np.uint8)
+            
+        return np.stack(code).astype(np.uint8)
+
+
+    @staticmethod
+    def _gcPairs(pairs):
+        """The GC fractions of the top strands of a batch of duplexes.
+        
+        Parameters:
+        pairs : list --- duplexes in "top/bottom" format.
+        
+        Return:
+        An array, one item per duplex.
+        """
+        
+        gc=[]
+        for pair in pairs:
+            
+            top=pair.upper().split("/")[0]
+            gc.append((top.count("G")+top.count("C"))/max(len(top), 1))
+            
+        return np.array(gc)
+
+
+    def _dHdSPairs(self, pairs, nnSet=None):
+        """Calculates dH and dS for a batch of duplexes.
+        
+        The duplexes are grouped by length for dHdSArr.
+        
+        Parameters:
+        pairs : list  --- duplexes in "top/bottom" format, as in
+                          thermoCal0. 
+        nnSet : array --- the parameter set of each duplex by index
+                          (default None, all 'DNA').
+        
+        Exceptions:
+        NotDNAError, DuplexNotFlushError, NNnotExistError --- see
+                        _get_dHdS.
+        
+        Return:
+        A list with the arrays of dH, dS (before salt correction) and
+        the lengths.
+        """
+        
+        [top, bottom, length]=self._encodePairs(pairs)
+        
+        n=len(pairs)
+        
+        dH=np.empty(n)
+        dS=np.empty(n)
+        
+        for L in np.unique(length):
+            
+            rows=np.nonzero(length==L)[0]
+            
+            t=np.stack([top[i] for i in rows])
+            b=np.stack([bottom[i] for i in rows])
+            
+            [dH[rows], dS[rows]]=self.dHdSArr(t, b, None if nnSet is None
+                                                         else nnSet[rows])
+            
+            bad=np.nonzero(np.isnan(dH[rows]))[0]
+            if len(bad)>0:
+                
+                i=rows[bad[0]]
+                
+                arrH=self._nnArrH if nnSet is None else self._nnStackH[nnSet[i]]
+                nnH=arrH[self._nnIndex(top[i], bottom[i])]
+                j=np.nonzero(np.isnan(nnH))[0][0]
+                
+                [tp, bt]=pairs[i].upper().split("/")
+                nn=tp[j:j+2]+'/'+bt[j:j+2]
+                
+                raise error.NNnotExistError(nn, list(tp), list(bt))
+                
+        return [dH, dS, length]
+
+
+    def thermoArr(self, pairs, temper=None, cp=None, ct=None, na=None
+                                                , mg=None, nnSet=None):
+        """Vectorized thermodynamics calculation for a batch of
+        duplexes, with optional per duplex conditions.
+        
+        It calculates the same quantities as thermoCal0 at verbose
+        level 2, for all the duplexes in one pass. The duplexes are 
+        grouped by length for the nearest neighbor sums, and the 
+        conditions are broadcast over the batch.
+        
+        Parameters:
+        pairs  : list  --- duplexes in "top/bottom" format, as in
+                           thermoCal0.
+        temper : array --- temperature in celsius.
+        cp     : array --- primer concentration in nM.
+        ct     : array --- template concentration in nM.
+        na     : array --- monovalent salt concentration in mM.
+        mg     : array --- divalent salt concentration in mM.
+                           Each condition is a scalar or an array with
+                           one item per duplex. Conditions not given, 
+                           or NaN, take the values of the class.
+        nnSet  : list  --- the name of the nearest neighbor parameter
+                           set of all the duplexes, or of each, mixed
+                           in one pass (default None, 'DNA'). The sets
+                           should be compiled by the constructor.
+        
+        Exceptions:
+        NotDNAError, DuplexNotFlushError, NNnotExistError --- see
+                        _get_dHdS; also the errors of the constructor.
+        ValueError --- a parameter set is not compiled.
+        
+        Return:
+        A dictionary of arrays, one item per duplex:
+        Tm, perB, dG, dH, dS (salt corrected), Tms, dGs, dSs as in
+        thermoCal0, and the conditions temper (K), cp, ct, na, mg (M).
+        """
+        
+        R=self._R_
+        
+        n=len(pairs)
+        cond=self._condArr(n, temper, cp, ct, na, mg)
+        [temper, cp, ct, na, mg]=cond
+        
+        if nnSet is not None:
+            
+            nnSet=self._nnSetIndex(nnSet, n)
+            
+            # all 'DNA', the plain arrays
+            if not nnSet.any():
+                nnSet=None
+            
+        [dH, dS, length]=self._dHdSPairs(pairs, nnSet)
+        gc=self._gcPairs(pairs)
+        
+        # the salt constants once for both the dS and the Tm
+        saltK=self._saltConst(cond)
+        
+        dSeff=dS+self._dSsalt(length, cond, dH, gc, saltK)
+        
+        dG=dH-temper*dSeff/1000
+        Tm=self.TmArr(dH, dS, length, cond, gc, saltK)
+        
+        perB=self.perBLog(-dG*1000/R/temper, cp, ct)
+        
+        # under standard condition, the equilibirum constant is 1e4
+        Tms=dH*1000/(dS-R*math.log(1e4))-273.15
+        dGs=dH-310.15*dS/1000
+        
+        return {'Tm':Tm, 'perB':perB, 'dG':dG, 'dH':dH, 'dS':dSeff
+              , 'Tms':Tms, 'dGs':dGs, 'dSs':dS, 'temper':temper, 'cp':cp
+              , 'ct':ct, 'na':na, 'mg':mg}
+
+
+
+    def thermoMatrix(self, probes, targets, nnSet=None, block=1<<22):
+        """Vectorized thermodynamics calculation for all the pairs of
+        equal length probes and targets.
+        
+        Each pair is the flush duplex "probe/target", calculated as by
+        thermoArr under the conditions of the class. The probes and 
+        the targets are encoded once; the nearest neighbor index of a
+        pair is the sum of a part from the probe and a part from the
+        target (see _nnIndex), so dH and dS of all the pairs come from
+        broadcast gathers of the compiled arrays. The pairs are taken
+        in tiles of at most 'block' nearest neighbors, so that the 
+        memory used besides the result stays bounded.
+        
+        Parameters:
+        probes  : list --- the top strands (5'->3').
+        targets : list --- the bottom strands (3'->5'), as in the
+                         "top/bottom" format, all of the same length as
+                         the probes.
+        nnSet   : str  --- the name of the nearest neighbor parameter
+                         set (default None, 'DNA').
+        block   : int  --- the largest number of nearest neighbors in a
+                         tile (default 4194304).
+        
+        Exceptions:
+        NotDNAError, DuplexNotFlushError --- see _encodeStrands.
+        ValueError --- the parameter set is not compiled, or the
+                       strands are shorter than 2.
+        
+        Return:
+        A dictionary of arrays, one row per probe and one column per
+        target: Tm, dG, dH and dS (salt corrected) as in thermoArr. The
+        pairs with a nearest neighbor not supported, e.g., consecutive
+        mismatches, are NaN.
+        """
+        
+        k=self._nnSetIndex(nnSet, 1)[0]
+        arrH=self._nnStackH[k]
+        arrS=self._nnStackS[k]
+        [initH, initS, termH, termS]=self._nnEnds[k]
+        
+        top=self._encodeStrands(probes)
+        bottom=self._encodeStrands(targets, len(top[0]) if len(top) else None)
+        
+        [N, L]=top.shape
+        M=len(bottom)
+        
+        if N>0 and M>0 and L<2:
+            raise ValueError("The strands should be at least 2 long.")
+        
+        # the parts of the nearest neighbor index, see _nnIndex
+        t=top.astype(np.intp)
+        b=bottom.astype(np.intp)
+        idxTop=(t[:, :-1]*6+t[:, 1:])*36
+        idxBottom=b[:, :-1]*6+b[:, 1:]
+        
+        # symmetry correction, from the probe alone as in dHdSArr
+        rc=np.where(top<4, 3-top, 5)[:, ::-1]
+        symm=(top==rc).all(axis=1)
+        
+        gc=((top==1) | (top==2)).mean(axis=1)
+        
+        dH=np.empty((N, M))
+        dS=np.empty((N, M))
+        
+        nCol=min(M, max(block//max(L-1, 1), 1))
+        nRow=max(block//max(nCol*(L-1), 1), 1)
+        
+        for r in range(0, N, nRow):
+            for c in range(0, M, nCol):
+                
+                idx=idxTop[r:r+nRow, None, :]+idxBottom[None, c:c+nCol, :]
+                
+                dH[r:r+nRow, c:c+nCol]=arrH[idx].sum(axis=2)
+                dS[r:r+nRow, c:c+nCol]=arrS[idx].sum(axis=2)
+        
+        dH+=initH
+        dS+=initS-1.4*symm[:, None]
+        
+        # terminal AT correction
+        for end in (0, -1):
+            
+            tEnd=top[:, end, None]
+            bEnd=bottom[None, :, end]
+            isGC=((tEnd==1) & (bEnd==2)) | ((tEnd==2) & (bEnd==1))
+            
+            dH+=np.where(isGC, 0.0, termH)
+            dS+=np.where(isGC, 0.0, termS)
+        
+        gc=gc[:, None]
+        
+        dSeff=dS+self._dSsalt(L, None, dH, gc)
+        
+        return {'Tm':self.TmArr(dH, dS, L, None, gc)
+              , 'dG':dH-self._temper*dSeff/1000, 'dH':dH, 'dS':dSeff}
+
+
+    @staticmethod
+    def _condLists(names, cond):
+        """The per duplex conditions as lists for thermoArr.
+
+        Parameters:
+        names : list       --- the duplex names.
+        cond  : dictionary --- per duplex conditions, as in thermoBatch,
+                               or None.
+
+        Return:
+        A dictionary with one list per condition, one item per name,
+        NaN where not given, and the list of the parameter sets
+        'nnSet', 'DNA' where not given.
+        """
+
+        if cond is None:
+            cond={}
+
+        condArr={}
+        for c in ['temper', 'cp', 'ct', 'na', 'mg']:
+            condArr[c]=[cond.get(o, {}).get(c, math.nan) for o in names]
+
+        condArr['nnSet']=[cond.get(o, {}).get('nnSet', 'DNA') for o in names]
+
+        return condArr
+
+
+    @staticmethod
+    def _uniquePairs(pairs, condArr, byGC=False):
+        """Find the unique duplexes of a batch under their conditions.
+
+        A duplex and its rotation (the bottom strand read as the top,
+        reverse(bottom)/reverse(top)) have the same nearest neighbors
+        and terminals, so they are the same duplex as long as their
+        top strands agree on self complementarity (the symmetry
+        correction), and, for the salt models which are not additive,
+        on the GC count (see _gcPairs), which differs between the two
+        strands of a mismatched duplex.
+
+        Parameters:
+        pairs   : list       --- duplexes in "top/bottom" format.
+        condArr : dictionary --- the conditions, one list item per
+                                 duplex, as passed to thermoArr.
+        byGC    : bool       --- key also by the GC count of the top
+                                 strand (default False).
+
+        Return:
+        A list with the rows of the first duplex of each unique one,
+        and the index of the unique duplex for each row (an array).
+        """
+
+        keys={}
+        rows=[]
+        inverse=np.empty(len(pairs), dtype=np.intp)
+
+        for i, pair in enumerate(pairs):
+
+            pair=pair.upper()
+            temp=pair.split("/")
+
+            if len(temp)==2:
+                rot=utilSeq.seqRev(temp[1])+'/'+utilSeq.seqRev(temp[0])
+                isSymm=temp[0]==utilSeq.seqRC(temp[0])
+                nGC=temp[0].count("G")+temp[0].count("C") if byGC else None
+                pair=(min(pair, rot), isSymm, nGC)
+
+            # NaN is never equal to itself, so a missing condition is
+            # keyed as None
+            cond=tuple(v if v==v else None
+                            for v in (condArr[c][i] for c in condArr))
+
+            j=keys.setdefault((pair, cond), len(rows))
+            if j==len(rows):
+                rows.append(i)
+
+            inverse[i]=j
+
+        return [rows, inverse]
+
+
+    def thermoBatch(self, oligo, verbose=0, cond=None, stats=None):
+        """Vectorized thermodynamics calculation for duplexes in a
+        dictionary, with optional per duplex conditions.
+        
+        It gives the same output as thermoCal, calculated in one
+        pass by thermoArr. Duplexes repeated under several names, or
+        written as the rotation of another, are calculated once under
+        the same conditions (see _uniquePairs).
+   
+        Parameters:
+        oligo : dictionary  --- duplexes
+        verbose : int       --- verbose level (default:0)
+                                see method 'thermoCal0' for details.
+        cond  : dictionary  --- per duplex conditions (default None).
+                                Its keys are the duplex names and its
+                                values dictionaries of the conditions
+                                given for the duplex, with keys temper,
+                                cp, ct, na and mg in the units of
+                                thermoArr, and nnSet, the name of the
+                                parameter set.
+        stats : dictionary  --- if given, updated with the number of
+                                duplexes 'duplexes' and of the unique
+                                ones calculated 'unique'
+                                (default None).
+                                 
+        Return:
+        A list with thermodynamics calculated, sorted by the keys of
+        the duplexes. See method 'thermoCal0' for details.
+        """
+
+        delimiter="\t"
+    
+        names=sorted(oligo.keys())
+        pairs=[oligo[o] for o in names]
+        
+        condArr=self._condLists(names, cond)
+            
+        [rows, inverse]=self._uniquePairs(pairs, condArr
+                                          , not self._salt.additive)
+
+        res=self.thermoArr([pairs[i] for i in rows]
+                         , **{c:[v[i] for i in rows] for c, v in condArr.items()})
+        res={k:v[inverse] for k, v in res.items()}
+
+        if stats is not None:
+            stats.update(duplexes=len(pairs), unique=len(rows))
+        
+        myThermo=[]
+        for i, o in enumerate(names):
+            
+            out=delimiter.join([o, pairs[i], "{:7.2f}".format(res['Tm'][i])])
+            
+            if verbose>0:
+            
+                verb_str=delimiter.join(["{:6.3e}%".format(res['perB'][i]*100.0)
+                                       , "{:8.3f}".format(res['dG'][i])
+                                       , "{:8.3f}".format(res['dH'][i])
+                                       , "{:8.3f}".format(res['dS'][i])
+                                       , "{:6.2f}".format(res['temper'][i]-273.15)])
+                                       
+                unit_str=delimiter.join([f"{res['cp'][i]*1e9:7.4e}"
+                                       , f"{res['ct'][i]*1e9:7.4e}"
+                                       , f"{res['na'][i]*1e3:7.4e}"
+                                       , f"{res['mg'][i]*1e3:7.4e}"])
+                                       
+                out+=delimiter+verb_str
+                
+            if verbose>=2:
+                out+=delimiter+delimiter.join(["{:7.2f}".format(res['Tms'][i])
+                                             , "{:8.3f}".format(res['dGs'][i])
+                                             , "{:8.3f}".format(res['dSs'][i])])
+                                             
+            if verbose>0:
+                out+=delimiter+unit_str
+            
+            myThermo.append(out)
+
+        return myThermo
+
+
+    def TmChunks(self, oligo, cond=None, chunk=1<<16):
+        """Generate the Tm of a batch of duplexes, chunk by chunk.
+        
+        Each chunk is calculated by thermoArr, each unique duplex once
+        (see _uniquePairs), so that the memory used does not grow with
+        the batch, e.g., to fold the Tm into statistics or to store
+        them compactly (see the modules aggregate and storage).
+        
+        Parameters:
+        oligo : dictionary --- duplexes in "top/bottom" format by name.
+        cond  : dictionary --- per duplex conditions (default None).
+                               See thermoBatch.
+        chunk : int        --- number of duplexes per chunk
+                               (default 65536).
+        
+        Exceptions:
+        see thermoArr.
+        
+        Yields:
+        An array of the Tm of each chunk, in the order of the keys of
+        oligo.
+        """
+        
+        names=list(oligo.keys())
+        
+        for first in range(0, len(names), chunk):
+            
+            keys=names[first:first+chunk]
+            pairs=[oligo[o] for o in keys]
+            
+            condArr=self._condLists(keys, cond)
+            
+            [rows, inverse]=self._uniquePairs(pairs, condArr
+                                          , not self._salt.additive)
+            
+            res=self.thermoArr([pairs[i] for i in rows]
+                             , **{c:[v[i] for i in rows] for c, v in condArr.items()})
+            
+            yield res['Tm'][inverse]
+
+
+    def thermoThreads(self, oligo, verbose=0, cond=None, workers=4
+                                                        , chunk=10000):
+        """thermoBatch in chunks of duplexes over a thread pool.
+
+        The object is shared by the threads with no copy (see the
+        module). numpy releases the GIL in the array calculations, and
+        on a free-threaded build the rest of thermoBatch runs in
+        parallel too.
+
+        Parameters:
+        oligo   : dictionary --- duplexes
+        verbose : int        --- verbose level (default:0)
+        cond    : dictionary --- per duplex conditions (default None).
+                                 See method 'thermoBatch'.
+        workers : int        --- number of threads (default 4).
+        chunk   : int        --- number of duplexes per task
+                                 (default 10000).
+
+        Exceptions:
+        see thermoBatch; the error of the first chunk failing.
+
+        Return:
+        The same list as thermoBatch.
+        """
+
+        names=sorted(oligo.keys())
+
+        if cond is None:
+            cond={}
+
+        def _run(first):
+
+            keys=names[first:first+chunk]
+
+            return self.thermoBatch({k:oligo[k] for k in keys}, verbose
+                                  , {k:cond[k] for k in keys if k in cond})
+
+        myThermo=[]
+        with ThreadPoolExecutor(workers) as ex:
+
+            for out in ex.map(_run, range(0, len(names), chunk)):
+                myThermo+=out
+
+        return myThermo
+
+
+    def thermoProcesses(self, oligo, verbose=0, cond=None, workers=4
+                                                          , chunk=10000):
+        """thermoBatch in chunks of duplexes over a process pool.
+
+        The nearest neighbor arrays are put once in shared memory and
+        attached by the workers (see shareTables); each worker is sent
+        only its chunks of duplexes.
+
+        Parameters:
+        oligo   : dictionary --- duplexes
+        verbose : int        --- verbose level (default:0)
+        cond    : dictionary --- per duplex conditions (default None).
+                                 See method 'thermoBatch'.
+        workers : int        --- number of processes (default 4).
+        chunk   : int        --- number of duplexes per task
+                                 (default 10000).
+
+        Exceptions:
+        see thermoBatch; the error of the first chunk failing.
+
+        Return:
+        The same list as thermoBatch.
+        """
+
+        names=sorted(oligo.keys())
+
+        if cond is None:
+            cond={}
+
+        keys=[names[i:i+chunk] for i in range(0, len(names), chunk)]
+
+        myThermo=[]
+        with shared.SharedArrays() as store:
+
+            other=self.shareTables(store)
+
+            with ProcessPoolExecutor(workers, initializer=_initWorker
+                                   , initargs=(other,)) as ex:
+
+                for out in ex.map(_batchWorker
+                                , [{k:oligo[k] for k in ks} for ks in keys]
+                                , [verbose]*len(keys)
+                                , [{k:cond[k] for k in ks if k in cond}
+                                                          for ks in keys]):
+                    myThermo+=out
+
+        return myThermo
+
+
+    def windowSums(self, code):
+        """Prefix sums of the perfect match nearest neighbors along
+        a template.
+        
+        The bottom strand of every window is the complement of the 
+        template. Nearest neighbors with a base other than A, C, G
+        and T add nothing to dH and dS and are counted instead.
+        
+        Parameters:
+        code : array --- base codes (utilSeq.seqEncode) of the template.
+        
+        Return:
+        A list with the prefix sums of dH, dS and the number of invalid
+        nearest neighbors. Each is one item longer than the number of
+        nearest neighbors, starting from 0.
+        """
+        
+        code=np.asarray(code, dtype=np.uint8)
+        comp=np.where(code<4, 3-code, 5)
+        
+        idx=self._nnIndex(code, comp)
+        
+        h=self._nnArrH[idx]
+        s=self._nnArrS[idx]
+        
+        bad=np.isnan(h)
+        h[bad]=0.0
+        s[bad]=0.0
+        
+        cumH=np.concatenate(([0.0], np.cumsum(h)))
+        cumS=np.concatenate(([0.0], np.cumsum(s)))
+        cumBad=np.concatenate(([0], np.cumsum(bad)))
+        
+        return [cumH, cumS, cumBad]
+
+
+    def windowdHdS(self, code, length, start=None, sums=None):
+        """Calculates dH and dS for the perfect match windows of
+        a template.
+        
+        It gives the same results as _get_dHdS on each window 
+        paired with its complement, but in O(1) per window from 
+        the prefix sums.
+        
+        Parameters:
+        code   : array --- base codes (utilSeq.seqEncode) of the template.
+        length : int   --- window length (>=2).
+        start  : array --- start positions (0 based) of the windows.
+                           (default None, meaning all the windows)
+        sums   : list  --- the result of windowSums(code) if already
+                           calculated (default None).
+        
+        Return:
+        A list with the arrays of dH and dS, one item per window. 
+        Windows with a base other than A, C, G and T are NaN.
+        """
+        
+        code=np.asarray(code, dtype=np.uint8)
+        
+        if sums is None:
+            sums=self.windowSums(code)
+            
+        [cumH, cumS, cumBad]=sums
+            
+        if start is None:
+            start=np.arange(max(len(code)-length+1, 0))
+            
+        start=np.asarray(start, dtype=np.intp)
+        end=start+length-1
+        
+        dH=0.2+cumH[end]-cumH[start]
+        dS=-5.7+cumS[end]-cumS[start]
+
+        # terminal AT correction. Any end other than C or G is not GC
+        for pos in (start, end):
+            
+            isGC=(code[pos]==1) | (code[pos]==2)
+            
+            dH+=np.where(isGC, 0.0, 2.2)
+            dS+=np.where(isGC, 0.0, 6.9)
+            
+        # symmetry correction, only possible for even lengths
+        # compared from the ends inwards, keeping only the windows still
+        # symmetric, so that most windows are dropped after a few bases
+        if length%2==0 and len(start)>0:
+
+            comp=np.where(code<4, 3-code, 5)
+
+            cand=np.arange(len(start))
+            for k in range(length//2):
+
+                s=start[cand]
+                cand=cand[code[s+k]==comp[s+length-1-k]]
+
+            dS[cand]-=1.4
+            
+        bad=cumBad[end]-cumBad[start]>0
+        dH[bad]=np.nan
+        dS[bad]=np.nan
+        
+        return [dH, dS]
+
+
+    def windowGC(self, code, length, start=None):
+        """The GC fractions of the windows of a template.
+        
+        Parameters:
+        code   : array --- base codes (utilSeq.seqEncode) of the template.
+        length : int   --- window length.
+        start  : array --- start positions (0 based) of the windows.
+                           (default None, meaning all the windows)
+        
+        Return:
+        An array, one item per window.
+        """
+        
+        code=np.asarray(code, dtype=np.uint8)
+        
+        if start is None:
+            start=np.arange(max(len(code)-length+1, 0))
+            
+        start=np.asarray(start, dtype=np.intp)
+        
+        cumGC=np.concatenate(([0], np.cumsum((code==1) | (code==2))))
+        
+        return (cumGC[start+length]-cumGC[start])/length
+
 
-import error
-import util, utilSeq
+    def _degenPairs(self, pair):
+        """The base pairs allowed at each position of a duplex with
+        IUPAC degenerate codes.
+        
+        The base pairs are numbered t*4+b, where t and b are the codes
+        (utilSeq.seqEncode) of the top and the bottom bases. The two 
+        bases at a position vary independently, except where the 
+        bottom is the complement code of a degenerate top, e.g., R/Y.
+        There, each top base is paired with its complement only.
 
+        Parameters:
+        pair : str  --- a duplex in "top/bottom" format. 
+                        The top is in 5'->3' orientation.
+                        The bottom is in 3'->5' orientation.
+                        It should have the same length (>=2).
 
-class Thermo(object):
-    """A class to calculate thermodynamics using nearest neighbor
-    parameters.
-    
-    Constants and default values
-    _R_      --- The gas constant
-    _cp_     --- default concentration of primer (300 nM)
-    _ct_     --- default concentration of template (1.38e-15 nM)
-    _na_     --- default concentration of monovalent salt (100 mM)
-    _mg_     --- default concentration of divalent salt (0.0 mM)
-    _temper_ --- default temperature (65 C)
+        Exceptions:
+        NotDNAError         --- a letter is not an IUPAC code.
+        DuplexNotFlushError --- the two strands differ in length.
+        
+        Return:
+        A list with the top, the bottom and a boolean array (length x 16)
+        of the allowed base pairs.
+        """
+        
+        iupac=self._IUPAC_
+        
+        pair=pair.upper()
+        temp=pair.split("/")
+        
+        if len(temp)!=2 or re.search("[^ACGTURYSWKMBDHVN]", temp[0]+temp[1]):
+            raise error.NotDNAError(pair)
+            
+        [top, bottom]=temp
+        
+        if len(top)!=len(bottom) or len(top)<2:
+            raise error.DuplexNotFlushError(pair)
+            
+        allowed=np.zeros((len(top), 16), dtype=bool)
+        for i in range(len(top)):
+            
+            t=utilSeq.seqEncode(iupac[top[i]]).astype(int)
+            b=utilSeq.seqEncode(iupac[bottom[i]]).astype(int)
+            
+            if len(t)>1 and bottom[i]==utilSeq.seqComp(top[i]):
+                allowed[i, t*4+3-t]=True
+            else:
+                allowed[i, (t[:, None]*4+b[None, :]).ravel()]=True
+                
+        return [top, bottom, allowed]
 
-    Attributes:
-    _nndH    --- nearest neighbor parameters for enthalpy.
-    _nndS    --- nearest neighbor parameters for entropy.
-    
-    Methods:
-    thermoCal(*)  ---   calculates Tm, perB, dG, dH, dS, Tms, dGs
-                        and dSs for all duplexes given in a dictionary.
-                        perB is the percentage bound.
-                        Tms, dGs and dSs are values under standard
-                        conditions.                     
-    thermoCal0(*) ---   calculates thermodynamics for one duplex.
-    getMelting(*) ---   calculates the percentage bound for a duplex
-                        at various temperatures given in a list.
-   
-    _get_dHdS(*)  ---   Calculates dH and dS for one duplex.
-    _readNN(HorS) ---   read the nearest neighbor parameters for dH or dS.
-    _perBcal(k, cp, ct)  --- calculate the percentage bound (perB).
-    """
 
-    _R_=1.987
-    _cp_=300.0
-    _ct_=1.38e-15
-    _na_=100.0
-    _mg_=0.0
-    _temper_=65.0
-    
-    _nndH={}
-    _nndS={}
+    def _pairTables(self):
+        """The nearest neighbor parameters by base pairs.
+        
+        Return:
+        A list with the 16x16 arrays of dH and dS for the nearest 
+        neighbor of base pair p followed by base pair q (5'->3' on the
+        top), and the 16 terminal AT corrections of dH and dS.
+        """
+        
+        pt=np.arange(16)//4
+        pb=np.arange(16)%4
+        
+        top=np.stack([np.repeat(pt, 16), np.tile(pt, 16)], axis=1)
+        bottom=np.stack([np.repeat(pb, 16), np.tile(pb, 16)], axis=1)
+        
+        idx=self._nnIndex(top, bottom)[:, 0].reshape(16, 16)
+        
+        isGC=((pt==1) & (pb==2)) | ((pt==2) & (pb==1))
+        
+        termH=np.where(isGC, 0.0, 2.2)
+        termS=np.where(isGC, 0.0, 6.9)
+        
+        return [self._nnArrH[idx], self._nnArrS[idx], termH, termS]
 
 
-    @staticmethod
-    def _readNN(HorS):
-        """Read the nearest neighbor parameters from a file.
+    def _degenDP(self, allowed, a, b):
+        """The extreme of a*dH+b*dS over the expansions of a 
+        degenerate duplex.
         
-        The file path is specified by an environment variable 'NNDIR'
-        or at the current working directory.
+        A dynamic program over the nearest neighbor chain, folded from
+        both ends toward the middle, so that it also tracks whether the
+        top strand is self complementary (symmetry correction). The
+        cost is linear in the duplex length.
         
-        The parameters are made up of 4 6x6 blocks, ignoring blank and
-        comment lines.
+        Parameters:
+        allowed : array --- allowed base pairs (see _degenPairs).
+        a       : float --- weight of dH.
+        b       : float --- weight of dS.
         
-        The first row in each block is the top nearest neighbors
-        in 3'->5'. The first columns in the following 5 rows are the
-        bottom nearest neighbors in 5'->3' orientation. Together they
-        form one complete nearest neighbor 5'-top-3'/3'-bottom-5'. 
+        Return:
+        A list with the smallest a*dH+b*dS, and the dH and dS of the
+        expansion giving it. The smallest is inf if no expansion has
+        all its nearest neighbors supported.
+        """
+        
+        [nnH, nnS, termH, termS]=self._pairTables()
+        
+        L=len(allowed)
+        m=L//2
+        
+        W=a*nnH+b*nnS
+        W[np.isnan(W)]=np.inf
+        
+        # top(p) is the complement of top(q)
+        top=np.arange(16)//4
+        match=top[:, None]==3-top[None, :]
+        
+        def _pick(cand, candH, candS, axis):
+            # the smallest along an axis with its dH and dS
+            k=np.expand_dims(np.argmin(cand, axis=axis), axis)
+            
+            return [np.take_along_axis(x, k, axis).squeeze(axis)
+                                    for x in (cand, candH, candS)]
+        
+        # states (flag, p, q): base pairs p at i and q at L-1-i
+        # flag 1 when the top is self complementary so far
+        ends=allowed[0][:, None] & allowed[L-1][None, :]
+        
+        V=a*(termH[:, None]+termH[None, :])+b*(termS[:, None]+termS[None, :])
+        V=np.where(ends, V, np.inf)
+        
+        V=np.stack([np.where(match, np.inf, V), np.where(match, V, np.inf)])
+        H=np.broadcast_to(termH[:, None]+termH[None, :], V.shape).copy()
+        S=np.broadcast_to(termS[:, None]+termS[None, :], V.shape).copy()
+        
+        for i in range(1, m):
+            
+            # from p at i-1 to p' at i
+            [V, H, S]=_pick(V[:, :, None, :]+W[None, :, :, None]
+                          , H[:, :, None, :]+nnH[None, :, :, None]
+                          , S[:, :, None, :]+nnS[None, :, :, None], 1)
+                          
+            # from q at L-i to q' at L-1-i
+            [V, H, S]=_pick(V[:, :, None, :]+W[None, None, :, :]
+                          , H[:, :, None, :]+nnH[None, None, :, :]
+                          , S[:, :, None, :]+nnS[None, None, :, :], 3)
+            
+            mask=allowed[i][:, None] & allowed[L-1-i][None, :]
+            V=np.where(mask, V, np.inf)
+            
+            # a self complementary top breaks where top(p)!=comp(top(q))
+            Vb=np.where(match, np.inf, V[1])
+            useB=V[0]<=Vb
+            
+            V=np.stack([np.where(useB, V[0], Vb), np.where(match, V[1], np.inf)])
+            H=np.stack([np.where(useB, H[0], H[1]), H[1]])
+            S=np.stack([np.where(useB, S[0], S[1]), S[1]])
+        
+        if L%2==0:
+            # join the nearest neighbor in the middle
+            V=V+W[None, :, :]
+            H=H+nnH[None, :, :]
+            S=S+nnS[None, :, :]
+            
+            # symmetry correction
+            V[1]+=-1.4*b
+            S[1]+=-1.4
+            
+        else:
+            # join through the base pair in the middle
+            Wm=np.where(allowed[m][None, :, None], W[:, :, None]+W[None, :, :]
+                                                                    , np.inf)
+            [V, H, S]=_pick(V[:, :, None, :]+Wm[None, :, :, :]
+                          , H[:, :, None, :]+(nnH[:, :, None]+nnH[None, :, :])
+                          , S[:, :, None, :]+(nnS[:, :, None]+nnS[None, :, :])
+                          , 2)
+            
+        k=np.argmin(V)
+        
+        # initiation
+        dH=H.flat[k]+0.2
+        dS=S.flat[k]-5.7
+        
+        return [V.flat[k]+a*0.2-b*5.7, dH, dS]
 
-        Parameters:
-        HorS : str   --- flag if to read for dH or dS.
+
+    def _degenMean(self, allowed):
+        """The mean dH and dS over the expansions of a degenerate duplex.
         
-        Exceptions:
-        NNFileNotFoundError  --- a custom error class, raised when
-                                 neither of the parameter files
-                                 "nnSH.csv" and "nnSS.csv" not found.
-                                 This could happen when the environment
-                                 variable 'NNDIR' not set or not pointing
-                                 to the folder where the parameter files
-                                 are or the parameter files are not at 
-                                 the current working folder.
+        The same dynamic program as in _degenDP, with the sums over
+        all the expansions in place of the extremes. Expansions with a
+        nearest neighbor not supported are left out.
+        
+        Parameters:
+        allowed : array --- allowed base pairs (see _degenPairs).
         
         Return:
-        A dictionary. Its keys and values are the nearest neighbors and
-                      the corresponding parameters, respectively 
+        A list with the mean dH, the mean dS and the number of
+        expansions counted, an exact int.
         """
- 
-        if 'NNDIR' in os.environ:
-            folder=os.environ['NNDIR']
+        
+        [nnH, nnS, termH, termS]=self._pairTables()
+        
+        L=len(allowed)
+        m=L//2
+        
+        A=np.isfinite(nnH).astype(float)
+        AH=np.where(A>0, nnH, 0.0)
+        AS=np.where(A>0, nnS, 0.0)
+        
+        top=np.arange(16)//4
+        match=top[:, None]==3-top[None, :]
+        
+        ends=(allowed[0][:, None] & allowed[L-1][None, :]).astype(float)
+        
+        # number of expansions and the sums of dH and dS, by state
+        N=np.stack([ends*~match, ends*match])
+        H=N*(termH[:, None]+termH[None, :])
+        S=N*(termS[:, None]+termS[None, :])
+        
+        # the exact number of expansions, in Python int
+        Aint=A.astype(int).astype(object)
+        C=N.astype(int).astype(object)
+        
+        logScale=0.0
+        
+        for i in range(1, m):
+            
+            # from p at i-1 to p' at i
+            [N, H, S]=[np.einsum('fpq,pr->frq', N, A)
+                     , np.einsum('fpq,pr->frq', H, A)
+                                    +np.einsum('fpq,pr->frq', N, AH)
+                     , np.einsum('fpq,pr->frq', S, A)
+                                    +np.einsum('fpq,pr->frq', N, AS)]
+            
+            C=np.einsum('frq,sq->frs', np.einsum('fpq,pr->frq', C, Aint)
+                                                                , Aint)
+            
+            # from q at L-i to q' at L-1-i
+            [N, H, S]=[np.einsum('frq,sq->frs', N, A)
+                     , np.einsum('frq,sq->frs', H, A)
+                                    +np.einsum('frq,sq->frs', N, AH)
+                     , np.einsum('frq,sq->frs', S, A)
+                                    +np.einsum('frq,sq->frs', N, AS)]
+            
+            mask=allowed[i][:, None] & allowed[L-1-i][None, :]
+            
+            [N, H, S, C]=[np.stack([x[0]+x[1]*~match, x[1]*match])*mask
+                                                        for x in (N, H, S, C)]
+            
+            # rescale to keep the numbers finite
+            c=N.sum()
+            if c>0:
+                [N, H, S]=[N/c, H/c, S/c]
+                logScale+=math.log(c)
+            
+        if L%2==0:
+            [N, H, S]=[N*A, H*A+N*AH, S*A+N*AS]
+            C=C*Aint
+            
+            # symmetry correction
+            S[1]+=-1.4*N[1]
+            
         else:
-            folder=os.getcwd()
+            Am=allowed[m].astype(float)
             
-        stem="nnSH.csv" if HorS=='dH' else "nnSS.csv"        
-        name=Path(folder+'/'+stem)
+            A2=np.einsum('pr,r,rq->pq', A, Am, A)
+            AH2=np.einsum('pr,r,rq->pq', AH, Am, A)+np.einsum('pr,r,rq->pq', A, Am, AH)
+            AS2=np.einsum('pr,r,rq->pq', AS, Am, A)+np.einsum('pr,r,rq->pq', A, Am, AS)
+            
+            [N, H, S]=[N*A2, H*A2+N*AH2, S*A2+N*AS2]
+            C=C*np.einsum('pr,r,rq->pq', A, Am, A).astype(int).astype(object)
+            
+        n=N.sum()
+        if n==0:
+            return [math.nan, math.nan, 0]
+            
+        return [H.sum()/n+0.2, S.sum()/n-5.7, int(C.sum())]
 
-        try:
-            if not Path(name).exists():
-                raise error.NNFileNotFoundError()
-        except error.NNFileNotFoundError as e:
-            print(e)
-            sys.exit(1)
-              
-        ls=util.readFileToList(name)
+
+    def _degenTm(self, allowed, sign):
+        """The extreme of Tm over the expansions of a degenerate duplex.
         
-        index=0
-        NN={}
-        while index < len(ls):
-            
-            # read six (6) rows
-            # first row
-            bottom=re.split("[\t,]", ls[index])
+        Tm>T if and only if dH-T*(dS+dSTm)/1000<0 (see _dSTm), which is
+        linear in the nearest neighbors, as long as dS+dSTm<0. The 
+        extreme is found by the Dinkelbach iteration: the expansion 
+        with the smallest (largest) dH-T*dS/1000 gives the next T, 
+        until T no longer changes. The caller checks that dS+dSTm<0
+        for every expansion (see 'degenerate').
+        
+        Parameters:
+        allowed : array --- allowed base pairs (see _degenPairs).
+        sign    : int   --- 1 for the maximum, -1 for the minimum.
+        
+        Exceptions:
+        ValueError --- the iteration does not converge.
+        
+        Return:
+        A list with Tm (kelvin), and dH and dS of the expansion.
+        """
+        
+        dSTm=float(self._dSTm(len(allowed)))
+        
+        T=self._temper
+        for _ in range(self._degenIter_):
+        
+            [v, dH, dS]=self._degenDP(allowed, sign, -sign*T/1000)
             
-            # the following five (5) rows
-            for i in range(5):
-                
-                index+=1
-                top=re.split("[\t,]", ls[index])
-                
-                for j in range(1, 6):
-                    
-                    value=float(top[j]) if len(top[j]) >0 else 0.0
-                    
-                    NN[top[0]+"/"+bottom[j]]=value
-                    
-                    # get reverse complementary
-                    nn_t=''.join(reversed(bottom[j]))+"/"+''.join(reversed(top[0]))
-                    NN[nn_t]=value
+            Tm=dH*1000/(dS+dSTm)
+            if abs(Tm-T)<=1e-9*max(abs(T), 1.0):
+                return [Tm, dH, dS]
                 
-            index+=1
-        
-        return NN
+            T=Tm
+            
+        raise ValueError("The extreme Tm of the degenerate duplex did not"
+                    f" converge in {self._degenIter_} iterations.")
 
 
-    @staticmethod
-    def _perBcal(k, cp, ct):
-        """Calculate the percentage bound.
+    def degenerate(self, pair, mean=False):
+        """Calculates the minimum, maximum and mean Tm, dH and dS of
+        a duplex with IUPAC degenerate codes over all its expansions.
         
-        Paramaters:
-        k  : float   --- equilibrium constant
-        cp : float   --- primer concentration
-        ct : float   --- template concentration
+        The cost is linear in the duplex length, not in the number
+        of expansions. Expansions with a nearest neighbor not 
+        supported (consecutive mismatches) are left out.
+        
+        Parameters:
+        pair : str  --- a duplex in "top/bottom" format. 
+                        The top is in 5'->3' orientation.
+                        The bottom is in 3'->5' orientation.
+                        It should have the same length.
+                        See _degenPairs for the pairing of the codes.
+        mean : bool --- also calculate the means (default: False)
+        
+        Exceptions:
+        NNnotExistError --- no expansion has all its nearest neighbors
+                            supported.
+        ValueError      --- the salt model is not additive; an 
+                            expansion has no melting transition 
+                            (dS+dSTm>=0, see _dSTm), so that the
+                            extremes of Tm are not defined; or the
+                            extremes do not converge (see _degenTm).
         
         Return:
-        float  ---  percentage bound          
+        A dictionary with keys 'Tm', 'dH' and 'dS'. The values are
+        lists of the minimum and the maximum, followed for dH and dS
+        by the mean over the expansions if asked. dS is salt corrected
+        as in thermoCal0. With mean, the key 'TmOfMean' gives the Tm of
+        the mean dH and dS (not the mean of Tm, which has no such
+        linear form), and the key 'n' the number of expansions (int).
         """
+        
+        self._additiveSalt()
+        
+        [top, bottom, allowed]=self._degenPairs(pair)
+        
+        L=len(top)
+        dSsalt=float(self._dSsalt(L))
+        
+        dHmin=self._degenDP(allowed, 1, 0)[0]
+        
+        if dHmin==np.inf:
+            raise error.NNnotExistError(top+'/'+bottom, top, bottom)
+        
+        dHmax=-self._degenDP(allowed, -1, 0)[0]
+        dSmin=self._degenDP(allowed, 0, 1)[0]+dSsalt
+        dSmax=-self._degenDP(allowed, 0, -1)[0]+dSsalt
+        
+        # Tm=dH*1000/(dS+dSTm) is a melting temperature only where
+        # the denominator is negative, for every expansion
+        if dSmax-dSsalt+float(self._dSTm(L))>=0:
+            raise ValueError(f"The duplex {pair} has expansions with no"
+                              " melting transition (dS+dSTm>=0).")
+        
+        Tmmin=self._degenTm(allowed, -1)[0]-273.15
+        Tmmax=self._degenTm(allowed, 1)[0]-273.15
+        
+        out={'Tm':[float(Tmmin), float(Tmmax)]
+           , 'dH':[float(dHmin), float(dHmax)]
+           , 'dS':[float(dSmin), float(dSmax)]}
+        
+        if mean:
+            
+            [dH, dS, n]=self._degenMean(allowed)
+            
+            out['TmOfMean']=float(self.TmArr(dH, dS, L))
+            out['dH'].append(float(dH))
+            out['dS'].append(float(dS+dSsalt))
+            out['n']=n
+            
+        return out
 
-        c=cp/ct
-        b=-(c+1+1/k/ct)
 
-        # since b is always negative, i.e., b<0
-        x=math.sqrt(b*b-4.0*c)
-        p1=(-b+x)/2.0
-        p2=c/p1
+    def thermoDegen0(self, pair, mean=False):
+        """Degenerate calculation for one duplex.
+        
+        Parameters:
+        pair : str  --- a duplex in "top/bottom" format, 
+                        see method 'degenerate' for details.
+        mean : bool --- also give the means (default: False)
+        
+        Return:
+        *** everything is returned as string ***
+        
+        The duplex followed by the minimum and maximum of Tm (and the
+        Tm of the mean dH and dS), and the minimum, maximum (and mean)
+        of dH and dS, delimited by tab.
+        """
+        
+        out=self.degenerate(pair, mean)
+        
+        delimiter='\t'
+        
+        Tm=out['Tm']+([out['TmOfMean']] if mean else [])
         
-        perB=p1 if p1>=0.0 and p1<=1.0 else p2
+        Tm_str=delimiter.join("{:7.2f}".format(x) for x in Tm)
+        dH_str=delimiter.join("{:8.3f}".format(x) for x in out['dH'])
+        dS_str=delimiter.join("{:8.3f}".format(x) for x in out['dS'])
         
-        return perB
+        return delimiter.join([pair, Tm_str, dH_str, dS_str])
+
+
+    def thermoDegen(self, oligo, mean=False):
+        """Degenerate calculation for duplexes in a dictionary.
+   
+        Parameters:
+        oligo : dictionary  --- duplexes
+        mean  : bool        --- also give the means (default: False)
+                                 
+        Return:
+        A list with the results, sorted by the keys of the duplexes.
+        
+        See method 'thermoDegen0' for details.
+        """
+
+        delimiter="\t"
+    
+        myThermo=[]
+        for o in sorted(oligo.keys()):
+            
+            myThermo.append(o+delimiter+self.thermoDegen0(oligo[o], mean)) 
+
+        return myThermo
 
 
     def _get_dHdS(self, pair):
@@ -175,6 +2168,10 @@ class Thermo(object):
                         It should have the same length.
 
         Exceptions:
+        NotDNAError     --- custom error class, raised when the duplex
+                            contains letters other than A, C, G and T.
+        DuplexNotFlushError --- custom error class, raised when the two
+                            strands differ in length.
         NNnotExistError --- custom error class, raised when an nearest
                             neighbor parameter does not exist.
                             This happens when there are more
@@ -189,13 +2186,8 @@ class Thermo(object):
 
         pair=pair.upper()
 
-        try:
-            if re.search("[^ACGT/]", pair):
-                raise error.NotDNAError(pair)
-        except error.NotDNAError as e:
-            print(e)
-            
-            sys.exit(1)
+        if re.search("[^ACGT/]", pair):
+            raise error.NotDNAError(pair)
 
         temp=pair.split("/")
         
@@ -204,13 +2196,8 @@ class Thermo(object):
         top=list(temp[0])
         bottom=list(temp[1])
 
-        try:
-            if len(top) !=len(bottom):        
-                raise error.DuplexNotFlushError(pair)
-        except error.DuplexNotFlushError as e:            
-            print(e)
-
-            sys.exit(1)
+        if len(top) !=len(bottom):        
+            raise error.DuplexNotFlushError(pair)
 
         # initiation  
         dH=0.2
@@ -225,12 +2212,7 @@ class Thermo(object):
                 dH+=nndH[nn] 
                 dS+=nndS[nn] 
             except KeyError:
-                try:
-                    raise error.NNnotExistError(nn, top, bottom)
-                except error.NNnotExistError as e:
-                    print(e)
-
-                    sys.exit(1)
+                raise error.NNnotExistError(nn, top, bottom)
                     
         # symmetry correction
         dS+=-1.4 if isSymm==1 else 0.0
@@ -268,7 +2250,7 @@ class Thermo(object):
         R=self._R_
 
         get_dHdS=self._get_dHdS
-        perBcal=self._perBcal
+        perBLog=self.perBLog
         
         [dH, dS]=get_dHdS(pair)
         
@@ -278,9 +2260,8 @@ class Thermo(object):
         for k in kelvin:
             
             dG=dH-k*dS/1000
-            keq=math.exp(-dG*1000/R/k)
         
-            perB=perBcal(keq, cp, ct)
+            perB=float(perBLog(-dG*1000/R/k, cp, ct))
             
             melt[k-273.15]=perB
             
@@ -327,19 +2308,16 @@ class Thermo(object):
         na=self._na
         mg=self._mg
         
-        perBcal=self._perBcal
+        perBLog=self.perBLog
         get_dHdS=self._get_dHdS        
         
         [dH, dS]=get_dHdS(pair)
 
-        # effective monovalent concentration
-        # Ahsen et. al, (2001), Clinical Chemistry, 47(11), 1956-61
-        na_eff=na+0.12*math.sqrt(mg*1000)
-
-        # sale correction for dS        
-        # SantaLucia J Jr., (1998), PNAS, 95, 1460-65 
-        n=(len(pair)-1)/2-1
-        dSeff=dS+0.368*n*math.log(na_eff)
+        # salt correction for dS by the salt model (see _dSsalt)
+        top=pair.upper().split("/")[0]
+        gc=(top.count("G")+top.count("C"))/len(top)
+        
+        dSeff=dS+float(self._dSsalt(len(top), None, dH, gc))
 
         dG=dH-temper*dSeff/1000
         
@@ -354,9 +2332,7 @@ class Thermo(object):
 
         if verbose>0:
             
-            k=math.exp(-dG*1000/R/temper)
-        
-            perB=perBcal(k, cp, ct)
+            perB=float(perBLog(-dG*1000/R/temper, cp, ct))
         
             perB_str="{:6.3e}%".format(perB*100.0)
             dG_str="{:8.3f}".format(dG)
@@ -427,7 +2403,8 @@ class Thermo(object):
         return myThermo
         
 
-    def __init__(self, temper=_temper_, cp=_cp_, ct=_ct_, na=_na_, mg=_mg_):
+    def __init__(self, temper=_temper_, cp=_cp_, ct=_ct_, na=_na_, mg=_mg_
+                                              , saltModel=None, nnSets=()):
         """Constructor.
         
         1. Check the conditions.
@@ -442,8 +2419,22 @@ class Thermo(object):
         ct     : float  --- template concentration (default: _ct_)
         na     : float  --- monovalent salt concentration (default: _na_)
         mg     : float  --- divalent salt concentration (default: _mg_)        
+        saltModel : object --- the salt correction model (default None,
+                               salt.SantaLucia1998). See the module
+                               salt.
+        nnSets : list   --- the names of the registered nearest neighbor
+                            parameter sets compiled besides 'DNA'
+                            (default none). See registerNN.
+        
+        Exceptions:
+        ValueError --- a parameter set is not registered, or a
+                       concentration is negative; also see the errors
+                       raised below and by _readNN.
         """
 
+        if min(cp, ct, na, mg)<0:
+            raise ValueError("The concentrations should not be negative.")
+
         if cp==0:
             raise error.ConcentrationZeroError('cp')
 
@@ -462,8 +2453,21 @@ class Thermo(object):
         self._na=float(na)*1e-3
         self._mg=float(mg)*1e-3
 
-        self._nndH=self._readNN("dH")
-        self._nndS=self._readNN("dS")
+        self._salt=salt.SantaLucia1998() if saltModel is None else saltModel
+        self._saltK=self._salt.constants(self._na, self._mg)
+
+        self._nnSetNames=('DNA',)+tuple(x for x in dict.fromkeys(nnSets)
+                                                           if x!='DNA')
+        
+        missing=[x for x in self._nnSetNames if x not in _nnSets]
+        if missing:
+            raise ValueError(f"The parameter set {missing[0]} is not"
+                                                        " registered.")
+        
+        self._nnSetSpecs=tuple(_nnSets[x] for x in self._nnSetNames)
+
+        [self._nndH, self._nndS, self._nnArrH, self._nnArrS
+       , self._nnStackH, self._nnStackS, self._nnEnds]=self._loadSets()
 
         
     def __repr__(self):
@@ -0,0 +1,132 @@
+"""This is a module for tiling a region with probes of uniform Tm.
+
+The probes are variable length windows of the region (5'->3'), each
+paired with its complement. They cover the region from its first to
+its last base, each probe starting a fixed gap after the end of the
+previous one. A gap of 0 abuts the probes and a negative gap overlaps
+them.
+
+The Tm of every (start, length) candidate comes from the prefix sums
+of the nearest neighbors (see Thermo.windowSums), and the probes are
+chosen by dynamic programming over the positions to minimise the sum
+of the squared deviations of their Tm from a target. A probe ends at
+least min(lengths)+gap bases before the start of the next, so the
+positions are updated in blocks of that size, vectorized over the
+block and the lengths. The cost is linear in the region length times
+the number of lengths.
+
+The module needs the custom module utilSeq, a 'Thermo' object and
+numpy.
+
+Functions:
+tileProbes(*) --- tile a region with probes of uniform Tm.
+"""
+
+import numpy as np
+
+import utilSeq
+
+
+def tileProbes(myThermo, region, target, lengths, gap=0):
+    """Tile a region with probes of Tm close to a target.
+
+    Parameters:
+    myThermo : Thermo --- the conditions for the calculation.
+    region   : str    --- the region (5'->3').
+    target   : float  --- the target Tm (celsius).
+    lengths  : list   --- the probe lengths allowed, each >=2.
+    gap      : int    --- bases between two probes, negative for an
+                          overlap (default 0). It should be larger
+                          than -min(lengths).
+
+    Return:
+    A list with the probes as (start, length, Tm), ordered by start
+    (0 based), and the sum of the squared deviations from the target.
+    """
+
+    lengths=np.array(sorted(set(int(L) for L in lengths)), dtype=np.intp)
+    gap=int(gap)
+
+    if lengths[0]<2:
+        raise ValueError("The probe length should be at least 2.")
+
+    block=lengths[0]+gap
+    if block<1:
+        raise ValueError("The overlap should be shorter than the probes.")
+
+    code=utilSeq.seqEncode(region)
+    sums=myThermo.windowSums(code)
+    N=len(code)
+
+    # cost[l, s]: squared deviation of the probe of length lengths[l]
+    # at s, inf where it does not fit or has a base other than A, C, G
+    # and T
+    cost=np.full((len(lengths), N+1), np.inf, dtype=np.float32)
+    for l, L in enumerate(lengths):
+
+        if L>N:
+            continue
+
+        [dH, dS]=myThermo.windowdHdS(code, L, None, sums)
+        gc=myThermo.windowGC(code, L)
+        dev=(myThermo.TmArr(dH, dS, L, None, gc)-target)**2
+
+        cost[l, :N-L+1]=np.where(np.isnan(dev), np.inf, dev)
+
+    # best[p]: smallest cost of the probes before a probe starting at p
+    M=N+gap
+    if M<=0:
+        raise ValueError("The region is too short to tile.")
+
+    best=np.full(M+1, np.inf)
+    best[0]=0.0
+    choice=np.zeros(M+1, dtype=np.intp)
+
+    shift=lengths+gap
+    rows=np.arange(len(lengths))
+
+    for q in range(1, M+1, block):
+
+        p=np.arange(q, min(q+block, M+1))
+
+        s=p[:, None]-shift[None, :]
+        inside=s>=0
+        s=np.where(inside, s, 0)
+
+        total=np.where(inside, best[s]+cost[rows[None, :], s], np.inf)
+
+        pick=np.argmin(total, axis=1)
+        best[p]=total[np.arange(len(p)), pick]
+        choice[p]=pick
+
+    if not np.isfinite(best[M]):
+        raise ValueError("The region cannot be tiled by the probes.")
+
+    # trace the probes back from the end
+    starts=[]
+    lens=[]
+
+    p=M
+    while p>0:
+
+        L=int(lengths[choice[p]])
+        p=p-L-gap
+
+        starts.append(p)
+        lens.append(L)
+
+    starts=np.array(starts[::-1], dtype=np.intp)
+    lens=np.array(lens[::-1], dtype=np.intp)
+
+    tm=np.empty(len(starts))
+    for L in np.unique(lens):
+
+        at=lens==L
+
+        [dH, dS]=myThermo.windowdHdS(code, L, starts[at], sums)
+        gc=myThermo.windowGC(code, L, starts[at])
+        tm[at]=myThermo.TmArr(dH, dS, L, None, gc)
+
+    probes=[(int(s), int(L), float(x)) for s, L, x in zip(starts, lens, tm)]
+
+    return [probes, float(best[M])]
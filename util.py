@@ -7,6 +7,7 @@ readFileToList(*) --- read a text file into a list.
 saveListToFile(*) --- save a list to a text file.
 printDict(*)      --- Print out a dictionary.
 readFileToDict(*) --- read a delimited text file into a dictionary.
+readFasta(*)      --- read a FASTA file into a dictionary.
 """
 
 import os, sys
@@ -205,3 +206,49 @@ def readFileToDict(f, keyC=1, valueC=0):
             lso[key]=temp[valueC-1]
                         
     return lso
+
+
+def readFasta(f):
+    """A function reading a FASTA file into a dictionary.
+    
+    Parameters:
+    f : str     --- the FASTA file name.
+    
+    Returns:
+    A dictionary. Its keys and values are the record names (the first
+    word of the header lines) and the sequences, in the file order.
+    """
+    
+    try:
+        fh=open(f, "r")
+    except IOError as e:
+        print("\n*** error reading file {}***".format(f))
+        print(e)
+        
+        sys.exit(1)
+        
+    seqs={}
+    name=None
+    lines=[]
+    for line in fh:
+        
+        line=line.strip()
+        
+        if line.startswith(">"):
+            
+            if name is not None:
+                seqs[name]="".join(lines)
+                
+            temp=line[1:].split()
+            name=temp[0] if len(temp)>0 else ""
+            lines=[]
+            
+        elif name is not None:
+            lines.append(line)
+            
+    if name is not None:
+        seqs[name]="".join(lines)
+        
+    fh.close()
+    
+    return seqs
@@ -6,10 +6,26 @@ seqComp(s) --- complement a DNA/RNA sequence.
 seqRC(s)   --- reverse complement a DNA/RNA sequence.
 isWC(b1, b2) --- check if the two bases form a canonical watson-crick pair.
 matchUp(top, bottom) --- match the top strand to the bottom.
+seqEncode(s) --- encode a DNA sequence into an array of base codes.
 """
 
 import re
 
+import numpy as np
+
+
+# base codes used by the vectorized calculation, U read as T. Any
+# other letter, including the IUPAC codes, is 5, an unknown base. The
+# code 4 of the dangling ends in the nearest neighbor tables is never
+# given to an input letter (see Thermo._compileNN).
+_BASE_="ACGT"
+_CODE_=np.full(256, 5, dtype=np.uint8)
+for _i, _b in enumerate(_BASE_):
+    _CODE_[ord(_b)]=_i
+    _CODE_[ord(_b.lower())]=_i
+_CODE_[ord('U')]=3
+_CODE_[ord('u')]=3
+
 
 def isWC(b1, b2):
     """Check if the two bases form a canonical watson-crick pair.
@@ -81,14 +97,15 @@ def seqComp(s):
     s : str    --- input sequence.
     
     Note:
-    The sequences are case sensitive.
+    The sequences are case sensitive. IUPAC degenerate codes are
+    complemented too, e.g., R (A/G) to Y (C/T).
     
     Returns:
     A string complementary to the input.
     """
     
-    be="ACGTUacgtu"
-    af="TGCAAtgcaa"
+    be="ACGTURYKMBVDHacgturykmbvdh"
+    af="TGCAAYRMKVBHDtgcaayrmkvbhd"
     
     s_t=s.translate(str.maketrans(be, af))
     
@@ -109,3 +126,23 @@ def seqRC(s):
     """
     
     return seqComp(seqRev(s))
+
+
+def seqEncode(s):
+    """Encode a DNA sequence into an array of base codes.
+    
+    A, C, G and T (or U) are coded as 0, 1, 2 and 3, respectively.
+    Any other letter, including the IUPAC degenerate codes, is coded
+    as 5. With this coding, the complement of a base b (b<4) is 3-b.
+    
+    Parameters:
+    s : str    --- input sequence.
+    
+    Note:
+    The sequences are case insensitive.
+    
+    Returns:
+    A numpy array of uint8 with the same length as the input.
+    """
+    
+    return _CODE_[np.frombuffer(s.encode('ascii'), dtype=np.uint8)]